@@ -0,0 +1,64 @@
+"""
+The request's actor: the signed-in user with profile and organization loaded.
+
+Nearly every view and permission check reads user.profile.role and
+user.profile.organization. ActorMiddleware attaches both to the user once per
+request, with a single select_related query. With ACTOR_CACHE_TIMEOUT set,
+the profile is also kept in the cache for that many seconds so later requests
+skip the query. Saving or deleting a profile or its organization invalidates
+the entry, which only reaches other processes through a shared cache backend
+(see the setting).
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from dashboard import telemetry
+from projects.models import Organization
+from .models import UserProfile
+
+
+def _key(user_id):
+    return f'accounts:actor:{user_id}'
+
+
+def invalidate(*user_ids):
+    cache.delete_many([_key(pk) for pk in user_ids])
+
+
+def load_profile(user):
+    """
+    Attach the profile (with its organization) to `user`, from the cache when
+    possible, so user.profile and user.profile.organization cost no queries.
+    """
+    timeout = getattr(settings, 'ACTOR_CACHE_TIMEOUT', 0)
+    entry = cache.get(_key(user.pk)) if timeout > 0 else None
+    # date_joined tells an entry left by an earlier account with a recycled id apart
+    hit = entry is not None and entry[0] == user.date_joined
+    if timeout > 0:
+        telemetry.cache_lookup('actor', hit)
+    if not hit:
+        entry = (user.date_joined, UserProfile.objects.select_related('organization').filter(user_id=user.pk).first())
+        if timeout > 0:
+            cache.set(_key(user.pk), entry, timeout)
+
+    profile = entry[1]
+    if profile is None:
+        # Remember the miss on the instance too, so hasattr(user, 'profile') stays query-free
+        User.profile.related.set_cached_value(user, None)
+    else:
+        user.profile = profile
+    return user
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def profile_changed(sender, instance, **kwargs):
+    invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Organization)
+def organization_changed(sender, instance, **kwargs):
+    invalidate(*instance.members.values_list('user_id', flat=True))
@@ -5,3 +5,7 @@ class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
     verbose_name = 'User Accounts'
+
+    def ready(self):
+        # Connects the actor cache invalidation signals
+        from . import actor  # noqa: F401
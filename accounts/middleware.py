@@ -0,0 +1,22 @@
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from .actor import load_profile
+
+
+def get_actor(user):
+    if user.is_authenticated:
+        load_profile(user)
+    return user
+
+
+class ActorMiddleware(MiddlewareMixin):
+    """
+    Set request.actor to the signed-in user with profile and organization
+    loaded (see accounts/actor.py). request.user is pointed at the same object
+    so code reading request.user.profile shares it. Must come after
+    AuthenticationMiddleware.
+    """
+    def process_request(self, request):
+        user = request.user
+        request.actor = request.user = SimpleLazyObject(lambda: get_actor(user))
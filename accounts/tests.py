@@ -1,4 +1,4 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
 from .models import UserProfile
@@ -45,3 +45,76 @@ class RegistrationLoginTests(TestCase):
         
         # Check redirect to dashboard
         self.assertRedirects(response, self.dashboard_url)
+
+
+@override_settings(ACTOR_CACHE_TIMEOUT=60)
+class ActorTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from projects.models import Organization
+
+        cache.clear()
+        self.user = User.objects.create_user(username='owner', password='password123')
+        self.organization = Organization.objects.create(name='Acme', created_by=self.user)
+        UserProfile.objects.create(user=self.user, role='ENTERPRISE', organization=self.organization)
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_profile_and_organization_are_cached_across_requests(self):
+        """Test that the profile loads with one query and then comes from the cache"""
+        from .actor import load_profile
+
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            self.assertEqual(load_profile(user).profile.organization.name, 'Acme')
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            load_profile(user)
+            self.assertEqual(user.profile.role, 'ENTERPRISE')
+            self.assertEqual(user.profile.organization.name, 'Acme')
+
+    def test_saving_profile_or_organization_invalidates(self):
+        """Test that profile and organization edits are visible on the next request"""
+        from .actor import load_profile
+
+        load_profile(self.fresh_user())
+        profile = UserProfile.objects.get(user=self.user)
+        profile.role = 'MANAGER'
+        profile.save()
+        self.assertEqual(load_profile(self.fresh_user()).profile.role, 'MANAGER')
+
+        self.organization.name = 'Acme Ltd'
+        self.organization.save()
+        self.assertEqual(load_profile(self.fresh_user()).profile.organization.name, 'Acme Ltd')
+
+    def test_missing_profile_is_remembered(self):
+        """Test that users without a profile are not looked up again"""
+        from .actor import load_profile
+
+        other = User.objects.create_user(username='loner', password='password123')
+        load_profile(other)
+        other = User.objects.get(pk=other.pk)
+        with self.assertNumQueries(0):
+            load_profile(other)
+            self.assertFalse(hasattr(other, 'profile'))
+
+    @override_settings(ACTOR_CACHE_TIMEOUT=0)
+    def test_cache_is_off_without_timeout(self):
+        """Test that with no timeout every request reads the current role from the database"""
+        from .actor import load_profile
+
+        load_profile(self.fresh_user())
+        # As if another process had saved it: no invalidation reaches this one
+        UserProfile.objects.filter(user=self.user).update(role='EMPLOYEE')
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            self.assertEqual(load_profile(user).profile.role, 'EMPLOYEE')
+
+    def test_middleware_sets_actor(self):
+        """Test that request.actor is request.user with the profile attached"""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('tasks:list'))
+        request = response.wsgi_request
+        self.assertIs(request.actor, request.user)
+        self.assertEqual(request.actor.profile.organization, self.organization)
@@ -63,12 +63,12 @@ class BaseAddStaffView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
     
     def test_func(self):
         # Only Enterprise users can add staff
-        return self.request.user.profile.role == 'ENTERPRISE'
+        return self.request.actor.profile.role == 'ENTERPRISE'
     
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         # Pass the organization to the form
-        kwargs['organization'] = self.request.user.profile.organization
+        kwargs['organization'] = self.request.actor.profile.organization
         return kwargs
     
     def form_valid(self, form):
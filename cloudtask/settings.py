@@ -53,10 +53,13 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Whitenoise for static files
+    'dashboard.telemetry.MetricsMiddleware',  # Prometheus request metrics, see /_metrics/
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.ActorMiddleware',  # request.actor: user + profile + organization
+    'dashboard.profiling.SQLProfilingMiddleware',  # per-view SQL profile, see /_perf/
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -106,6 +109,64 @@ DATABASES = {
 #     )
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Used for the dashboard and project-list fragment cache. CACHE_BACKEND is
+# 'locmem' (per process, default) or 'file' (shared by every process on the host).
+# Fragment invalidation only reaches the processes sharing the cache, so with
+# locmem fragments are not cached unless FRAGMENT_CACHE_TIMEOUT is set (and are
+# then stale in other workers for up to that long), and OUTBOX_ENABLED requires
+# a shared backend (system check notifications.E001).
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / '.cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'cloudtask',
+        }
+    }
+
+# Seconds a rendered fragment may be served. Edits invalidate it sooner only in
+# processes sharing the cache (see CACHE_BACKEND), so fragment caching is off by
+# default with per-process locmem: other workers would keep serving fragments
+# from before an edit for up to this long
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('FRAGMENT_CACHE_TIMEOUT', 0 if CACHE_BACKEND == 'locmem' else 300))
+
+# Seconds a user's profile and organization (role and organization included)
+# are cached for request.actor (accounts/actor.py); 0 loads them with one query
+# per request. Saving the profile or organization deletes the entry, but only
+# from the cache of the process that saved it, so the cache is off by default
+# with per-process locmem: other workers would keep authorizing a demoted or
+# moved user with the old role for up to this long. With CACHE_BACKEND=file it
+# is shared by the workers of one host
+ACTOR_CACHE_TIMEOUT = int(os.environ.get('ACTOR_CACHE_TIMEOUT', 0 if CACHE_BACKEND == 'locmem' else 60))
+
+# Seconds a project's dependency graph (tasks/graph.py), shown as the release
+# plan on the project page, is cached; 0 rebuilds it with two queries per use.
+# Off by default with locmem for the same reason as the fragment cache
+DEPENDENCY_GRAPH_CACHE_TIMEOUT = int(
+    os.environ.get('DEPENDENCY_GRAPH_CACHE_TIMEOUT', 0 if CACHE_BACKEND == 'locmem' else 3600)
+)
+
+# Task status workflow: the statuses each status may move to (see Task.transition).
+# Set to None to allow any change.
+TASK_WORKFLOW = {
+    'TODO': ['IN_PROGRESS', 'IN_REVIEW', 'DONE'],
+    'IN_PROGRESS': ['TODO', 'IN_REVIEW', 'DONE'],
+    'IN_REVIEW': ['TODO', 'IN_PROGRESS', 'DONE'],
+    'DONE': ['TODO', 'IN_PROGRESS', 'IN_REVIEW'],
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -162,6 +223,44 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Transactional outbox: when enabled, activity logs and notifications are
+# queued and written by `python manage.py process_outbox` instead of inside
+# the request. Needs CACHE_BACKEND=file (or another shared cache) so the
+# worker's fragment invalidation reaches the web processes
+OUTBOX_ENABLED = os.environ.get('OUTBOX_ENABLED', 'False') == 'True'
+
+# Retention (python manage.py apply_retention / notifications.retention.run_scheduled):
+# read notifications and activity log rows older than these many days are
+# deleted and archived respectively, RETENTION_BATCH_SIZE rows per transaction
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 90))
+ACTIVITY_ARCHIVE_DAYS = int(os.environ.get('ACTIVITY_ARCHIVE_DAYS', 365))
+RETENTION_BATCH_SIZE = 1000
+
+# Month-partitioned ActivityLog storage (notifications.partitioning): native
+# partitions on PostgreSQL (convert once with `partition_activity_log --convert`),
+# per-month shadow tables on SQLite. Maintenance runs with apply_retention
+ACTIVITY_PARTITIONING = os.environ.get('ACTIVITY_PARTITIONING', 'False') == 'True'
+
+# Pub/sub backend for the live notifications/Kanban stream (notifications.events).
+# LocalBroker reaches subscribers in the same process only
+EVENT_BROKER = os.environ.get('EVENT_BROKER', 'notifications.events.LocalBroker')
+
+# SQL profiling (dashboard.profiling): profile every request, instead of only
+# staff requests sending an X-Profile-SQL header. The last
+# SQL_PROFILING_BUFFER profiles of each process are listed at /_perf/
+SQL_PROFILING = os.environ.get('SQL_PROFILING', 'False') == 'True'
+SQL_PROFILING_BUFFER = 200
+
+# Prometheus metrics (dashboard.telemetry), scraped from /_metrics/ by staff or
+# with an "Authorization: Bearer <METRICS_TOKEN>" header. Under gunicorn, point
+# METRICS_DIR at a directory shared by the workers (emptied on deploy) so every
+# scrape sums all processes; each process writes its file every
+# METRICS_FLUSH_INTERVAL seconds
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = 5
+
+
 # Authentication URLs
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
@@ -19,6 +19,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from dashboard.views import metrics, perf
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     
@@ -39,6 +41,12 @@ urlpatterns = [
     
     # Dashboard app
     path('dashboard/', include('dashboard.urls')),
+
+    # Recent per-view SQL profiles (staff only)
+    path('_perf/', perf, name='perf'),
+
+    # Prometheus metrics (staff or METRICS_TOKEN)
+    path('_metrics/', metrics, name='metrics'),
 ]
 
 # Serve media files in development
@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import DashboardMetrics
 
-# Register your models here.
+
+@admin.register(DashboardMetrics)
+class DashboardMetricsAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'project_count', 'task_count', 'done_count', 'updated_at']
+    list_filter = ['organization']
+    readonly_fields = ['updated_at', 'window_refreshed_at']
@@ -0,0 +1,50 @@
+"""
+Versioned keys for the dashboard and project-list fragment cache.
+
+Templates cache their expensive blocks with {% cache %}, varying on a
+per-organization version token. Signals in dashboard/signals.py bump the
+version whenever a Task, Project, ProjectMember or ActivityLog in that
+organization changes, so stale fragments are simply never looked up again
+and expire on their own.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import telemetry
+
+
+def _version_key(organization_id):
+    return f'fragments:org:{organization_id or "none"}'
+
+
+def get_version(organization_id):
+    """Current fragment version for an organization"""
+    key = _version_key(organization_id)
+    version = cache.get(key)
+    telemetry.cache_lookup('fragment_version', version is not None)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old version
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump(*organization_ids):
+    """Invalidate every cached fragment for the given organizations"""
+    for organization_id in set(organization_ids):
+        key = _version_key(organization_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def fragment_context(organization_id):
+    """Template variables used by {% cache %} blocks"""
+    return {
+        'fragment_timeout': getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 300),
+        'fragment_version': f'{organization_id}.{get_version(organization_id)}',
+    }
@@ -0,0 +1,149 @@
+"""
+Drive the key views through the Django test client and report latency
+percentiles and query counts per endpoint, as JSON.
+
+Run it against data from seed_load, and keep the JSON of each commit to
+compare regressions:
+
+    python manage.py seed_load --prefix load
+    python manage.py benchmark_views --prefix load --requests 50 --output bench/$(git rev-parse --short HEAD).json
+
+Each endpoint is requested as a signed-in user of the first seeded
+organization with the matching role. Warm-up requests are not measured, so
+the numbers describe warm caches. Latencies are in milliseconds and include
+the full request/response cycle through the middleware, but no network.
+"""
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from tasks.models import Task
+
+# (endpoint name, role of the requesting user, URL name, expected status)
+ENDPOINTS = (
+    ('dashboard_enterprise', 'ENTERPRISE', 'dashboard:index', 200),
+    ('dashboard_manager', 'MANAGER', 'dashboard:index', 200),
+    ('dashboard_employee', 'EMPLOYEE', 'dashboard:index', 200),
+    ('task_list', 'MANAGER', 'tasks:list', 200),
+    ('kanban', 'MANAGER', 'tasks:kanban', 200),
+    ('task_detail', 'MANAGER', 'tasks:detail', 200),
+    ('notification_poll', 'EMPLOYEE', 'notifications:unread_count', 200),
+    # The same poll with the ETag of the previous answer, as browsers send it
+    ('notification_poll_unchanged', 'EMPLOYEE', 'notifications:unread_count', 304),
+    ('notification_dropdown', 'EMPLOYEE', 'notifications:recent', 200),
+    ('activity_log', 'ENTERPRISE', 'notifications:activity_log', 200),
+)
+
+
+def _percentile(ordered, percent):
+    """Nearest-rank percentile of an ordered list"""
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(timings, query_counts):
+    timings = sorted(timings)
+    query_counts = sorted(query_counts)
+    return {
+        'p50': round(_percentile(timings, 50) * 1000, 3),
+        'p95': round(_percentile(timings, 95) * 1000, 3),
+        'p99': round(_percentile(timings, 99) * 1000, 3),
+        'mean': round(sum(timings) / len(timings) * 1000, 3),
+        'max': round(timings[-1] * 1000, 3),
+        'queries': _percentile(query_counts, 50),
+        'queries_max': query_counts[-1],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark latency and query counts of the key views against seed_load data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='load', help='seed_load --prefix of the users to sign in as')
+        parser.add_argument('--requests', type=int, default=20, help='Measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests per endpoint first')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Only benchmark this endpoint (repeatable)')
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1.')
+        endpoints = [endpoint for endpoint in ENDPOINTS
+                     if not options['endpoints'] or endpoint[0] in options['endpoints']]
+        if not endpoints:
+            raise CommandError(f'Unknown endpoint; choose from {", ".join(name for name, *_ in ENDPOINTS)}.')
+
+        users = self.get_users(options['prefix'])
+        clients = {}
+        for role, user in users.items():
+            clients[role] = Client()
+            clients[role].force_login(user)
+        task = Task.objects.visible_to(users['MANAGER']).order_by('pk').first()
+        if task is None:
+            raise CommandError('The seeded manager has no tasks; seed with --tasks above 0.')
+
+        results = {}
+        # The test client talks to 'testserver'
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name, role, url_name, expected in endpoints:
+                url = reverse(url_name, args=[task.pk] if url_name == 'tasks:detail' else [])
+                results[name] = self.measure(clients[role], url, expected, options)
+                self.stderr.write(f'{name}: p50 {results[name]["p50"]} ms, {results[name]["queries"]} queries')
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'vendor': connection.vendor,
+            'prefix': options['prefix'],
+            'requests': options['requests'],
+            'warmup': options['warmup'],
+            'endpoints': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+        self.stdout.write(output)
+
+    def get_users(self, prefix):
+        """The first seeded organization's user of each role"""
+        admin = User.objects.filter(
+            username__startswith=f'{prefix}-', profile__role='ENTERPRISE'
+        ).select_related('profile').order_by('pk').first()
+        if admin is None:
+            raise CommandError(f'No seeded data for prefix "{prefix}"; run seed_load first.')
+        users = {'ENTERPRISE': admin}
+        for role in ('MANAGER', 'EMPLOYEE'):
+            users[role] = User.objects.filter(
+                profile__organization_id=admin.profile.organization_id, profile__role=role
+            ).order_by('pk').first()
+            if users[role] is None:
+                raise CommandError(f'The seeded organization has no {role.lower()}.')
+        return users
+
+    def measure(self, client, url, expected, options):
+        headers = {}
+        if expected == 304:
+            headers['HTTP_IF_NONE_MATCH'] = client.get(url)['ETag']
+
+        for _ in range(options['warmup']):
+            client.get(url, **headers)
+
+        timings, query_counts = [], []
+        for _ in range(options['requests']):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url, **headers)
+                timings.append(time.perf_counter() - started)
+            if response.status_code != expected:
+                raise CommandError(f'{url} answered {response.status_code}, expected {expected}.')
+            query_counts.append(len(queries))
+        return dict(summarize(timings, query_counts), status=expected)
@@ -0,0 +1,69 @@
+"""
+Print EXPLAIN plans for the hottest queries in CloudTask so index usage
+can be checked on both SQLite and PostgreSQL.
+
+Usage:
+    python manage.py explain_hot_queries
+    python manage.py explain_hot_queries --user alice
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+
+from notifications.models import Notification, ActivityLog
+from projects.models import Project
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN plans for the hot notification, activity and task queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Username to build the queries for (defaults to the first user with a profile)'
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options.get('user'))
+        organization = user.profile.organization
+        org_id = organization.id if organization else 0
+        project = Project.objects.filter(organization_id=org_id).first()
+        project_id = project.id if project else 0
+
+        queries = [
+            ('Unread notification count (context processor)',
+             Notification.objects.filter(recipient=user, is_read=False).order_by()),
+            ('Recent notifications (dropdown)',
+             Notification.objects.filter(recipient=user).order_by('-created_at')[:5]),
+            ('Activity feed per organization',
+             ActivityLog.objects.filter(organization_id=org_id).order_by('-created_at')[:50]),
+            ('Projects per organization (annotated cards)',
+             Project.objects.filter(organization_id=org_id).select_related('manager')
+             .with_counts().order_by('-created_at')[:5]),
+            ('Tasks by project and status (kanban)',
+             Task.objects.filter(project_id=project_id, status='TODO')),
+            ('Tasks by assignee and status (employee views)',
+             Task.objects.filter(assigned_to=user, status='IN_PROGRESS')),
+            ('Overdue tasks per project',
+             Task.objects.filter(project_id=project_id, due_date__lt=timezone.now().date())
+             .exclude(status='DONE')),
+        ]
+
+        self.stdout.write(f'Database vendor: {connection.vendor}')
+        for title, queryset in queries:
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain())
+
+    def get_user(self, username):
+        """Return the user to build query parameters for"""
+        users = User.objects.filter(profile__isnull=False).select_related('profile')
+        if username:
+            users = users.filter(username=username)
+        user = users.order_by('pk').first()
+        if user is None:
+            raise CommandError('No user with a profile was found.')
+        return user
@@ -0,0 +1,41 @@
+"""
+Recompute every DashboardMetrics row from the source tables, repairing any
+drift left by writes that bypass signals (QuerySet.update, raw SQL, restores).
+Meant to run nightly.
+
+Usage:
+    python manage.py rebuild_dashboard_metrics
+    python manage.py rebuild_dashboard_metrics --organization 3
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from dashboard.models import DashboardMetrics
+from projects.models import Organization
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized dashboard metrics for every organization and manager'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=int, help='Only rebuild this organization id')
+
+    def handle(self, *args, **options):
+        organizations = Organization.objects.all()
+        if options['organization']:
+            organizations = organizations.filter(pk=options['organization'])
+
+        managers = User.objects.filter(
+            Q(profile__role='MANAGER', profile__organization__in=organizations)
+            | Q(managed_projects__organization__in=organizations)
+        ).distinct()
+
+        for organization in organizations:
+            DashboardMetrics.rebuild(organization=organization)
+        for manager in managers:
+            DashboardMetrics.rebuild(manager=manager)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt metrics for {organizations.count()} organization(s) and {managers.count()} manager(s).'
+        ))
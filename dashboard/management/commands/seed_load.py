@@ -0,0 +1,205 @@
+"""
+Generate synthetic multi-tenant data for load testing and benchmarks.
+
+Every organization gets an enterprise admin, managers and employees, projects
+with members, tasks with dependency edges and comments, notifications for
+every user and an activity history. Rows are written with bulk_create, so the
+command then rebuilds what signals would have maintained: the dependency
+closure, dashboard metrics and unread counters.
+
+Usage:
+    python manage.py seed_load                                    # 3 small organizations
+    python manage.py seed_load --organizations 20 --tasks 200 --activities 5000
+    python manage.py seed_load --prefix bench --seed 7
+
+Users are named <prefix>-<org>-admin, <prefix>-<org>-manager<n> and
+<prefix>-<org>-employee<n>, all with the --password password.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from dashboard import fragments
+from dashboard.models import DashboardMetrics
+from notifications.models import ActivityLog, Notification, NotificationCounter
+from projects.models import Organization, Project, ProjectMember
+from tasks import closure
+from tasks.models import Task, TaskComment
+
+BATCH_SIZE = 1000
+
+# Most tasks are open; about a third are done
+STATUS_WEIGHTS = {'TODO': 35, 'IN_PROGRESS': 20, 'IN_REVIEW': 10, 'DONE': 35}
+
+# Share of seeded notifications already read
+READ_SHARE = 0.7
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic organizations, projects, tasks, notifications and activity for load tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organizations', type=int, default=3)
+        parser.add_argument('--managers', type=int, default=3, help='Managers per organization')
+        parser.add_argument('--employees', type=int, default=10, help='Employees per organization')
+        parser.add_argument('--projects', type=int, default=5, help='Projects per organization')
+        parser.add_argument('--members', type=int, default=5, help='Employees per project')
+        parser.add_argument('--tasks', type=int, default=50, help='Tasks per project')
+        parser.add_argument('--dependencies', type=int, default=20, help='Dependency edges per project')
+        parser.add_argument('--comments', type=int, default=2, help='Average comments per task')
+        parser.add_argument('--notifications', type=int, default=20, help='Notifications per user')
+        parser.add_argument('--activities', type=int, default=500, help='Activity rows per organization')
+        parser.add_argument('--prefix', default='load', help='Username prefix of the generated users')
+        parser.add_argument('--password', default='loadtest123', help='Password of every generated user')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for repeatable data')
+
+    def handle(self, *args, **options):
+        if options['organizations'] < 1 or options['managers'] < 1 or options['employees'] < 1:
+            raise CommandError('--organizations, --managers and --employees must be at least 1.')
+        if User.objects.filter(username__startswith=f'{options["prefix"]}-').exists():
+            raise CommandError(f'Users with the prefix "{options["prefix"]}" already exist; pick another --prefix.')
+
+        rng = random.Random(options['seed'])
+        password = make_password(options['password'])
+        totals = dict.fromkeys(
+            ('users', 'projects', 'tasks', 'dependencies', 'comments', 'notifications', 'activities'), 0
+        )
+        for number in range(1, options['organizations'] + 1):
+            with transaction.atomic():
+                self.seed_organization(number, rng, password, options, totals)
+            self.stderr.write(f'Seeded organization {number}/{options["organizations"]}')
+        NotificationCounter.reconcile()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {options["organizations"]} organization(s): '
+            + ', '.join(f'{count} {name}' for name, count in totals.items())
+        ))
+
+    def create_users(self, names, password):
+        User.objects.bulk_create([User(username=name, password=password) for name in names])
+        users = {user.username: user for user in User.objects.filter(username__in=names)}
+        return [users[name] for name in names]
+
+    def seed_organization(self, number, rng, password, options, totals):
+        prefix = f'{options["prefix"]}-{number}'
+        now = timezone.now()
+
+        admin, = self.create_users([f'{prefix}-admin'], password)
+        managers = self.create_users([f'{prefix}-manager{n}' for n in range(1, options['managers'] + 1)], password)
+        employees = self.create_users([f'{prefix}-employee{n}' for n in range(1, options['employees'] + 1)], password)
+        organization = Organization.objects.create(name=f'{options["prefix"].title()} Org {number}', created_by=admin)
+        UserProfile.objects.bulk_create(
+            [UserProfile(user=admin, role='ENTERPRISE', organization=organization)]
+            + [UserProfile(user=user, role='MANAGER', organization=organization) for user in managers]
+            + [UserProfile(user=user, role='EMPLOYEE', organization=organization) for user in employees]
+        )
+        users = [admin, *managers, *employees]
+        totals['users'] += len(users)
+
+        projects = Project.objects.bulk_create([
+            Project(
+                name=f'Project {number}.{n}',
+                organization=organization,
+                manager=rng.choice(managers),
+                created_by=admin,
+                status=rng.choice(['PLANNING', 'IN_PROGRESS', 'IN_PROGRESS', 'ON_HOLD', 'COMPLETED']),
+            )
+            for n in range(1, options['projects'] + 1)
+        ])
+        members = {
+            project.pk: rng.sample(employees, min(options['members'], len(employees)))
+            for project in projects
+        }
+        ProjectMember.objects.bulk_create([
+            ProjectMember(project=project, user=user) for project in projects for user in members[project.pk]
+        ])
+        totals['projects'] += len(projects)
+
+        statuses, weights = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+        priorities = [choice for choice, _ in Task.PRIORITY_CHOICES]
+        tasks = []
+        for project in projects:
+            for n in range(1, options['tasks'] + 1):
+                tasks.append(Task(
+                    title=f'Task {number}.{project.pk}.{n}',
+                    description='Generated by seed_load',
+                    project=project,
+                    assigned_to=rng.choice(members[project.pk] or [None]),
+                    created_by=project.manager,
+                    status=rng.choices(statuses, weights)[0],
+                    priority=rng.choice(priorities),
+                    due_date=(now + timedelta(days=rng.randint(-30, 60))).date(),
+                    position=n * 1024,
+                ))
+        tasks = Task.objects.bulk_create(tasks, batch_size=BATCH_SIZE)
+        totals['tasks'] += len(tasks)
+
+        # Edges only point at earlier tasks of the same project, so there are no cycles
+        by_project = {}
+        for task in tasks:
+            by_project.setdefault(task.project_id, []).append(task)
+        edges = set()
+        for project_tasks in by_project.values():
+            if len(project_tasks) < 2:
+                continue
+            for _ in range(options['dependencies']):
+                later = rng.randrange(1, len(project_tasks))
+                edges.add((project_tasks[later].pk, project_tasks[rng.randrange(later)].pk))
+        Task.depends_on.through.objects.bulk_create([
+            Task.depends_on.through(from_task_id=from_id, to_task_id=to_id) for from_id, to_id in edges
+        ], batch_size=BATCH_SIZE)
+        for project in projects:
+            closure.rebuild(project.pk)
+        totals['dependencies'] += len(edges)
+
+        comments = []
+        for task in tasks:
+            authors = members[task.project_id] + [task.created_by]
+            for _ in range(rng.randint(0, 2 * options['comments'])):
+                comments.append(TaskComment(task=task, user=rng.choice(authors), comment='Looks good, carrying on.'))
+        TaskComment.objects.bulk_create(comments, batch_size=BATCH_SIZE)
+        totals['comments'] += len(comments)
+
+        types = [choice for choice, _ in Notification.TYPE_CHOICES]
+        notifications = [
+            Notification(
+                recipient=user,
+                notification_type=rng.choice(types),
+                title='Something changed',
+                message=f'Update on {rng.choice(tasks).title}' if tasks else 'Update',
+                is_read=rng.random() < READ_SHARE,
+                created_at=now - timedelta(minutes=rng.randint(0, 60 * 24 * 60)),
+            )
+            for user in users for _ in range(options['notifications'])
+        ]
+        Notification.objects.bulk_create(notifications, batch_size=BATCH_SIZE)
+        totals['notifications'] += len(notifications)
+
+        actions = [choice for choice, _ in ActivityLog.ACTION_CHOICES]
+        activities = []
+        for _ in range(options['activities'] if tasks else 0):
+            task = rng.choice(tasks)
+            activities.append(ActivityLog(
+                user=rng.choice([task.created_by, *members[task.project_id]]),
+                action=rng.choice(actions),
+                entity_type='TASK',
+                entity_id=task.pk,
+                entity_name=task.title,
+                organization_id=organization.pk,
+                description=f'updated "{task.title}"',
+                created_at=now - timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+            ))
+        ActivityLog.objects.bulk_create(activities, batch_size=BATCH_SIZE)
+        totals['activities'] += len(activities)
+
+        # bulk_create skipped the signals that keep these current
+        DashboardMetrics.rebuild(organization=organization)
+        for manager in managers:
+            DashboardMetrics.rebuild(manager=manager)
+        fragments.bump(organization.pk)
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.1 on 2026-10-16 22:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('projects', '0003_project_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('project_count', models.IntegerField(default=0)),
+                ('task_count', models.IntegerField(default=0)),
+                ('todo_count', models.IntegerField(default=0)),
+                ('in_progress_count', models.IntegerField(default=0)),
+                ('in_review_count', models.IntegerField(default=0)),
+                ('done_count', models.IntegerField(default=0)),
+                ('manager_count', models.IntegerField(default=0)),
+                ('employee_count', models.IntegerField(default=0)),
+                ('projects_this_week', models.IntegerField(default=0)),
+                ('tasks_created_this_week', models.IntegerField(default=0)),
+                ('tasks_completed_this_week', models.IntegerField(default=0)),
+                ('overdue_count', models.IntegerField(default=0)),
+                ('window_refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('manager', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_metrics', to=settings.AUTH_USER_MODEL)),
+                ('organization', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_metrics', to='projects.organization')),
+            ],
+            options={
+                'verbose_name_plural': 'Dashboard metrics',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dashboardmetrics',
+            constraint=models.UniqueConstraint(condition=models.Q(('manager__isnull', True)), fields=('organization',), name='unique_org_dashboard_metrics'),
+        ),
+        migrations.AddConstraint(
+            model_name='dashboardmetrics',
+            constraint=models.UniqueConstraint(condition=models.Q(('manager__isnull', False)), fields=('manager',), name='unique_manager_dashboard_metrics'),
+        ),
+    ]
@@ -1,3 +1,198 @@
+from datetime import timedelta
+
 from django.db import models
+from django.db.models import F, Q
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+
+class DashboardMetrics(models.Model):
+    """
+    DashboardMetrics model - materialized dashboard counters
+    One row per organization (manager is empty) and one row per manager.
+    Counters are kept up to date by signals in dashboard/signals.py; the
+    time-windowed figures are refreshed lazily once they are older than
+    WINDOW_TTL, and rebuild_dashboard_metrics repairs any drift.
+    """
+    WINDOW_TTL = timedelta(minutes=15)
+
+    # Counters maintained incrementally with F() updates
+    COUNTER_FIELDS = (
+        'project_count', 'task_count', 'todo_count', 'in_progress_count',
+        'in_review_count', 'done_count', 'manager_count', 'employee_count',
+    )
+
+    organization = models.ForeignKey(
+        'projects.Organization',
+        on_delete=models.CASCADE,
+        related_name='dashboard_metrics',
+        null=True,
+        blank=True
+    )
+    manager = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='dashboard_metrics',
+        null=True,
+        blank=True
+    )
+
+    project_count = models.IntegerField(default=0)
+    task_count = models.IntegerField(default=0)
+    todo_count = models.IntegerField(default=0)
+    in_progress_count = models.IntegerField(default=0)
+    in_review_count = models.IntegerField(default=0)
+    done_count = models.IntegerField(default=0)
+    manager_count = models.IntegerField(default=0)
+    employee_count = models.IntegerField(default=0)
+
+    # Time-windowed figures, refreshed every WINDOW_TTL
+    projects_this_week = models.IntegerField(default=0)
+    tasks_created_this_week = models.IntegerField(default=0)
+    tasks_completed_this_week = models.IntegerField(default=0)
+    overdue_count = models.IntegerField(default=0)
+    window_refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        if self.manager_id:
+            return f"Metrics for manager {self.manager_id}"
+        return f"Metrics for organization {self.organization_id}"
+
+    class Meta:
+        verbose_name_plural = 'Dashboard metrics'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization'],
+                condition=Q(manager__isnull=True),
+                name='unique_org_dashboard_metrics'
+            ),
+            models.UniqueConstraint(
+                fields=['manager'],
+                condition=Q(manager__isnull=False),
+                name='unique_manager_dashboard_metrics'
+            ),
+        ]
+
+    @staticmethod
+    def status_field(status):
+        """Counter field for a task status, e.g. 'IN_REVIEW' -> 'in_review_count'"""
+        return f'{status.lower()}_count'
+
+    @classmethod
+    def scope_filter(cls, organization_id=None, manager_id=None):
+        """Q matching the metric rows for an organization and/or a manager"""
+        scopes = Q(pk__in=[])
+        if organization_id:
+            scopes |= Q(organization_id=organization_id, manager__isnull=True)
+        if manager_id:
+            scopes |= Q(manager_id=manager_id)
+        return scopes
+
+    @classmethod
+    def apply_delta(cls, organization_id=None, manager_id=None, **deltas):
+        """
+        Atomically add `deltas` to the counters of the given scopes.
+        Rows that do not exist yet are skipped; they are built in full on first read.
+        """
+        changes = {field: F(field) + amount for field, amount in deltas.items() if amount}
+        if changes:
+            cls.objects.filter(cls.scope_filter(organization_id, manager_id)).update(**changes)
+
+    @classmethod
+    def for_organization(cls, organization):
+        """Return the organization's metrics, building the row if needed"""
+        metrics = cls.objects.filter(organization=organization, manager__isnull=True).first()
+        if metrics is None:
+            metrics = cls.rebuild(organization=organization)
+        metrics.refresh_window_if_stale()
+        return metrics
+
+    @classmethod
+    def for_manager(cls, manager):
+        """Return a manager's metrics, building the row if needed"""
+        metrics = cls.objects.filter(manager=manager).first()
+        if metrics is None:
+            metrics = cls.rebuild(manager=manager)
+        metrics.refresh_window_if_stale()
+        return metrics
+
+    @classmethod
+    def rebuild(cls, organization=None, manager=None):
+        """Recompute every figure for one scope from the source tables"""
+        from accounts.models import UserProfile
+        from projects.models import Project
+        from tasks.models import Task
+
+        if manager is not None:
+            projects = Project.objects.filter(manager=manager)
+            tasks = Task.objects.filter(project__manager=manager)
+            lookup = {'manager': manager}
+        else:
+            projects = Project.objects.filter(organization=organization)
+            tasks = Task.objects.filter(project__organization=organization)
+            lookup = {'organization': organization, 'manager__isnull': True}
+
+        stats = tasks.stats()
+        values = {field: stats[field] for field in (
+            'task_count', 'todo_count', 'in_progress_count', 'in_review_count', 'done_count',
+            'tasks_created_this_week', 'tasks_completed_this_week', 'overdue_count',
+        )}
+        values['project_count'] = projects.count()
+        values['projects_this_week'] = projects.filter(
+            created_at__gte=timezone.now() - timedelta(days=7)
+        ).count()
+        values['window_refreshed_at'] = timezone.now()
+
+        if manager is None:
+            roles = UserProfile.objects.filter(organization=organization).aggregate(
+                manager_count=models.Count('pk', filter=Q(role='MANAGER')),
+                employee_count=models.Count('pk', filter=Q(role='EMPLOYEE')),
+            )
+            values.update(roles)
+
+        metrics, _ = cls.objects.update_or_create(defaults=values, **lookup)
+        return metrics
+
+    def refresh_window_if_stale(self):
+        """Recompute the time-windowed figures once they are older than WINDOW_TTL"""
+        now = timezone.now()
+        if self.window_refreshed_at and now - self.window_refreshed_at < self.WINDOW_TTL:
+            return
+
+        from projects.models import Project
+        from tasks.models import Task
+
+        if self.manager_id:
+            projects = Project.objects.filter(manager_id=self.manager_id)
+            tasks = Task.objects.filter(project__manager_id=self.manager_id)
+        else:
+            projects = Project.objects.filter(organization_id=self.organization_id)
+            tasks = Task.objects.filter(project__organization_id=self.organization_id)
+
+        stats = tasks.stats()
+        self.tasks_created_this_week = stats['tasks_created_this_week']
+        self.tasks_completed_this_week = stats['tasks_completed_this_week']
+        self.overdue_count = stats['overdue_count']
+        self.projects_this_week = projects.filter(created_at__gte=now - timedelta(days=7)).count()
+        self.window_refreshed_at = now
+        DashboardMetrics.objects.filter(pk=self.pk).update(
+            tasks_created_this_week=self.tasks_created_this_week,
+            tasks_completed_this_week=self.tasks_completed_this_week,
+            overdue_count=self.overdue_count,
+            projects_this_week=self.projects_this_week,
+            window_refreshed_at=now,
+        )
 
-# Create your models here.
+    def as_context(self):
+        """Dashboard template variables"""
+        context = {field: getattr(self, field) for field in self.COUNTER_FIELDS}
+        context.update({
+            'projects_this_week': self.projects_this_week,
+            'tasks_created_this_week': self.tasks_created_this_week,
+            'tasks_completed_this_week': self.tasks_completed_this_week,
+            'overdue_count': self.overdue_count,
+            'active_task_count': self.todo_count + self.in_progress_count + self.in_review_count,
+        })
+        return context
@@ -0,0 +1,158 @@
+"""
+Per-view SQL profiling.
+
+SQLProfilingMiddleware records, for each profiled request, the query count,
+total database time, duplicated statements and the slowest statements, and
+keeps the last SQL_PROFILING_BUFFER records in a per-process ring buffer shown
+at /_perf/ (staff only). Requests are profiled when settings.SQL_PROFILING is
+on, or when a staff user sends the X-Profile-SQL header; profiled responses
+carry X-SQL-Queries and X-SQL-Time headers.
+
+Statements are captured by a wrapper installed on every new database
+connection. It only records inside capture() (a context variable holds the
+collectors), so it costs one lookup per query otherwise and follows sync views
+run in a worker thread under ASGI. Statements keep their %s placeholders, so
+repeats that differ only in parameters share a fingerprint.
+"""
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils import timezone
+
+HEADER = 'HTTP_X_PROFILE_SQL'
+
+# Statements listed per record under duplicates and slowest
+TOP_STATEMENTS = 5
+
+# Lists receiving (sql, seconds) of each statement; captures can nest
+_collectors = ContextVar('sql_profile_collectors', default=())
+_lock = threading.Lock()
+_buffer = deque(maxlen=getattr(settings, 'SQL_PROFILING_BUFFER', 200))
+
+
+def _record_query(execute, sql, params, many, context):
+    collectors = _collectors.get()
+    if not collectors:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        statement = (sql, time.perf_counter() - started)
+        for collector in collectors:
+            collector.append(statement)
+
+
+@contextmanager
+def capture():
+    """Yield a list collecting (sql, seconds) of every statement run inside the block"""
+    statements = []
+    token = _collectors.set((*_collectors.get(), statements))
+    try:
+        yield statements
+    finally:
+        _collectors.reset(token)
+
+
+@receiver(connection_created)
+def install_wrapper(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def fingerprint(sql):
+    """The statement with IN lists of any length collapsed, so repeats group together"""
+    return re.sub(r'\(\s*%s(?:\s*,\s*%s)*\s*\)', '(...)', sql)
+
+
+def duplicates(statements):
+    """[{'sql', 'count', 'ms'}] of fingerprints run more than once, most repeated first"""
+    groups = {}
+    for sql, seconds in statements:
+        group = groups.setdefault(fingerprint(sql), {'sql': fingerprint(sql), 'count': 0, 'ms': 0.0})
+        group['count'] += 1
+        group['ms'] += seconds * 1000
+    repeated = [dict(group, ms=round(group['ms'], 3)) for group in groups.values() if group['count'] > 1]
+    return sorted(repeated, key=lambda group: (-group['count'], -group['ms']))
+
+
+def summarize(request, response, statements, duration):
+    match = request.resolver_match
+    return {
+        'at': timezone.now().isoformat(),
+        'method': request.method,
+        'path': request.path,
+        'view': match.view_name if match else '',
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'queries': len(statements),
+        'db_ms': round(sum(seconds for _, seconds in statements) * 1000, 3),
+        'duplicates': duplicates(statements)[:TOP_STATEMENTS],
+        'slowest': [
+            {'sql': sql, 'ms': round(seconds * 1000, 3)}
+            for sql, seconds in sorted(statements, key=lambda statement: -statement[1])[:TOP_STATEMENTS]
+        ],
+    }
+
+
+def records():
+    """Buffered records, newest first"""
+    with _lock:
+        return list(reversed(_buffer))
+
+
+def clear():
+    with _lock:
+        _buffer.clear()
+
+
+def _store(request, response, statements, duration):
+    record = summarize(request, response, statements, duration)
+    with _lock:
+        _buffer.append(record)
+    response['X-SQL-Queries'] = str(record['queries'])
+    response['X-SQL-Time'] = f'{record["db_ms"]}ms'
+
+
+class SQLProfilingMiddleware:
+    """Profile requests as described in the module docstring; place it after ActorMiddleware"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not (getattr(settings, 'SQL_PROFILING', False)
+                or (HEADER in request.META and request.user.is_staff)):
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with capture() as statements:
+            response = self.get_response(request)
+        _store(request, response, statements, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'SQL_PROFILING', False):
+            if HEADER not in request.META or not (await request.auser()).is_staff:
+                return await self.get_response(request)
+
+        started = time.perf_counter()
+        with capture() as statements:
+            response = await self.get_response(request)
+        # Streamed responses only count the queries run before streaming started
+        _store(request, response, statements, time.perf_counter() - started)
+        return response
@@ -0,0 +1,198 @@
+"""
+Keep DashboardMetrics in step with Task, Project and UserProfile writes.
+
+Common changes (create, delete, status or role change) are applied as F()
+deltas. Rare changes that move rows between scopes (a task moving project,
+a project changing manager) rebuild the affected scopes instead.
+QuerySet.update() bypasses these signals; callers that bulk-update must
+adjust the metrics themselves, and rebuild_dashboard_metrics repairs drift.
+
+Writes to Task, Project, ProjectMember and ActivityLog also bump the
+organization's fragment cache version (see dashboard/fragments.py).
+"""
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from accounts.models import UserProfile
+from notifications.models import ActivityLog
+from projects.models import Organization, Project, ProjectMember
+from tasks.models import Task
+from . import fragments
+from .models import DashboardMetrics
+
+
+def _snapshot(instance, fields):
+    """Remember loaded field values without triggering deferred-field queries"""
+    instance._metrics_snapshot = {field: instance.__dict__.get(field) for field in fields}
+
+
+def _project_scope(project_id):
+    """(organization_id, manager_id) for a project id"""
+    if not project_id:
+        return None, None
+    scope = Project.objects.filter(pk=project_id).values_list('organization_id', 'manager_id').first()
+    return scope or (None, None)
+
+
+def _rebuild_scopes(organization_ids=(), manager_ids=()):
+    from django.contrib.auth.models import User
+
+    for organization in Organization.objects.filter(pk__in=[pk for pk in organization_ids if pk]):
+        DashboardMetrics.rebuild(organization=organization)
+    for manager in User.objects.filter(pk__in=[pk for pk in manager_ids if pk]):
+        DashboardMetrics.rebuild(manager=manager)
+
+
+# ---------- Tasks ----------
+
+@receiver(post_init, sender=Task)
+def snapshot_task(sender, instance, **kwargs):
+    _snapshot(instance, ('status', 'project_id'))
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, created, update_fields=None, **kwargs):
+    old = instance._metrics_snapshot
+    status_field = DashboardMetrics.status_field
+
+    if created:
+        organization_id, manager_id = _project_scope(instance.project_id)
+        DashboardMetrics.apply_delta(
+            organization_id, manager_id,
+            task_count=1, **{status_field(instance.status): 1}
+        )
+    elif old['project_id'] and old['project_id'] != instance.project_id:
+        # Task moved to another project: rebuild both sides
+        old_scope = _project_scope(old['project_id'])
+        new_scope = _project_scope(instance.project_id)
+        _rebuild_scopes(
+            organization_ids={old_scope[0], new_scope[0]},
+            manager_ids={old_scope[1], new_scope[1]}
+        )
+    elif old['status'] and old['status'] != instance.status:
+        organization_id, manager_id = _project_scope(instance.project_id)
+        DashboardMetrics.apply_delta(
+            organization_id, manager_id,
+            **{status_field(old['status']): -1, status_field(instance.status): 1}
+        )
+
+    _snapshot(instance, ('status', 'project_id'))
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, origin=None, **kwargs):
+    # Cascades from a project delete are handled by project_deleted
+    if isinstance(origin, Project):
+        return
+    organization_id, manager_id = _project_scope(instance.project_id)
+    DashboardMetrics.apply_delta(
+        organization_id, manager_id,
+        task_count=-1, **{DashboardMetrics.status_field(instance.status): -1}
+    )
+
+
+# ---------- Projects ----------
+
+@receiver(post_init, sender=Project)
+def snapshot_project(sender, instance, **kwargs):
+    _snapshot(instance, ('organization_id', 'manager_id'))
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, created, **kwargs):
+    old = instance._metrics_snapshot
+
+    if created:
+        DashboardMetrics.apply_delta(
+            instance.organization_id, instance.manager_id,
+            project_count=1, projects_this_week=1
+        )
+    elif (old['organization_id'] != instance.organization_id
+          or old['manager_id'] != instance.manager_id):
+        _rebuild_scopes(
+            organization_ids={old['organization_id'], instance.organization_id},
+            manager_ids={old['manager_id'], instance.manager_id}
+        )
+
+    _snapshot(instance, ('organization_id', 'manager_id'))
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    # Deferred to commit so the rest of a cascade (e.g. the organization or
+    # manager being deleted) has finished; scopes that are gone are skipped.
+    organization_ids, manager_ids = {instance.organization_id}, {instance.manager_id}
+    transaction.on_commit(lambda: _rebuild_scopes(organization_ids, manager_ids))
+
+
+# ---------- Staff ----------
+
+ROLE_FIELDS = {'MANAGER': 'manager_count', 'EMPLOYEE': 'employee_count'}
+
+
+def _role_delta(organization_id, role, amount):
+    field = ROLE_FIELDS.get(role)
+    if organization_id and field:
+        DashboardMetrics.apply_delta(organization_id, **{field: amount})
+
+
+@receiver(post_init, sender=UserProfile)
+def snapshot_profile(sender, instance, **kwargs):
+    _snapshot(instance, ('role', 'organization_id'))
+
+
+@receiver(post_save, sender=UserProfile)
+def profile_saved(sender, instance, created, **kwargs):
+    old = instance._metrics_snapshot
+
+    if created:
+        _role_delta(instance.organization_id, instance.role, 1)
+    elif old['role'] != instance.role or old['organization_id'] != instance.organization_id:
+        _role_delta(old['organization_id'], old['role'], -1)
+        _role_delta(instance.organization_id, instance.role, 1)
+
+    _snapshot(instance, ('role', 'organization_id'))
+
+
+@receiver(post_delete, sender=UserProfile)
+def profile_deleted(sender, instance, **kwargs):
+    _role_delta(instance.organization_id, instance.role, -1)
+
+
+# ---------- Fragment cache ----------
+
+def _organization_of(instance):
+    """Organization id of a Task or ProjectMember, reusing a loaded project"""
+    if instance._state.fields_cache.get('project') is not None:
+        return instance.project.organization_id
+    return _project_scope(instance.project_id)[0]
+
+
+@receiver(post_save, sender=Organization)
+def organization_created(sender, instance, created, **kwargs):
+    if created:
+        fragments.bump(instance.pk)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_changed(sender, instance, **kwargs):
+    fragments.bump(instance.organization_id)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+@receiver(post_save, sender=ProjectMember)
+@receiver(post_delete, sender=ProjectMember)
+def project_child_changed(sender, instance, origin=None, **kwargs):
+    # Cascades from a project delete are covered by project_changed
+    if isinstance(origin, Project):
+        return
+    fragments.bump(_organization_of(instance))
+
+
+@receiver(post_save, sender=ActivityLog)
+@receiver(post_delete, sender=ActivityLog)
+def activity_changed(sender, instance, **kwargs):
+    fragments.bump(instance.organization_id)
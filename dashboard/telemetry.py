@@ -0,0 +1,312 @@
+"""
+Prometheus metrics for the web workers and the outbox worker.
+
+Request latency histograms and request counts per URL name, database queries
+and time per view, cache hits and misses, notification fan-out and outbox lag
+are served in the Prometheus text format at /_metrics/ (staff, or a request
+bearing METRICS_TOKEN).
+
+Values live in process memory. With METRICS_DIR set, every process also writes
+its values to its own file there, at most every METRICS_FLUSH_INTERVAL seconds
+and on exit, and the endpoint sums all the files, so a single scrape covers
+every gunicorn worker and process_outbox. Files of exited processes keep
+counting, as Prometheus expects of counters; empty the directory on deploy,
+before the workers start.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LAG_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+# Notifications per dispatched action
+FANOUT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+REGISTRY = {}
+
+_lock = threading.Lock()
+# (metric name, label values) -> counter value, or histogram bucket counts followed by the sum
+_values = {}
+_process = {'pid': None, 'file': None, 'flushed': 0.0}
+_db_usage = ContextVar('metrics_db_usage', default=None)
+
+
+def _directory():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def _own_values():
+    """This process's values; a forked worker starts empty instead of sharing its parent's"""
+    if _process['pid'] != os.getpid():
+        _values.clear()
+        _process.update(pid=os.getpid(), file=f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json', flushed=time.monotonic())
+    return _values
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY[name] = self
+
+    def key(self, labels):
+        return self.name, tuple(str(labels[name]) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with _lock:
+            values = _own_values()
+            values[key] = values.get(key, 0) + amount
+        _maybe_flush()
+
+    def samples(self, labels, value):
+        yield self.name, labels, value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        REGISTRY[name] = self
+
+    key = Counter.key
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with _lock:
+            values = _own_values()
+            state = values.get(key)
+            if state is None:
+                # One count per bucket plus +Inf, then the sum
+                state = values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[bisect_left(self.buckets, value)] += 1
+            state[-1] += value
+        _maybe_flush()
+
+    def samples(self, labels, state):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), state[:-1]):
+            cumulative += count
+            yield f'{self.name}_bucket', (*labels, ('le', _number(bound))), cumulative
+        yield f'{self.name}_sum', labels, state[-1]
+        yield f'{self.name}_count', labels, cumulative
+
+
+def _merge(total, values):
+    for key, value in values.items():
+        if key not in total:
+            total[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(value, list):
+            total[key] = [a + b for a, b in zip(total[key], value)]
+        else:
+            total[key] += value
+    return total
+
+
+def _snapshot():
+    with _lock:
+        return _merge({}, _own_values())
+
+
+def flush():
+    """Write this process's values to its file in METRICS_DIR"""
+    directory = _directory()
+    if not directory:
+        return
+    values = _snapshot()
+    path = os.path.join(directory, _process['file'])
+    with open(f'{path}.tmp', 'w') as handle:
+        json.dump([[name, labels, value] for (name, labels), value in values.items()], handle)
+    # Readers only ever see complete files
+    os.replace(f'{path}.tmp', path)
+
+
+def _maybe_flush():
+    if not _directory():
+        return
+    with _lock:
+        due = time.monotonic() - _process['flushed'] >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        if due:
+            _process['flushed'] = time.monotonic()
+    if due:
+        flush()
+
+
+atexit.register(flush)
+
+
+def collect():
+    """Values of this process plus, with METRICS_DIR, those of every other process"""
+    total = _snapshot()
+    directory = _directory()
+    if not directory:
+        return total
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json') or filename == _process['file']:
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as handle:
+                rows = json.load(handle)
+        except (OSError, ValueError):
+            # Replaced or removed while listing
+            continue
+        _merge(total, {(name, tuple(labels)): value for name, labels, value in rows})
+    return total
+
+
+def _number(value):
+    if value == '+Inf':
+        return value
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _line(name, labels, value):
+    if labels:
+        name += '{' + ','.join(f'{label}="{_escape(value)}"' for label, value in labels) + '}'
+    return f'{name} {_number(value)}'
+
+
+def gauges():
+    """(name, help, value) read from the database at scrape time"""
+    from django.utils import timezone
+    from notifications import outbox
+    from notifications.models import OutboxEvent
+
+    oldest = OutboxEvent.objects.filter(
+        processed_at__isnull=True, attempts__lt=outbox.MAX_ATTEMPTS
+    ).order_by('id').values_list('created_at', flat=True).first()
+    return [
+        ('cloudtask_outbox_pending_events', 'Outbox events waiting to be processed', outbox.pending_count()),
+        ('cloudtask_outbox_lag_seconds', 'Age of the oldest pending outbox event',
+         (timezone.now() - oldest).total_seconds() if oldest else 0),
+    ]
+
+
+def render():
+    """Every metric, summed over processes, in the Prometheus text format"""
+    values = collect()
+    lines = []
+    for metric in REGISTRY.values():
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for (name, labels), value in sorted(values.items()):
+            if name == metric.name:
+                for sample in metric.samples(tuple(zip(metric.labelnames, labels)), value):
+                    lines.append(_line(*sample))
+    for name, documentation, value in gauges():
+        lines.extend([f'# HELP {name} {documentation}', f'# TYPE {name} gauge', _line(name, (), value)])
+    return '\n'.join(lines) + '\n'
+
+
+def clear():
+    with _lock:
+        _own_values().clear()
+
+
+REQUEST_LATENCY = Histogram(
+    'cloudtask_http_request_duration_seconds', 'Time until the response is returned, by URL name',
+    ('view', 'method'), LATENCY_BUCKETS
+)
+REQUESTS = Counter('cloudtask_http_requests_total', 'Requests by URL name and status', ('view', 'method', 'status'))
+DB_QUERIES = Counter('cloudtask_db_queries_total', 'Database queries run by requests, by URL name', ('view',))
+DB_TIME = Counter('cloudtask_db_query_seconds_total', 'Database time spent by requests, by URL name', ('view',))
+CACHE_LOOKUPS = Counter('cloudtask_cache_lookups_total', 'Application cache lookups', ('cache', 'result'))
+NOTIFICATION_FANOUT = Histogram(
+    'cloudtask_notification_fanout', 'Notifications written per dispatched action', (), FANOUT_BUCKETS
+)
+OUTBOX_DELIVERY_LAG = Histogram(
+    'cloudtask_outbox_delivery_lag_seconds', 'Time from enqueueing an outbox event to applying it', (), LAG_BUCKETS
+)
+
+
+def cache_lookup(cache, hit):
+    CACHE_LOOKUPS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def _count_query(execute, sql, params, many, context):
+    usage = _db_usage.get()
+    if usage is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        usage[0] += 1
+        usage[1] += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_wrapper(sender, connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def _record(request, response, usage, duration):
+    match = request.resolver_match
+    view = match.view_name if match else 'unresolved'
+    REQUEST_LATENCY.observe(duration, view=view, method=request.method)
+    REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+    DB_QUERIES.inc(usage[0], view=view)
+    DB_TIME.inc(usage[1], view=view)
+
+
+class MetricsMiddleware:
+    """
+    Record request metrics; place it near the top so the latency includes the
+    other middleware. Streamed responses are timed until streaming starts.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        usage = [0, 0.0]
+        token = _db_usage.set(usage)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _db_usage.reset(token)
+        _record(request, response, usage, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        usage = [0, 0.0]
+        token = _db_usage.set(usage)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _db_usage.reset(token)
+        _record(request, response, usage, time.perf_counter() - started)
+        return response
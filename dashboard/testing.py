@@ -0,0 +1,48 @@
+"""
+Query budgets for views.
+
+Test cases mixing in QueryBudgetMixin declare the most queries each URL name
+may run, and assertWithinBudget fails once a change pushes a view over its
+budget, listing the duplicated statements that usually explain why:
+
+    class BudgetTests(QueryBudgetMixin, TestCase):
+        query_budgets = {'tasks:kanban': 8}
+
+        def test_kanban(self):
+            self.client.force_login(self.manager)
+            self.assertWithinBudget('tasks:kanban')
+
+Budgets count warm requests: one unmeasured request first fills the per-user
+caches (the actor's profile, dashboard fragments), like a browser session.
+"""
+from django.urls import reverse
+
+from .profiling import capture, duplicates
+
+
+class QueryBudgetMixin:
+    # URL name -> most queries a warm GET may run
+    query_budgets = {}
+
+    def assertWithinBudget(self, url_name, args=None, data=None, client=None, status=200):
+        """GET url_name (with query `data`) and fail when it runs more queries than its budget; returns the response"""
+        if url_name not in self.query_budgets:
+            self.fail(f'No query budget declared for {url_name}.')
+        budget = self.query_budgets[url_name]
+        client = client or self.client
+        url = reverse(url_name, args=args)
+
+        client.get(url, data)
+        # Statements with placeholders rather than CaptureQueriesContext's
+        # interpolated SQL, so an N+1 groups under one fingerprint
+        with capture() as statements:
+            response = client.get(url, data)
+        self.assertEqual(response.status_code, status)
+
+        if len(statements) > budget:
+            repeated = '\n'.join(f'  x{group["count"]}: {group["sql"]}' for group in duplicates(statements))
+            self.fail(
+                f'{url_name} ran {len(statements)} queries, over its budget of {budget}.'
+                + (f'\nDuplicated statements:\n{repeated}' if repeated else '')
+            )
+        return response
@@ -1,3 +1,474 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from accounts.models import UserProfile
+from projects.models import Organization, Project
+from tasks.models import Task
+from .models import DashboardMetrics
+from .testing import QueryBudgetMixin
+
+
+class DashboardFixturesMixin:
+    """One organization with a managed project holding 4 tasks"""
+
+    def setUp(self):
+        self.client = Client()
+        self.enterprise_user = User.objects.create_user(username='enterprise', password='password123')
+        self.organization = Organization.objects.create(name='Acme', created_by=self.enterprise_user)
+        UserProfile.objects.create(user=self.enterprise_user, role='ENTERPRISE', organization=self.organization)
+
+        self.manager = User.objects.create_user(username='manager', password='password123')
+        UserProfile.objects.create(user=self.manager, role='MANAGER', organization=self.organization)
+
+        self.employee = User.objects.create_user(username='employee', password='password123')
+        UserProfile.objects.create(user=self.employee, role='EMPLOYEE', organization=self.organization)
+
+        self.project = Project.objects.create(
+            name='Website',
+            organization=self.organization,
+            manager=self.manager,
+            created_by=self.enterprise_user
+        )
+        for status in ['TODO', 'TODO', 'IN_PROGRESS', 'DONE']:
+            Task.objects.create(
+                title=f'{status} task',
+                project=self.project,
+                created_by=self.manager,
+                assigned_to=self.employee,
+                status=status
+            )
+
+
+
+class DashboardStatsTests(DashboardFixturesMixin, TestCase):
+    def test_enterprise_dashboard_counts(self):
+        """Test that the enterprise dashboard shows aggregated task counts"""
+        self.client.force_login(self.enterprise_user)
+        response = self.client.get(reverse('dashboard:index'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['task_count'], 4)
+        self.assertEqual(response.context['active_task_count'], 3)
+        self.assertEqual(response.context['todo_count'], 2)
+        self.assertEqual(response.context['done_count'], 1)
+        self.assertEqual(response.context['manager_count'], 1)
+        self.assertEqual(response.context['employee_count'], 1)
+
+    def test_manager_dashboard_counts(self):
+        """Test that the manager dashboard shows counts for managed projects"""
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('dashboard:index'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['task_count'], 4)
+        self.assertEqual(response.context['in_progress_count'], 1)
+
+    def test_employee_dashboard_counts(self):
+        """Test that the employee dashboard shows counts for assigned tasks"""
+        self.client.force_login(self.employee)
+        response = self.client.get(reverse('dashboard:index'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['task_count'], 4)
+        self.assertEqual(response.context['todo_count'], 2)
+
+
+class DashboardMetricsTests(DashboardFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Materialize both rows so later writes are applied as deltas
+        DashboardMetrics.for_organization(self.organization)
+        DashboardMetrics.for_manager(self.manager)
+
+    def org_metrics(self):
+        return DashboardMetrics.objects.get(organization=self.organization, manager__isnull=True)
+
+    def manager_metrics(self):
+        return DashboardMetrics.objects.get(manager=self.manager)
+
+    def test_task_writes_apply_deltas(self):
+        """Test that creating, moving and deleting tasks keeps both scopes current"""
+        task = Task.objects.create(title='New', project=self.project, created_by=self.manager)
+        self.assertEqual(self.org_metrics().task_count, 5)
+        self.assertEqual(self.manager_metrics().todo_count, 3)
+
+        task.status = 'DONE'
+        task.save()
+        metrics = self.org_metrics()
+        self.assertEqual((metrics.todo_count, metrics.done_count), (2, 2))
+
+        task.delete()
+        metrics = self.manager_metrics()
+        self.assertEqual((metrics.task_count, metrics.done_count), (4, 1))
+
+    def test_project_and_staff_writes_apply_deltas(self):
+        """Test that project and role changes update the organization row"""
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Project.objects.create(name='Other', organization=self.organization,
+                                           manager=self.manager, created_by=self.enterprise_user)
+            self.assertEqual(self.org_metrics().project_count, 2)
+            other.delete()
+        self.assertEqual(self.org_metrics().project_count, 1)
+
+        profile = self.employee.profile
+        profile.role = 'MANAGER'
+        profile.save()
+        metrics = self.org_metrics()
+        self.assertEqual((metrics.manager_count, metrics.employee_count), (2, 0))
+
+    def test_project_delete_drops_its_tasks(self):
+        """Test that cascaded task deletes are accounted for once"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.delete()
+        metrics = self.org_metrics()
+        self.assertEqual((metrics.project_count, metrics.task_count, metrics.todo_count), (0, 0, 0))
+
+    def test_rebuild_command_repairs_drift(self):
+        """Test that bulk updates drift the counters and the rebuild fixes them"""
+        Task.objects.filter(project=self.project).update(status='DONE')
+        self.assertEqual(self.org_metrics().done_count, 1)
+
+        out = StringIO()
+        call_command('rebuild_dashboard_metrics', stdout=out)
+        self.assertEqual(self.org_metrics().done_count, 4)
+        self.assertEqual(self.manager_metrics().done_count, 4)
+        self.assertIn('1 organization(s) and 1 manager(s)', out.getvalue())
+
+    def test_dashboard_reads_one_row(self):
+        """Test that the enterprise dashboard reads counters instead of aggregating tasks"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.force_login(self.enterprise_user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('dashboard:index'))
+        self.assertFalse(any('"todo_count"' in query['sql'] and 'tasks_task' in query['sql']
+                             for query in queries.captured_queries))
+
+
+# Fragment caching is off by default with the per-process locmem cache
+@override_settings(FRAGMENT_CACHE_TIMEOUT=300)
+class FragmentCacheTests(DashboardFixturesMixin, TestCase):
+    def get_query_count(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_dashboard_fragments_are_reused_until_a_write(self):
+        """Test that cached blocks skip their queries and are invalidated by task writes"""
+        self.client.force_login(self.enterprise_user)
+        url = reverse('dashboard:index')
+
+        cold, _ = self.get_query_count(url)
+        warm, _ = self.get_query_count(url)
+        self.assertLess(warm, cold)
+
+        Task.objects.create(title='Fresh task', project=self.project, created_by=self.manager)
+        invalidated, _ = self.get_query_count(url)
+        self.assertGreater(invalidated, warm)
+
+    def test_project_grid_is_cached_per_user(self):
+        """Test that the project list grid is reused and bumped by membership changes"""
+        from projects.models import ProjectMember
+
+        url = reverse('projects:list')
+        self.client.force_login(self.employee)
+        _, response = self.get_query_count(url)
+        self.assertNotContains(response, 'Website')
+
+        ProjectMember.objects.create(project=self.project, user=self.employee)
+        _, response = self.get_query_count(url)
+        self.assertContains(response, 'Website')
+
+        self.client.force_login(self.manager)
+        cold, response = self.get_query_count(url)
+        self.assertContains(response, 'Website')
+        warm, _ = self.get_query_count(url)
+        self.assertLess(warm, cold)
+
+    def test_zero_timeout_renders_fresh_fragments(self):
+        """Test that a zero timeout, the locmem default, never serves a cached fragment"""
+        self.client.force_login(self.enterprise_user)
+        url = reverse('dashboard:index')
+
+        with self.settings(FRAGMENT_CACHE_TIMEOUT=0):
+            self.get_query_count(url)
+            uncached, _ = self.get_query_count(url)
+        # Nothing was stored at 0, so the first request with a timeout renders again
+        filling, _ = self.get_query_count(url)
+        self.assertEqual(filling, uncached)
+        warm, _ = self.get_query_count(url)
+        self.assertLess(warm, uncached)
+
+
+class ExplainHotQueriesCommandTests(TestCase):
+    def test_prints_plan_for_each_query(self):
+        """Test that the command prints an EXPLAIN plan for the hot queries"""
+        user = User.objects.create_user(username='enterprise', password='password123')
+        organization = Organization.objects.create(name='Acme', created_by=user)
+        UserProfile.objects.create(user=user, role='ENTERPRISE', organization=organization)
+
+        out = StringIO()
+        call_command('explain_hot_queries', stdout=out)
+        output = out.getvalue()
+
+        self.assertIn('Unread notification count', output)
+        self.assertIn('Activity feed per organization', output)
+        self.assertIn('Overdue tasks per project', output)
+
+
+class LoadSuiteTests(TestCase):
+    def seed(self, **options):
+        options = dict(dict(
+            organizations=1, managers=1, employees=2, projects=2, members=2, tasks=6, dependencies=4,
+            comments=1, notifications=3, activities=10, prefix='t'
+        ), **options)
+        call_command('seed_load', stdout=StringIO(), stderr=StringIO(), **options)
+
+    def test_seed_load_keeps_derived_tables_consistent(self):
+        """Test that seeded data comes with closure rows, metrics and counters that match it"""
+        from notifications.models import NotificationCounter
+        from tasks.models import TaskDependencyClosure
+
+        self.seed()
+        organization = Organization.objects.get()
+        self.assertEqual(User.objects.filter(username__startswith='t-').count(), 4)
+        self.assertEqual(Task.objects.count(), 12)
+        self.assertTrue(TaskDependencyClosure.objects.exists())
+        self.assertEqual(DashboardMetrics.for_organization(organization).as_context(),
+                         DashboardMetrics.rebuild(organization=organization).as_context())
+        self.assertEqual(NotificationCounter.reconcile(), 0)
+
+        with self.assertRaises(CommandError):
+            self.seed()
+
+    def test_benchmark_views_reports_every_endpoint(self):
+        """Test that the harness signs in per role and reports percentiles and query counts"""
+        import json
+        from .management.commands.benchmark_views import ENDPOINTS
+
+        self.seed()
+        out = StringIO()
+        call_command('benchmark_views', prefix='t', requests=2, warmup=0, stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['endpoints']), {name for name, *_ in ENDPOINTS})
+        self.assertEqual(report['endpoints']['notification_poll_unchanged']['status'], 304)
+        self.assertGreater(report['endpoints']['kanban']['queries'], 0)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    # Raise a budget only with a reason; most increases are a missing select_related.
+    # Counts include the per-request profile query (ACTOR_CACHE_TIMEOUT is 0 with locmem)
+    query_budgets = {
+        'dashboard:index': 8,
+        'tasks:list': 11,
+        'tasks:kanban': 8,
+        'tasks:kanban_column': 5,
+        'tasks:detail': 17,
+        'notifications:recent': 5,
+        'notifications:activity_log': 6,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_load', organizations=1, managers=2, employees=4, projects=2, members=3, tasks=15,
+                     dependencies=8, comments=3, notifications=10, activities=60, prefix='b',
+                     stdout=StringIO(), stderr=StringIO())
+        cls.users = {
+            role: User.objects.filter(username__startswith='b-', profile__role=role).order_by('pk').first()
+            for role in ('ENTERPRISE', 'MANAGER', 'EMPLOYEE')
+        }
+
+    def login(self, role):
+        self.client.force_login(self.users[role])
+
+    def test_dashboards(self):
+        """Test that each role's dashboard stays within its query budget"""
+        for role in ('ENTERPRISE', 'MANAGER', 'EMPLOYEE'):
+            with self.subTest(role=role):
+                self.login(role)
+                self.assertWithinBudget('dashboard:index')
+
+    def test_task_views(self):
+        """Test that the task list, board, board column and detail pages stay within their query budgets"""
+        self.login('MANAGER')
+        task = Task.objects.visible_to(self.users['MANAGER']).filter(comments__isnull=False).first()
+        self.assertWithinBudget('tasks:list')
+        self.assertWithinBudget('tasks:kanban')
+        self.assertWithinBudget('tasks:kanban_column', data={'status': 'DONE'})
+        self.assertWithinBudget('tasks:detail', args=[task.pk])
+
+    def test_notification_views(self):
+        """Test that the notification dropdown and activity log stay within their query budgets"""
+        self.login('EMPLOYEE')
+        self.assertWithinBudget('notifications:recent')
+        self.login('ENTERPRISE')
+        self.assertWithinBudget('notifications:activity_log')
+
+
+class QueryBudgetMixinTests(DashboardFixturesMixin, QueryBudgetMixin, TestCase):
+    query_budgets = {'dashboard:index': 1}
+
+    def test_failure_lists_repeated_statements(self):
+        """Test that an N+1 differing only in ids shows up as one repeated fingerprint"""
+        from django.core.signals import request_started
+
+        users = [self.enterprise_user, self.manager, self.employee]
+
+        def lookup_each(**kwargs):
+            for user in users:
+                User.objects.filter(pk=user.pk).first()
+
+        request_started.connect(lookup_each)
+        self.addCleanup(request_started.disconnect, lookup_each)
+        self.client.force_login(self.enterprise_user)
+
+        with self.assertRaises(AssertionError) as failure:
+            self.assertWithinBudget('dashboard:index')
+        message = str(failure.exception)
+        self.assertIn('over its budget of 1', message)
+        self.assertRegex(message, r'x3: SELECT .*"auth_user"."id" = %s')
+
+
+class SQLProfilingTests(DashboardFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        from . import profiling
+        profiling.clear()
+        self.addCleanup(profiling.clear)
+        self.staff = User.objects.create_user(username='staff', password='password123', is_staff=True)
+
+    def test_header_profiles_staff_requests_only(self):
+        """Test that X-Profile-SQL is honoured for staff and ignored for everyone else"""
+        from . import profiling
+
+        self.client.force_login(self.enterprise_user)
+        response = self.client.get(reverse('dashboard:index'), HTTP_X_PROFILE_SQL='1')
+        self.assertNotIn('X-SQL-Queries', response)
+        self.assertEqual(profiling.records(), [])
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('perf'), HTTP_X_PROFILE_SQL='1')
+        record, = profiling.records()
+        self.assertEqual(response['X-SQL-Queries'], str(record['queries']))
+        self.assertEqual(record['view'], 'perf')
+        self.assertGreater(record['queries'], 0)
+
+    def test_setting_profiles_every_request_into_ring_buffer(self):
+        """Test that SQL_PROFILING records duplicates and slowest statements, keeping the newest records"""
+        from . import profiling
+
+        from collections import deque
+        from unittest import mock
+
+        self.client.force_login(self.enterprise_user)
+        with self.settings(SQL_PROFILING=True), mock.patch.object(profiling, '_buffer', deque(maxlen=3)):
+            for _ in range(5):
+                self.client.get(reverse('dashboard:index'))
+            records = profiling.records()
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0]['view'], 'dashboard:index')
+        self.assertLessEqual(len(records[0]['slowest']), profiling.TOP_STATEMENTS)
+        self.assertGreaterEqual(records[0]['db_ms'], 0)
+
+        statements = [('SELECT * FROM t WHERE id IN (%s, %s)', 0.001), ('SELECT * FROM t WHERE id IN (%s)', 0.002)]
+        duplicate, = profiling.duplicates(statements)
+        self.assertEqual(duplicate['count'], 2)
+
+    def test_perf_page_is_staff_only(self):
+        """Test that /_perf/ redirects non-staff users to the admin login and lists records for staff"""
+        self.client.force_login(self.enterprise_user)
+        with self.settings(SQL_PROFILING=True):
+            self.client.get(reverse('dashboard:index'))
+        self.assertEqual(self.client.get(reverse('perf')).status_code, 302)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('perf'))
+        self.assertContains(response, '/dashboard/')
+        self.assertEqual(len(self.client.get(reverse('perf'), {'format': 'json'}).json()['records']), 1)
+
+
+class TelemetryTests(DashboardFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        from . import telemetry
+        telemetry.clear()
+        self.addCleanup(telemetry.clear)
+
+    def scrape(self, **headers):
+        response = self.client.get(reverse('metrics'), **headers)
+        return response, response.content.decode() if response.status_code == 200 else ''
+
+    def test_endpoint_requires_staff_or_token(self):
+        """Test that /_metrics/ answers staff sessions and the bearer token only"""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(self.enterprise_user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+        with self.settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong')[0].status_code, 403)
+            response, body = self.scrape(HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertIn('# TYPE cloudtask_http_request_duration_seconds histogram', body)
+        self.assertIn('cloudtask_outbox_pending_events 0', body)
+
+    @override_settings(ACTOR_CACHE_TIMEOUT=60)
+    def test_requests_record_latency_queries_and_cache_lookups(self):
+        """Test that a request is counted under its URL name with its queries and cache lookups"""
+        self.client.force_login(self.enterprise_user)
+        self.client.get(reverse('dashboard:index'))
+        self.client.get(reverse('dashboard:index'))
+
+        with self.settings(METRICS_TOKEN='secret'):
+            body = self.scrape(HTTP_AUTHORIZATION='Bearer secret')[1]
+        self.assertIn('cloudtask_http_requests_total{view="dashboard:index",method="GET",status="200"} 2', body)
+        self.assertIn(
+            'cloudtask_http_request_duration_seconds_bucket{view="dashboard:index",method="GET",le="+Inf"} 2', body
+        )
+        self.assertIn('cloudtask_http_request_duration_seconds_count{view="dashboard:index",method="GET"} 2', body)
+        self.assertRegex(body, r'cloudtask_db_queries_total\{view="dashboard:index"\} [1-9]')
+        # The scrape itself is the second hit
+        self.assertIn('cloudtask_cache_lookups_total{cache="actor",result="hit"} 2', body)
+        self.assertIn('cloudtask_cache_lookups_total{cache="actor",result="miss"} 1', body)
+
+    def test_notification_fanout_is_observed(self):
+        """Test that a dispatch records the number of notifications it wrote"""
+        from notifications.utils import NotificationDispatcher
+        from . import telemetry
+
+        dispatcher = NotificationDispatcher()
+        dispatcher.add([self.manager.pk, self.employee.pk], 'TASK_UPDATED', 'Title', 'Message')
+        dispatcher.dispatch()
+        self.assertEqual(telemetry.collect()[('cloudtask_notification_fanout', ())][-1], 2)
+
+    def test_values_are_summed_across_process_files(self):
+        """Test that with METRICS_DIR every process's flushed file is added to the scrape"""
+        import json
+        import os
+        import tempfile
+        from . import telemetry
+
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            telemetry.REQUESTS.inc(view='tasks:kanban', method='GET', status=200)
+            telemetry.REQUEST_LATENCY.observe(0.2, view='tasks:kanban', method='GET')
+            telemetry.flush()
+            own, = os.listdir(directory)
+            # Another worker's file with the same values
+            with open(os.path.join(directory, own)) as handle:
+                rows = json.load(handle)
+            with open(os.path.join(directory, '99999-other.json'), 'w') as handle:
+                json.dump(rows, handle)
+
+            values = telemetry.collect()
+        self.assertEqual(values[('cloudtask_http_requests_total', ('tasks:kanban', 'GET', '200'))], 2)
+        latency = values[('cloudtask_http_request_duration_seconds', ('tasks:kanban', 'GET'))]
+        self.assertEqual(latency[telemetry.LATENCY_BUCKETS.index(0.25)], 2)
+        self.assertAlmostEqual(latency[-1], 0.4)
@@ -1,100 +1,76 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.utils.crypto import constant_time_compare
 from django.shortcuts import render
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.utils import timezone
-from datetime import timedelta
+
+from . import profiling, telemetry
+from .fragments import fragment_context
+from .models import DashboardMetrics
 
 @login_required
 def index(request):
     """Dashboard index view - routes based on user role"""
-    user = request.user
+    user = request.actor
     user_role = user.profile.role
     organization = user.profile.organization
     
     # Import models
     from projects.models import Project
     from tasks.models import Task
-    from accounts.models import UserProfile
-    from notifications.models import ActivityLog
+    from notifications import partitioning
     
     context = {}
-    now = timezone.now()
-    week_ago = now - timedelta(days=7)
     
     if user_role == 'ENTERPRISE':
         # Enterprise admin dashboard
+        context.update(fragment_context(user.profile.organization_id))
         if organization:
-            # Project stats
-            all_projects = Project.objects.filter(organization=organization)
-            context['project_count'] = all_projects.count()
-            context['projects_this_week'] = all_projects.filter(created_at__gte=week_ago).count()
-            context['projects'] = all_projects.order_by('-created_at')[:5]
+            # Headline figures come from the materialized metrics row
+            metrics = DashboardMetrics.for_organization(organization)
+            context.update(metrics.as_context())
+            context['team_count'] = metrics.manager_count + metrics.employee_count
             
-            # Task stats
-            all_tasks = Task.objects.filter(project__organization=organization)
-            context['task_count'] = all_tasks.count()
-            context['active_task_count'] = all_tasks.filter(status__in=['TODO', 'IN_PROGRESS', 'IN_REVIEW']).count()
-            context['todo_count'] = all_tasks.filter(status='TODO').count()
-            context['in_progress_count'] = all_tasks.filter(status='IN_PROGRESS').count()
-            context['in_review_count'] = all_tasks.filter(status='IN_REVIEW').count()
-            context['done_count'] = all_tasks.filter(status='DONE').count()
-            context['tasks_completed_this_week'] = all_tasks.filter(status='DONE', updated_at__gte=week_ago).count()
-            
-            # Team stats
-            context['manager_count'] = UserProfile.objects.filter(organization=organization, role='MANAGER').count()
-            context['employee_count'] = UserProfile.objects.filter(organization=organization, role='EMPLOYEE').count()
-            context['team_count'] = context['manager_count'] + context['employee_count']
+            # Same annotated queryset as the project list cards
+            context['projects'] = Project.objects.visible_to(user).with_counts().order_by('-created_at')[:5]
+            all_tasks = Task.objects.visible_to(user)
             
             # Calculate efficiency (completed tasks / total tasks this week)
-            tasks_this_week = all_tasks.filter(created_at__gte=week_ago).count()
+            tasks_this_week = metrics.tasks_created_this_week
             if tasks_this_week > 0:
-                context['efficiency'] = round((context['tasks_completed_this_week'] / tasks_this_week) * 100)
+                context['efficiency'] = round((metrics.tasks_completed_this_week / tasks_this_week) * 100)
             else:
-                context['efficiency'] = 100 if context['done_count'] > 0 else 0
+                context['efficiency'] = 100 if metrics.done_count > 0 else 0
             
             # Recent activity
-            context['recent_activities'] = ActivityLog.objects.filter(
-                organization_id=organization.id
-            ).select_related('user').order_by('-created_at')[:10]
+            context['recent_activities'] = partitioning.recent_activity(organization.id, 10)
             
             # Recent tasks
             context['recent_tasks'] = all_tasks.order_by('-updated_at')[:5]
             
-            # Overdue tasks
-            context['overdue_count'] = all_tasks.filter(
-                due_date__lt=now.date(),
-                status__in=['TODO', 'IN_PROGRESS', 'IN_REVIEW']
-            ).count()
-            
         return render(request, 'dashboard/index.html', context)
     
     elif user_role == 'MANAGER':
         # Manager dashboard
-        context['projects'] = Project.objects.filter(manager=user)[:5]
-        context['project_count'] = Project.objects.filter(manager=user).count()
-        context['tasks'] = Task.objects.filter(project__manager=user)
-        context['task_count'] = context['tasks'].count()
-        context['todo_count'] = context['tasks'].filter(status='TODO').count()
-        context['in_progress_count'] = context['tasks'].filter(status='IN_PROGRESS').count()
-        context['done_count'] = context['tasks'].filter(status='DONE').count()
+        context['projects'] = Project.objects.visible_to(user).with_counts()[:5]
+        context.update(DashboardMetrics.for_manager(user).as_context())
+        context['tasks'] = Task.objects.visible_to(user)
         context['recent_tasks'] = context['tasks'].order_by('-updated_at')[:5]
         
         # Team members count (employees in their projects)
         if organization:
-            context['team_count'] = UserProfile.objects.filter(organization=organization, role='EMPLOYEE').count()
+            context['team_count'] = DashboardMetrics.for_organization(organization).employee_count
         
         return render(request, 'dashboard/manager_dashboard.html', context)
     
     else:  # EMPLOYEE
         # Employee dashboard
-        context['assigned_tasks'] = Task.objects.filter(assigned_to=user)
-        context['task_count'] = context['assigned_tasks'].count()
-        context['todo_count'] = context['assigned_tasks'].filter(status='TODO').count()
-        context['in_progress_count'] = context['assigned_tasks'].filter(status='IN_PROGRESS').count()
-        context['done_count'] = context['assigned_tasks'].filter(status='DONE').count()
+        context['assigned_tasks'] = Task.objects.visible_to(user)
+        context.update(context['assigned_tasks'].stats())
         
         # Projects the employee is part of
-        from projects.models import ProjectMember
-        context['projects'] = Project.objects.filter(members__user=user).distinct()
+        context['projects'] = Project.objects.visible_to(user)
         context['project_count'] = context['projects'].count()
         
         return render(request, 'dashboard/employee_dashboard.html', context)
@@ -128,3 +104,26 @@ def team(request):
         'is_enterprise': user.profile.role == 'ENTERPRISE',
     }
     return render(request, 'dashboard/team.html', context)
+
+
+@staff_member_required
+def perf(request):
+    """Recent SQL profiles of this process (dashboard.profiling); ?format=json for tooling"""
+    if request.method == 'POST':
+        profiling.clear()
+    records = profiling.records()
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'records': records})
+    return render(request, 'dashboard/perf.html', {
+        'records': records,
+        'profiling_enabled': settings.SQL_PROFILING,
+    })
+
+
+def metrics(request):
+    """Prometheus scrape endpoint (dashboard.telemetry), for staff or bearers of METRICS_TOKEN"""
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    if not (request.user.is_staff or (token and constant_time_compare(authorization, f'Bearer {token}'))):
+        return HttpResponseForbidden()
+    return HttpResponse(telemetry.render(), content_type=telemetry.CONTENT_TYPE)
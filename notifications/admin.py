@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Notification, ActivityLog
+from .models import Notification, NotificationCounter, ActivityLog, ActivityArchive, ActivityRollup, OutboxEvent
 
 
 @admin.register(Notification)
@@ -16,3 +16,30 @@ class ActivityLogAdmin(admin.ModelAdmin):
     list_filter = ['action', 'entity_type', 'created_at']
     search_fields = ['user__username', 'entity_name', 'description']
     date_hierarchy = 'created_at'
+
+
+@admin.register(NotificationCounter)
+class NotificationCounterAdmin(admin.ModelAdmin):
+    list_display = ['user', 'unread_count']
+    search_fields = ['user__username']
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'created_at', 'processed_at', 'attempts']
+    list_filter = ['kind', 'processed_at']
+    readonly_fields = ['locked_by', 'locked_at', 'last_error']
+
+
+@admin.register(ActivityArchive)
+class ActivityArchiveAdmin(admin.ModelAdmin):
+    list_display = ['id', 'organization_id', 'row_count', 'first_created_at', 'last_created_at', 'archived_at']
+    list_filter = ['archived_at']
+    exclude = ['data']
+
+
+@admin.register(ActivityRollup)
+class ActivityRollupAdmin(admin.ModelAdmin):
+    list_display = ['day', 'organization_id', 'action', 'entity_type', 'count']
+    list_filter = ['action', 'entity_type']
+    date_hierarchy = 'day'
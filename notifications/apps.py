@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class NotificationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notifications'
+
+    def ready(self):
+        # Connects the partitioned storage signal handlers
+        from . import partitioning  # noqa: F401
+        from . import checks  # noqa: F401
@@ -0,0 +1,23 @@
+"""
+System checks for the notifications settings.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, register
+
+
+@register()
+def outbox_needs_shared_cache(app_configs, **kwargs):
+    """
+    process_outbox bumps the dashboard fragment versions after writing
+    activity; with a per-process locmem cache that bump never reaches the web
+    workers, which would keep serving stale fragments
+    """
+    if not getattr(settings, 'OUTBOX_ENABLED', False) or not isinstance(caches['default'], LocMemCache):
+        return []
+    return [Error(
+        'OUTBOX_ENABLED needs a cache shared with process_outbox.',
+        hint='Set CACHE_BACKEND=file (or configure another shared cache backend).',
+        id='notifications.E001',
+    )]
@@ -1,12 +1,9 @@
-from .models import Notification
+from .models import NotificationCounter
 
 
 def notifications(request):
     """Add notification count to all templates"""
     if request.user.is_authenticated:
-        unread_count = Notification.objects.filter(
-            recipient=request.user, 
-            is_read=False
-        ).count()
+        unread_count = NotificationCounter.get_unread_count(request.user)
         return {'unread_notification_count': unread_count}
     return {'unread_notification_count': 0}
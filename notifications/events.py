@@ -0,0 +1,196 @@
+"""
+Publish/subscribe for live updates streamed to browsers over Server-Sent Events.
+
+Code paths that create notifications or change task status publish small
+events once their transaction commits; the async `notifications:stream` view
+subscribes to the channels the current user may see and forwards events as
+they arrive, so clients no longer poll for changes.
+
+Channels:
+    user:<id>      notifications for a user, and status changes of tasks assigned to them
+    manager:<id>   status changes of tasks in projects the manager runs
+    org:<id>       status changes of every task in an organization
+
+The broker is chosen by settings.EVENT_BROKER. LocalBroker only reaches
+subscribers in the same process, which is enough for a single ASGI worker
+(and for development). With several workers, point the setting at a broker
+that relays events between processes; it needs publish(channel, event) and
+subscribe(channels) returning an async context manager with get().
+"""
+import asyncio
+import json
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Events buffered per connection; a client that falls further behind loses the
+# oldest updates and resynchronizes on its next page load
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Seconds between keep-alive comments, so proxies do not close idle streams
+KEEPALIVE_INTERVAL = 15
+
+# Seconds before a stream is closed; EventSource reconnects on its own, which
+# bounds how long one connection holds a worker
+STREAM_MAX_AGE = 300
+
+
+class Subscription:
+    """Events for a set of channels, delivered to one asyncio consumer"""
+
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = set(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def deliver(self, event):
+        """Hand an event over from any thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The consumer's event loop is gone; it will unsubscribe shortly
+            pass
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self):
+        return await self.queue.get()
+
+    async def __aenter__(self):
+        self.broker._add(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.broker._remove(self)
+
+
+class LocalBroker:
+    """In-process broker: fans events out to subscribers of this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def subscribe(self, channels):
+        return Subscription(self, channels)
+
+    def _add(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+
+    def _remove(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+
+@lru_cache(maxsize=None)
+def _load_broker(path):
+    return import_string(path)()
+
+
+def get_broker():
+    return _load_broker(getattr(settings, 'EVENT_BROKER', 'notifications.events.LocalBroker'))
+
+
+def publish(channels, event):
+    """Publish `event` to `channels` once the current transaction commits"""
+    channels = {channel for channel in channels if channel}
+    if not channels:
+        return
+
+    def send():
+        broker = get_broker()
+        for channel in channels:
+            broker.publish(channel, event)
+
+    transaction.on_commit(send)
+
+
+def channels_for(user_id, role, organization_id):
+    """Channels a user may subscribe to; mirrors the task scope of each role"""
+    channels = [f'user:{user_id}']
+    if role == 'ENTERPRISE' and organization_id:
+        channels.append(f'org:{organization_id}')
+    elif role == 'MANAGER':
+        channels.append(f'manager:{user_id}')
+    return channels
+
+
+def _task_channels(organization_id, manager_id, assigned_to_id):
+    return [
+        f'org:{organization_id}' if organization_id else None,
+        f'manager:{manager_id}' if manager_id else None,
+        f'user:{assigned_to_id}' if assigned_to_id else None,
+    ]
+
+
+def publish_task_change(task_id, status, position, updated_at, organization_id, manager_id, assigned_to_id):
+    """Tell open boards that a task moved"""
+    publish(_task_channels(organization_id, manager_id, assigned_to_id), {
+        'type': 'task',
+        'task_id': task_id,
+        'status': status,
+        'position': position,
+        'updated_at': updated_at.isoformat(),
+    })
+
+
+def publish_notifications(notifications):
+    """Push newly created notifications to their recipients"""
+    for notification in notifications:
+        publish([f'user:{notification.recipient_id}'], {
+            'type': 'notification',
+            'id': notification.pk,
+            'notification_type': notification.notification_type,
+            'title': notification.title,
+            'message': notification.message[:100],
+            'link': notification.link,
+        })
+
+
+def format_event(event):
+    """Serialize an event in the text/event-stream format"""
+    return f'event: {event["type"]}\ndata: {json.dumps(event)}\n\n'
+
+
+async def event_stream(channels, initial_events=()):
+    """
+    Async iterator of text/event-stream chunks for `channels`.
+    Ends after STREAM_MAX_AGE seconds; the client reconnects.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STREAM_MAX_AGE
+    async with get_broker().subscribe(channels) as subscription:
+        yield f'retry: {KEEPALIVE_INTERVAL * 1000}\n\n'
+        for event in initial_events:
+            yield format_event(event)
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                event = await asyncio.wait_for(subscription.get(), min(KEEPALIVE_INTERVAL, remaining))
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            yield format_event(event)
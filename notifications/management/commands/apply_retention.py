@@ -0,0 +1,46 @@
+"""
+Purge old read notifications and archive old activity log rows.
+
+Usage:
+    python manage.py apply_retention                          # settings defaults
+    python manage.py apply_retention --notification-days 30 --activity-days 180
+    python manage.py apply_retention --max-batches 50 --pause 0.2   # a bounded, gentle slice
+    python manage.py apply_retention --activity-days 0        # notifications only
+
+Runs are batched and resumable: an interrupted run continues where it left
+off the next time. See notifications/retention.py.
+"""
+from django.core.management.base import BaseCommand
+
+from notifications import retention
+
+
+class Command(BaseCommand):
+    help = 'Delete old read notifications and archive old activity log rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notification-days', type=int,
+                            help='Delete read notifications older than this (0 to skip)')
+        parser.add_argument('--activity-days', type=int,
+                            help='Archive activity older than this (0 to skip)')
+        parser.add_argument('--batch-size', type=int, help='Rows handled per transaction')
+        parser.add_argument('--max-batches', type=int,
+                            help='Stop each job after this many batches')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        result = retention.run(
+            notification_days=options['notification_days'],
+            activity_days=options['activity_days'],
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+            pause=options['pause'],
+        )
+        if result is None:
+            self.stdout.write(self.style.WARNING('Another retention run is in progress; nothing done.'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {result["notifications"]} notification(s) and '
+            f'archived {result["activities"]} activity log row(s).'
+        ))
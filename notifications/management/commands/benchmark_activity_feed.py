@@ -0,0 +1,195 @@
+"""
+Compare activity feed latency with and without month-partitioned storage.
+
+Loads the same synthetic rows into a plain table (bench_activitylog_plain)
+and a partitioned one (bench_activitylog: native partitions on PostgreSQL,
+per-month shadow tables on SQLite), then times the feed query on both: the
+first page of an organization, and a page deep in its history.
+
+Usage:
+    python manage.py benchmark_activity_feed                     # 10M rows, 100 organizations, 24 months
+    python manage.py benchmark_activity_feed --rows 200000 --queries 50 --output feed.json
+    python manage.py benchmark_activity_feed --keep              # leave the tables for EXPLAIN
+
+Latencies are in milliseconds. The real activity log is not touched.
+"""
+import json
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from notifications import partitioning
+
+PLAIN_TABLE = 'bench_activitylog_plain'
+PARTITIONED_TABLE = 'bench_activitylog'
+
+COLUMNS = (
+    'id', 'user_id', 'action', 'entity_type', 'entity_id', 'entity_name',
+    'old_value', 'new_value', 'organization_id', 'description', 'created_at',
+)
+
+# Rows inserted per transaction while loading
+CHUNK_SIZE = 10000
+
+PAGE_SIZE = 50
+
+
+def _summary(timings):
+    timings = sorted(timings)
+    return {
+        'p50': round(timings[len(timings) // 2] * 1000, 3),
+        'p95': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 3),
+        'mean': round(sum(timings) / len(timings) * 1000, 3),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark activity feed latency on plain vs month-partitioned tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000_000, help='Synthetic activity rows to load')
+        parser.add_argument('--organizations', type=int, default=100, help='Organizations the rows are spread over')
+        parser.add_argument('--months', type=int, default=24, help='Months of history the rows are spread over')
+        parser.add_argument('--queries', type=int, default=200, help='Timed queries per case')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for repeatable runs')
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark tables afterwards')
+
+    def handle(self, *args, **options):
+        user_id = User.objects.order_by('pk').values_list('pk', flat=True).first()
+        if user_id is None:
+            raise CommandError('At least one user is needed to own the synthetic rows.')
+        if options['rows'] < 1 or options['organizations'] < 1 or options['months'] < 1 or options['queries'] < 1:
+            raise CommandError('--rows, --organizations, --months and --queries must be positive.')
+
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        span = timedelta(days=30 * options['months'])
+
+        self.drop_tables()
+        try:
+            months = self.create_tables(now - span, now)
+            self.load(rng, user_id, options['rows'], options['organizations'], now, span)
+            report = {
+                'vendor': connection.vendor,
+                'rows': options['rows'],
+                'organizations': options['organizations'],
+                'months': options['months'],
+                'partitions': months,
+                'queries': options['queries'],
+                'page_size': PAGE_SIZE,
+                'plain': self.measure(options, now, span, self.plain_feed),
+                'partitioned': self.measure(options, now, span, self.partitioned_feed),
+            }
+        finally:
+            if not options['keep']:
+                self.drop_tables()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+        self.stdout.write(output)
+
+    def create_tables(self, oldest, now):
+        """Create both tables; returns the number of monthly partitions"""
+        partitioning.clone_table(partitioning.BASE_TABLE, PLAIN_TABLE)
+        month, current = partitioning.month_start(oldest), partitioning.month_start(now)
+        if partitioning.is_native():
+            partitioning.create_partitioned_table(PARTITIONED_TABLE, partitioning.BASE_TABLE)
+        else:
+            # The base table holds the current month, like the live table
+            partitioning.clone_table(partitioning.BASE_TABLE, PARTITIONED_TABLE)
+        count = 0
+        while month <= current:
+            if partitioning.is_native():
+                partitioning.create_partition(month, PARTITIONED_TABLE)
+            elif month != current:
+                partitioning.create_shadow(month, PARTITIONED_TABLE)
+            month = partitioning.add_months(month, 1)
+            count += 1
+        return count
+
+    def drop_tables(self):
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            if not partitioning.is_native():
+                for month, table in partitioning.partitions(PARTITIONED_TABLE):
+                    cursor.execute(f'DROP TABLE IF EXISTS {qn(table)}')
+            # Dropping a PostgreSQL partitioned table drops its partitions
+            cursor.execute(f'DROP TABLE IF EXISTS {qn(PARTITIONED_TABLE)}')
+            cursor.execute(f'DROP TABLE IF EXISTS {qn(PLAIN_TABLE)}')
+
+    def target(self, created_at, current):
+        """Table a row lands in; PostgreSQL routes through the parent itself"""
+        month = partitioning.month_start(created_at)
+        if partitioning.is_native() or month == current:
+            return PARTITIONED_TABLE
+        return partitioning.partition_name(month, PARTITIONED_TABLE)
+
+    def load(self, rng, user_id, rows, organizations, now, span):
+        qn = connection.ops.quote_name
+        columns = ', '.join(qn(column) for column in COLUMNS)
+        placeholders = ', '.join(['%s'] * len(COLUMNS))
+        current = partitioning.month_start(now)
+        seconds = int(span.total_seconds())
+        started = time.perf_counter()
+
+        for start in range(1, rows + 1, CHUNK_SIZE):
+            batch, by_table = [], {}
+            for pk in range(start, min(start + CHUNK_SIZE, rows + 1)):
+                created_at = now - timedelta(seconds=rng.randrange(seconds))
+                row = (
+                    pk, user_id, 'STATUS_CHANGE', 'TASK', pk, f'Task {pk}', 'To Do', 'In Progress',
+                    rng.randint(1, organizations), f'moved "Task {pk}" to In Progress',
+                    partitioning._db_datetime(created_at),
+                )
+                batch.append(row)
+                by_table.setdefault(self.target(created_at, current), []).append(row)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(f'INSERT INTO {qn(PLAIN_TABLE)} ({columns}) VALUES ({placeholders})', batch)
+                for table, table_rows in by_table.items():
+                    cursor.executemany(f'INSERT INTO {qn(table)} ({columns}) VALUES ({placeholders})', table_rows)
+            self.stderr.write(f'\rLoaded {start + len(batch) - 1}/{rows} rows', ending='')
+        self.stderr.write(f'\rLoaded {rows} rows in {time.perf_counter() - started:.1f}s')
+
+        with connection.cursor() as cursor:
+            if partitioning.is_native():
+                for table in (PLAIN_TABLE, PARTITIONED_TABLE):
+                    cursor.execute(f'ANALYZE {qn(table)}')
+            else:
+                cursor.execute('ANALYZE')
+
+    def plain_feed(self, organization_id, before):
+        return partitioning._fetch(PLAIN_TABLE, organization_id, PAGE_SIZE, before)
+
+    def partitioned_feed(self, organization_id, before):
+        return partitioning.recent_activity(
+            organization_id, PAGE_SIZE, before=before, base=PARTITIONED_TABLE, with_users=False
+        )
+
+    def measure(self, options, now, span, feed):
+        """
+        Time first pages and deep pages (a random point in the history) of
+        random organizations; every feed gets the same sequence of queries
+        """
+        rng = random.Random(options['seed'])
+        seconds = int(span.total_seconds())
+        results = {}
+        for case in ('first_page', 'deep_page'):
+            timings = []
+            for _ in range(options['queries']):
+                organization_id = rng.randint(1, options['organizations'])
+                before = None
+                if case == 'deep_page':
+                    before = (now - timedelta(seconds=rng.randrange(seconds)), options['rows'] + 1)
+                started = time.perf_counter()
+                feed(organization_id, before)
+                timings.append(time.perf_counter() - started)
+            results[case] = _summary(timings)
+        return results
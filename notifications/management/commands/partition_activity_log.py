@@ -0,0 +1,39 @@
+"""
+Maintain month-partitioned ActivityLog storage (settings.ACTIVITY_PARTITIONING).
+
+Usage:
+    python manage.py partition_activity_log            # create upcoming partitions / rotate closed months
+    python manage.py partition_activity_log --convert  # PostgreSQL, once, in a maintenance window
+
+apply_retention also does the maintenance step when partitioning is on.
+See notifications/partitioning.py.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from notifications import partitioning
+
+
+class Command(BaseCommand):
+    help = 'Convert the activity log to monthly partitions, or maintain the partitions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help='Rebuild the PostgreSQL table as a partitioned table (locks it while copying)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows moved per transaction when rotating SQLite shadow tables')
+
+    def handle(self, *args, **options):
+        if not partitioning.enabled():
+            raise CommandError('ACTIVITY_PARTITIONING is off.')
+
+        if options['convert']:
+            if not partitioning.is_native():
+                raise CommandError('--convert needs PostgreSQL; SQLite uses shadow tables without conversion.')
+            if partitioning.is_partitioned():
+                self.stdout.write('The activity log is already partitioned.')
+                return
+            created = partitioning.convert_postgresql()
+            self.stdout.write(self.style.SUCCESS(f'Converted the activity log into {created} monthly partition(s).'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(partitioning.maintain(options['batch_size'])))
@@ -0,0 +1,68 @@
+"""
+Drain pending OutboxEvent rows into ActivityLog and Notification rows.
+
+Usage:
+    python manage.py process_outbox                # run until interrupted
+    python manage.py process_outbox --once         # drain what is pending, then exit
+    python manage.py process_outbox --workers 4 --batch-size 200
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from notifications import outbox
+
+
+class Command(BaseCommand):
+    help = 'Process queued activity log and notification events from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Number of worker threads')
+        parser.add_argument('--batch-size', type=int, default=100, help='Events claimed per batch')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no pending events are left')
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        workers = max(1, options['workers'])
+
+        try:
+            if workers == 1:
+                processed = self.run_worker(options)
+            else:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    futures = [pool.submit(self.run_thread, options) for _ in range(workers)]
+                    processed = sum(future.result() for future in futures)
+        except KeyboardInterrupt:
+            self.stop.set()
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} outbox event(s).'))
+
+    def run_worker(self, options):
+        """Claim and apply batches until stopped (or the outbox is empty with --once)"""
+        worker_id = f'{threading.get_ident()}-{uuid.uuid4().hex[:8]}'
+        processed = 0
+        while not self.stop.is_set():
+            close_old_connections()
+            handled = outbox.process_batch(worker_id, options['batch_size'])
+            processed += handled
+            if handled:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        return processed
+
+    def run_thread(self, options):
+        """Run a worker in a pool thread, releasing its database connection afterwards"""
+        try:
+            return self.run_worker(options)
+        finally:
+            connection.close()
@@ -0,0 +1,18 @@
+"""
+Repair drift between NotificationCounter rows and the actual number of
+unread notifications per user.
+
+Usage:
+    python manage.py reconcile_notification_counts
+"""
+from django.core.management.base import BaseCommand
+
+from notifications.models import NotificationCounter
+
+
+class Command(BaseCommand):
+    help = 'Recompute unread notification counters from the Notification table'
+
+    def handle(self, *args, **options):
+        drifted = NotificationCounter.reconcile()
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {drifted} notification counter(s).'))
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.1 on 2026-10-16 23:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_outboxevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('organization_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('row_count', models.PositiveIntegerField()),
+                ('first_created_at', models.DateTimeField()),
+                ('last_created_at', models.DateTimeField()),
+                ('data', models.BinaryField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+            ],
+            options={
+                'ordering': ['first_created_at'],
+                'indexes': [models.Index(fields=['organization_id', 'first_created_at'], name='archive_org_start_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('organization_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('day', models.DateField()),
+                ('action', models.CharField(choices=[('CREATE', 'Created'), ('UPDATE', 'Updated'), ('DELETE', 'Deleted'), ('STATUS_CHANGE', 'Status Changed'), ('ASSIGN', 'Assigned'), ('COMMENT', 'Commented'), ('ATTACH', 'Attached File')], max_length=20)),
+                ('entity_type', models.CharField(choices=[('PROJECT', 'Project'), ('TASK', 'Task'), ('COMMENT', 'Comment')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day'],
+                'unique_together': {('organization_id', 'day', 'action', 'entity_type')},
+            },
+        ),
+    ]
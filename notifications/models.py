@@ -1,5 +1,13 @@
-from django.db import models
+import gzip
+import json
+
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from . import events
 
 
 class Notification(models.Model):
@@ -30,24 +38,175 @@ class Notification(models.Model):
     link = models.CharField(max_length=255, blank=True, null=True)
     
     is_read = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     
     def __str__(self):
         return f"{self.notification_type} for {self.recipient.username}"
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Recent notifications dropdown
+            models.Index(fields=['recipient', '-created_at'], name='notif_recipient_recent_idx'),
+            # Unread badge count
+            models.Index(
+                fields=['recipient'],
+                name='notif_recipient_unread_idx',
+                condition=models.Q(is_read=False)
+            ),
+        ]
+    
+    @classmethod
+    def dropdown_state(cls, user):
+        """
+        The user's latest notification (id, created_at) and unread count, read
+        in one query from indexes only. Any change to the dropdown changes one
+        of these, so they serve as its conditional-GET validators.
+        """
+        latest = cls.objects.filter(recipient_id=OuterRef('pk')).order_by('-created_at')
+        unread = NotificationCounter.objects.filter(user_id=OuterRef('pk'))
+        return User.objects.filter(pk=user.pk).values(
+            latest_id=Subquery(latest.values('pk')[:1]),
+            latest_created_at=Subquery(latest.values('created_at')[:1]),
+            unread_count=Coalesce(Subquery(unread.values('unread_count')[:1]), 0),
+        ).get()
     
     @classmethod
     def create_notification(cls, recipient, notification_type, title, message, link=None):
         """Helper method to create notifications"""
-        return cls.objects.create(
-            recipient=recipient,
-            notification_type=notification_type,
-            title=title,
-            message=message,
-            link=link
+        with transaction.atomic():
+            notification = cls.objects.create(
+                recipient=recipient,
+                notification_type=notification_type,
+                title=title,
+                message=message,
+                link=link
+            )
+            NotificationCounter.increment(recipient.pk)
+            events.publish_notifications([notification])
+        return notification
+    
+    @classmethod
+    def create_notifications(cls, notifications):
+        """
+        Insert many unsaved notifications with a single bulk INSERT
+        and bump each recipient's unread counter
+        """
+        if not notifications:
+            return []
+        per_user = {}
+        for notification in notifications:
+            per_user[notification.recipient_id] = per_user.get(notification.recipient_id, 0) + 1
+        with transaction.atomic():
+            created = cls.objects.bulk_create(notifications)
+            NotificationCounter.increment_many(per_user)
+            events.publish_notifications(created)
+        return created
+    
+    def mark_read(self):
+        """Mark this notification as read and keep the unread counter in sync"""
+        with transaction.atomic():
+            updated = Notification.objects.filter(pk=self.pk, is_read=False).update(is_read=True)
+            if updated:
+                NotificationCounter.decrement(self.recipient_id, updated)
+        self.is_read = True
+    
+    @classmethod
+    def mark_all_read(cls, recipient):
+        """Mark all of a user's notifications as read"""
+        with transaction.atomic():
+            updated = cls.objects.filter(recipient=recipient, is_read=False).update(is_read=True)
+            if updated:
+                NotificationCounter.decrement(recipient.pk, updated)
+        return updated
+
+
+class NotificationCounter(models.Model):
+    """
+    NotificationCounter model - denormalized unread notification count per user
+    Read by the notification badge instead of counting rows on every request
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='notification_counter'
+    )
+    unread_count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.unread_count} unread"
+    
+    @classmethod
+    def get_unread_count(cls, user):
+        """Return the stored unread count for a user (0 if no counter exists yet)"""
+        count = cls.objects.filter(user_id=user.pk).values_list('unread_count', flat=True).first()
+        return count or 0
+    
+    @classmethod
+    def increment(cls, user_id, amount=1):
+        """Atomically add to a user's unread count, creating the row if needed"""
+        updated = cls.objects.filter(user_id=user_id).update(unread_count=F('unread_count') + amount)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(user_id=user_id, unread_count=amount)
+            except IntegrityError:
+                # Another request created the row first
+                cls.objects.filter(user_id=user_id).update(unread_count=F('unread_count') + amount)
+    
+    @classmethod
+    def increment_many(cls, amounts):
+        """
+        Atomically add to several users' unread counts.
+        `amounts` maps user id to the number of new notifications.
+        """
+        cls.objects.bulk_create(
+            [cls(user_id=user_id) for user_id in amounts],
+            ignore_conflicts=True
         )
+        by_amount = {}
+        for user_id, amount in amounts.items():
+            by_amount.setdefault(amount, []).append(user_id)
+        for amount, user_ids in by_amount.items():
+            cls.objects.filter(user_id__in=user_ids).update(unread_count=F('unread_count') + amount)
+    
+    @classmethod
+    def decrement(cls, user_id, amount=1):
+        """Atomically subtract from a user's unread count without going below zero"""
+        cls.objects.filter(user_id=user_id).update(
+            unread_count=Greatest(F('unread_count') - amount, 0)
+        )
+    
+    @classmethod
+    def reconcile(cls):
+        """
+        Recompute every counter from the Notification table.
+        Returns the number of counters that had drifted.
+        """
+        actual = dict(
+            Notification.objects.filter(is_read=False)
+            .order_by()
+            .values('recipient')
+            .annotate(count=models.Count('pk'))
+            .values_list('recipient', 'count')
+        )
+        stored = dict(cls.objects.values_list('user_id', 'unread_count'))
+        
+        drifted = 0
+        missing = []
+        for user_id in set(actual) | set(stored):
+            count = actual.get(user_id, 0)
+            if user_id not in stored:
+                missing.append(cls(user_id=user_id, unread_count=count))
+            elif stored[user_id] != count:
+                cls.objects.filter(user_id=user_id).update(unread_count=count)
+            else:
+                continue
+            drifted += 1
+        
+        cls.objects.bulk_create(missing, ignore_conflicts=True)
+        return drifted
 
 
 class ActivityLog(models.Model):
@@ -88,7 +247,7 @@ class ActivityLog(models.Model):
     organization_id = models.PositiveIntegerField(null=True, blank=True)
     
     description = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     
     def __str__(self):
         return f"{self.user.username} {self.get_action_display()} {self.entity_type}"
@@ -96,6 +255,10 @@ class ActivityLog(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Activity logs'
+        indexes = [
+            # Activity feed per organization, newest first
+            models.Index(fields=['organization_id', '-created_at'], name='activity_org_recent_idx'),
+        ]
     
     @classmethod
     def log_activity(cls, user, action, entity_type, entity_id, entity_name, 
@@ -112,3 +275,84 @@ class ActivityLog(models.Model):
             old_value=old_value,
             new_value=new_value
         )
+
+
+class ActivityArchive(models.Model):
+    """
+    ActivityArchive model - gzip-compressed JSON Lines of archived ActivityLog rows
+    One row per organization per retention batch; written by notifications/retention.py
+    """
+    organization_id = models.PositiveIntegerField(null=True, blank=True)
+    row_count = models.PositiveIntegerField()
+    first_created_at = models.DateTimeField()
+    last_created_at = models.DateTimeField()
+    data = models.BinaryField()
+    archived_at = models.DateTimeField(default=timezone.now, editable=False)
+    
+    def __str__(self):
+        return f"{self.row_count} activities for organization {self.organization_id}"
+    
+    def rows(self):
+        """The archived activities as dicts"""
+        return [json.loads(line) for line in gzip.decompress(self.data).splitlines()]
+    
+    class Meta:
+        ordering = ['first_created_at']
+        indexes = [
+            models.Index(fields=['organization_id', 'first_created_at'], name='archive_org_start_idx'),
+        ]
+
+
+class ActivityRollup(models.Model):
+    """
+    ActivityRollup model - per-day activity counts kept after the rows are archived
+    """
+    organization_id = models.PositiveIntegerField(null=True, blank=True)
+    day = models.DateField()
+    action = models.CharField(max_length=20, choices=ActivityLog.ACTION_CHOICES)
+    entity_type = models.CharField(max_length=20, choices=ActivityLog.ENTITY_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.day} {self.action} {self.entity_type}: {self.count}"
+    
+    class Meta:
+        ordering = ['-day']
+        unique_together = ('organization_id', 'day', 'action', 'entity_type')
+
+
+class OutboxEvent(models.Model):
+    """
+    OutboxEvent model - activity and notification writes deferred from the request
+    Written in the same transaction as the domain change and drained in
+    batches by the process_outbox worker
+    """
+    KIND_CHOICES = (
+        ('ACTIVITY', 'Activity Log'),
+        ('NOTIFICATIONS', 'Notifications'),
+    )
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    
+    # Worker bookkeeping
+    locked_by = models.CharField(max_length=64, blank=True, null=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    
+    def __str__(self):
+        return f"{self.kind} #{self.pk}"
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Pending events, oldest first
+            models.Index(
+                fields=['id'],
+                name='outbox_pending_idx',
+                condition=models.Q(processed_at__isnull=True)
+            ),
+        ]
@@ -0,0 +1,157 @@
+"""
+Transactional outbox for activity logging and notifications.
+
+When settings.OUTBOX_ENABLED is on, log_*_activity and NotificationDispatcher
+write a single OutboxEvent row instead of ActivityLog/Notification rows. The
+event is committed together with the domain change, and the process_outbox
+command drains pending events into real rows in batches.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from dashboard import fragments, telemetry
+from .models import ActivityLog, Notification, OutboxEvent
+
+# Events that keep failing are left for an operator to inspect
+MAX_ATTEMPTS = 5
+
+# Claims older than this are assumed to belong to a dead worker
+LOCK_TIMEOUT = timedelta(minutes=5)
+
+
+def outbox_enabled():
+    return getattr(settings, 'OUTBOX_ENABLED', False)
+
+
+def enqueue_activity(**fields):
+    """Queue one ActivityLog row"""
+    fields['created_at'] = timezone.now().isoformat()
+    return OutboxEvent.objects.create(kind='ACTIVITY', payload=fields)
+
+
+def enqueue_activities(activities):
+    """Queue a batch of unsaved ActivityLog instances as one event"""
+    now = timezone.now().isoformat()
+    payload = [{
+        'user_id': a.user_id,
+        'action': a.action,
+        'entity_type': a.entity_type,
+        'entity_id': a.entity_id,
+        'entity_name': a.entity_name,
+        'description': a.description,
+        'organization_id': a.organization_id,
+        'old_value': a.old_value,
+        'new_value': a.new_value,
+        'created_at': now,
+    } for a in activities]
+    return OutboxEvent.objects.create(kind='ACTIVITY', payload=payload)
+
+
+def enqueue_notifications(notifications):
+    """Queue a batch of unsaved Notification instances as one event"""
+    now = timezone.now().isoformat()
+    payload = [{
+        'recipient_id': n.recipient_id,
+        'notification_type': n.notification_type,
+        'title': n.title,
+        'message': n.message,
+        'link': n.link,
+        'created_at': now,
+    } for n in notifications]
+    return OutboxEvent.objects.create(kind='NOTIFICATIONS', payload=payload)
+
+
+def claim_batch(worker_id, batch_size=100):
+    """
+    Lock up to `batch_size` pending events for this worker.
+    The conditional UPDATE makes the claim safe on databases without
+    SELECT ... FOR UPDATE SKIP LOCKED (e.g. SQLite).
+    """
+    now = timezone.now()
+    claimable = Q(locked_at__isnull=True) | Q(locked_at__lt=now - LOCK_TIMEOUT)
+    pending = OutboxEvent.objects.filter(processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS)
+
+    ids = list(pending.filter(claimable).order_by('id').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    pending.filter(claimable, id__in=ids).update(locked_by=worker_id, locked_at=now)
+    return list(pending.filter(id__in=ids, locked_by=worker_id).order_by('id'))
+
+
+def _build_rows(event):
+    """Turn one event into unsaved ActivityLog and Notification instances"""
+    if event.kind == 'ACTIVITY':
+        # One row from enqueue_activity, or a list from enqueue_activities
+        items = event.payload if isinstance(event.payload, list) else [event.payload]
+        activities = []
+        for item in items:
+            fields = dict(item)
+            fields['created_at'] = parse_datetime(fields['created_at'])
+            activities.append(ActivityLog(**fields))
+        return activities, []
+
+    notifications = []
+    for item in event.payload:
+        fields = dict(item)
+        fields['created_at'] = parse_datetime(fields['created_at'])
+        notifications.append(Notification(**fields))
+    return [], notifications
+
+
+def _apply(events):
+    """Write the rows for `events` and mark them processed, in one transaction"""
+    activities, notifications = [], []
+    for event in events:
+        event_activities, event_notifications = _build_rows(event)
+        activities.extend(event_activities)
+        notifications.extend(event_notifications)
+
+    with transaction.atomic():
+        ActivityLog.objects.bulk_create(activities)
+        Notification.create_notifications(notifications)
+        OutboxEvent.objects.filter(id__in=[e.id for e in events]).update(
+            processed_at=timezone.now(), locked_by=None, locked_at=None
+        )
+
+    # bulk_create skips post_save, so invalidate the activity fragments here
+    fragments.bump(*{activity.organization_id for activity in activities})
+    now = timezone.now()
+    for event in events:
+        telemetry.OUTBOX_DELIVERY_LAG.observe((now - event.created_at).total_seconds())
+
+
+def process_batch(worker_id=None, batch_size=100):
+    """
+    Claim and drain one batch of events. Returns the number of events handled.
+    If the batch fails as a whole, events are retried one by one so a single
+    bad event cannot block the queue.
+    """
+    worker_id = worker_id or uuid.uuid4().hex
+    events = claim_batch(worker_id, batch_size)
+    if not events:
+        return 0
+
+    try:
+        _apply(events)
+    except Exception:
+        for event in events:
+            try:
+                _apply([event])
+            except Exception as e:
+                OutboxEvent.objects.filter(pk=event.pk).update(
+                    attempts=F('attempts') + 1,
+                    last_error=str(e),
+                    locked_by=None,
+                    locked_at=None
+                )
+    return len(events)
+
+
+def pending_count():
+    return OutboxEvent.objects.filter(processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS).count()
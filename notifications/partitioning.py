@@ -0,0 +1,357 @@
+"""
+Optional month-partitioned storage for ActivityLog (settings.ACTIVITY_PARTITIONING).
+
+PostgreSQL: convert_postgresql() turns notifications_activitylog into a native
+RANGE-partitioned table with one partition per month (<table>_pYYYYMM) and a
+DEFAULT partition for anything outside them. Inserts through the ORM are
+routed by the database; maintain() creates the upcoming months ahead of time.
+
+SQLite: has no native partitioning, so the main table holds the current month
+and maintain() moves closed months into per-month shadow tables with the same
+schema (<table>_pYYYYMM), in batches.
+
+Reads of the activity feed go through recent_activity(), which walks the
+partitions newest first and stops as soon as older partitions cannot contain
+anything newer than what it already has, so a feed page normally touches only
+the current month. ORM queries on ActivityLog still see every row on
+PostgreSQL but only the current (unrotated) rows on SQLite.
+"""
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import prefetch_related_objects
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ActivityLog
+
+BASE_TABLE = ActivityLog._meta.db_table
+
+# Months of PostgreSQL partitions created ahead of the current one
+MONTHS_AHEAD = 2
+
+
+def enabled():
+    return getattr(settings, 'ACTIVITY_PARTITIONING', False)
+
+
+def is_native():
+    """True when the database partitions natively (PostgreSQL)"""
+    return connection.vendor == 'postgresql'
+
+
+def month_start(value):
+    """First instant (UTC) of the month containing `value`"""
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month, base=BASE_TABLE):
+    return f'{base}_p{month:%Y%m}'
+
+
+def overflow_table(base=BASE_TABLE):
+    """Table holding rows that are not in a monthly partition"""
+    return f'{base}_pdefault' if is_native() else base
+
+
+def partitions(base=BASE_TABLE):
+    """[(month, table name)] of the monthly partitions, newest first"""
+    with connection.cursor() as cursor:
+        if is_native():
+            cursor.execute(
+                """
+                SELECT child.relname FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = %s
+                """,
+                [base]
+            )
+        else:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE %s", [f'{base}_p%'])
+        names = [row[0] for row in cursor.fetchall()]
+
+    pattern = re.compile(rf'^{re.escape(base)}_p(\d{{4}})(\d{{2}})$')
+    found = []
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            found.append((datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc), name))
+    return sorted(found, reverse=True)
+
+
+def _db_datetime(value):
+    return connection.ops.adapt_datetimefield_value(value)
+
+
+def clone_table(source, name):
+    """Create table `name` with the columns of `source` and an organization feed index"""
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        if is_native():
+            cursor.execute(
+                f'CREATE TABLE {qn(name)} (LIKE {qn(source)} INCLUDING DEFAULTS INCLUDING IDENTITY)'
+            )
+            cursor.execute(f'ALTER TABLE {qn(name)} ADD PRIMARY KEY (id)')
+        else:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", [source])
+            ddl = cursor.fetchone()[0]
+            cursor.execute(re.sub(rf'^CREATE TABLE "?{re.escape(source)}"?', f'CREATE TABLE {qn(name)}', ddl))
+        cursor.execute(f'CREATE INDEX {qn(name + "_org_recent")} ON {qn(name)} (organization_id, created_at)')
+
+
+# ---------- PostgreSQL ----------
+
+def is_partitioned(base=BASE_TABLE):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT 1 FROM pg_partitioned_table
+            JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid
+            WHERE pg_class.relname = %s
+            """,
+            [base]
+        )
+        return cursor.fetchone() is not None
+
+
+def create_partition(month, base=BASE_TABLE):
+    """Create the partition for `month` if it does not exist yet"""
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {qn(partition_name(month, base))} PARTITION OF {qn(base)} '
+            f'FOR VALUES FROM (%s) TO (%s)',
+            [month, add_months(month, 1)]
+        )
+
+
+def create_partitioned_table(base, like):
+    """Create an empty RANGE(created_at)-partitioned table shaped like `like`"""
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE {qn(base)} (LIKE {qn(like)} INCLUDING DEFAULTS INCLUDING IDENTITY) '
+            f'PARTITION BY RANGE (created_at)'
+        )
+        # The partition key has to be part of the primary key
+        cursor.execute(f'ALTER TABLE {qn(base)} ADD PRIMARY KEY (id, created_at)')
+        cursor.execute(f'CREATE INDEX {qn(base + "_org_recent")} ON {qn(base)} (organization_id, created_at DESC)')
+        cursor.execute(f'CREATE TABLE {qn(base + "_pdefault")} PARTITION OF {qn(base)} DEFAULT')
+
+
+def convert_postgresql(months_ahead=MONTHS_AHEAD):
+    """
+    Rebuild notifications_activitylog as a partitioned table, copying every
+    row. Takes an exclusive lock for the duration; run it in a maintenance
+    window. The new table's indexes are not the ones Django's migrations
+    created, so later migrations that touch ActivityLog indexes need a manual
+    step. Returns the number of monthly partitions created.
+    """
+    qn = connection.ops.quote_name
+    legacy = f'{BASE_TABLE}_legacy'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {qn(BASE_TABLE)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'SELECT MIN(created_at) FROM {qn(BASE_TABLE)}')
+        oldest = cursor.fetchone()[0] or timezone.now()
+
+        cursor.execute(f'ALTER TABLE {qn(BASE_TABLE)} RENAME TO {qn(legacy)}')
+        # Constraint names are per schema; free the primary key name for the new table
+        cursor.execute(f'ALTER TABLE {qn(legacy)} RENAME CONSTRAINT {qn(BASE_TABLE + "_pkey")} TO {qn(legacy + "_pkey")}')
+        create_partitioned_table(BASE_TABLE, legacy)
+        cursor.execute(
+            f'ALTER TABLE {qn(BASE_TABLE)} ADD FOREIGN KEY (user_id) '
+            f'REFERENCES {qn(User._meta.db_table)} (id) DEFERRABLE INITIALLY DEFERRED'
+        )
+
+        month, last = month_start(oldest), add_months(month_start(timezone.now()), months_ahead)
+        created = 0
+        while month <= last:
+            create_partition(month)
+            month = add_months(month, 1)
+            created += 1
+
+        cursor.execute(f'INSERT INTO {qn(BASE_TABLE)} SELECT * FROM {qn(legacy)}')
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 1)) FROM {qn(BASE_TABLE)}",
+            [BASE_TABLE]
+        )
+        cursor.execute(f'DROP TABLE {qn(legacy)}')
+    return created
+
+
+# ---------- SQLite ----------
+
+def create_shadow(month, base=BASE_TABLE):
+    """Create the shadow table for `month`, with the same schema as `base`, if it does not exist yet"""
+    name = partition_name(month, base)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [name])
+        exists = cursor.fetchone()
+    if not exists:
+        clone_table(base, name)
+    return name
+
+
+def rotate(batch_size=1000, base=BASE_TABLE):
+    """
+    Move rows of closed months from `base` into their shadow tables, oldest
+    first, one short transaction per batch. Returns the number of rows moved.
+    """
+    qn = connection.ops.quote_name
+    cutoff = _db_datetime(month_start(timezone.now()))
+    moved = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id, created_at FROM {qn(base)} WHERE created_at < %s ORDER BY id LIMIT %s',
+                [cutoff, batch_size]
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return moved
+            by_month = {}
+            for pk, created_at in rows:
+                created_at = connection.ops.convert_datetimefield_value(created_at, None, connection)
+                by_month.setdefault(month_start(created_at), []).append(pk)
+            for month, ids in by_month.items():
+                shadow = create_shadow(month, base)
+                placeholders = ', '.join(['%s'] * len(ids))
+                cursor.execute(f'INSERT INTO {qn(shadow)} SELECT * FROM {qn(base)} WHERE id IN ({placeholders})', ids)
+                cursor.execute(f'DELETE FROM {qn(base)} WHERE id IN ({placeholders})', ids)
+            moved += len(rows)
+
+
+def shadow_rows(table, older_than, limit):
+    """Oldest rows of a shadow table created before `older_than`, as ActivityLog instances"""
+    qn = connection.ops.quote_name
+    return list(ActivityLog.objects.raw(
+        f'SELECT * FROM {qn(table)} WHERE created_at < %s ORDER BY id LIMIT %s',
+        [_db_datetime(older_than), limit]
+    ))
+
+
+def delete_shadow_rows(table, ids):
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {qn(table)} WHERE id IN ({", ".join(["%s"] * len(ids))})', list(ids))
+
+
+def drop_if_empty(table):
+    """Drop a shadow table once retention has emptied it; returns True if dropped"""
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT 1 FROM {qn(table)} LIMIT 1')
+        if cursor.fetchone():
+            return False
+        cursor.execute(f'DROP TABLE {qn(table)}')
+    return True
+
+
+def maintain(batch_size=1000):
+    """
+    Scheduler hook: create upcoming PostgreSQL partitions, or rotate closed
+    months into SQLite shadow tables. Returns a short description of what it did.
+    """
+    if not enabled():
+        return 'partitioning disabled'
+    if is_native():
+        if not is_partitioned():
+            return 'not converted; run partition_activity_log --convert'
+        month = month_start(timezone.now())
+        for offset in range(MONTHS_AHEAD + 1):
+            create_partition(add_months(month, offset))
+        return f'partitions ensured through {add_months(month, MONTHS_AHEAD):%Y-%m}'
+    return f'{rotate(batch_size)} row(s) moved to monthly tables'
+
+
+@receiver(pre_delete, sender=User)
+def delete_shadow_activity(sender, instance, **kwargs):
+    # The ORM cascade only reaches the main table; shadow rows would block the delete
+    if enabled() and not is_native():
+        for month, table in partitions():
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(table)} WHERE user_id = %s', [instance.pk])
+
+
+# ---------- Reads ----------
+
+def _fetch(table, organization_id, limit, before):
+    qn = connection.ops.quote_name
+    sql = f'SELECT * FROM {qn(table)} WHERE organization_id = %s'
+    params = [organization_id]
+    if before:
+        created_at, pk = before
+        sql += ' AND (created_at < %s OR (created_at = %s AND id < %s))'
+        params += [_db_datetime(created_at), _db_datetime(created_at), pk]
+    sql += ' ORDER BY created_at DESC, id DESC LIMIT %s'
+    return list(ActivityLog.objects.raw(sql, params + [limit]))
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(activity):
+    """Opaque feed cursor for the rows after `activity`: '<microseconds>-<id>'"""
+    delta = activity.created_at - _EPOCH
+    return f'{(delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds}-{activity.pk}'
+
+
+def decode_cursor(value):
+    """(created_at, id) from encode_cursor(), or None for a missing or malformed cursor"""
+    try:
+        micros, pk = (int(part) for part in value.split('-'))
+        return _EPOCH + timedelta(microseconds=micros), pk
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def recent_activity(organization_id, limit=50, before=None, base=None, with_users=True):
+    """
+    Newest `limit` activities of an organization, older than `before`
+    ((created_at, id) of the last row already shown) when given.
+    Without partitioning this is a plain indexed query.
+    """
+    if base is None:
+        if not enabled():
+            activities = ActivityLog.objects.filter(organization_id=organization_id)
+            if before:
+                created_at, pk = before
+                activities = activities.exclude(created_at__gt=created_at).exclude(created_at=created_at, pk__gte=pk)
+            if with_users:
+                activities = activities.select_related('user')
+            return list(activities.order_by('-created_at', '-id')[:limit])
+        base = BASE_TABLE
+
+    months = [(table, add_months(month, 1)) for month, table in partitions(base)]
+    if months or not is_native():
+        # A converted PostgreSQL table always has its DEFAULT partition next to the monthly ones
+        sources = [(overflow_table(base), None)] + months
+    else:
+        # Not converted yet (or the conversion failed): every row is still in the plain table
+        sources = [(base, None)]
+    rows = []
+    for table, upper in sources:
+        if before and upper is not None and add_months(upper, -1) > before[0]:
+            # The whole month is newer than the cursor
+            continue
+        if len(rows) >= limit and upper is not None and upper <= rows[-1].created_at:
+            # This and every older partition only hold rows older than the page
+            break
+        rows.extend(_fetch(table, organization_id, limit, before))
+        rows.sort(key=lambda activity: (activity.created_at, activity.pk), reverse=True)
+        del rows[limit:]
+
+    if with_users:
+        prefetch_related_objects(rows, 'user')
+    return rows
@@ -0,0 +1,185 @@
+"""
+Retention for the Notification and ActivityLog tables.
+
+- Read notifications older than NOTIFICATION_RETENTION_DAYS are deleted.
+- ActivityLog rows older than ACTIVITY_ARCHIVE_DAYS are moved into
+  ActivityArchive (gzip-compressed JSON Lines, one row per organization per
+  batch), and ActivityRollup keeps their per-day counts.
+
+Work is done in small batches, oldest first, each in its own short
+transaction, so a run can happen while the app serves traffic and an
+interrupted run simply continues where it stopped the next time. Runs do not
+overlap: a cache lock (use a shared cache backend with several hosts) makes a
+second run return straight away.
+
+Schedule run_scheduled() from cron, Celery beat or similar, or call the
+apply_retention management command.
+"""
+import gzip
+import json
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import partitioning
+from .models import ActivityArchive, ActivityLog, ActivityRollup, Notification
+
+LOCK_KEY = 'notifications:retention:lock'
+
+# A run still holding the lock after this long is assumed to have died
+LOCK_TIMEOUT = 60 * 60
+
+ARCHIVE_FIELDS = (
+    'id', 'user_id', 'action', 'entity_type', 'entity_id', 'entity_name',
+    'old_value', 'new_value', 'organization_id', 'description', 'created_at',
+)
+
+
+def _batches(step, batch_size, max_batches=None, pause=0):
+    """Call step(batch_size) until it handles nothing; returns the total handled"""
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        handled = step(batch_size)
+        if not handled:
+            break
+        total += handled
+        batches += 1
+        if pause:
+            # Let other writers through between batches
+            time.sleep(pause)
+    return total
+
+
+def purge_read_notifications(older_than_days, batch_size=1000, max_batches=None, pause=0):
+    """Delete read notifications older than `older_than_days`; returns the number deleted"""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+
+    def step(limit):
+        ids = list(Notification.objects.filter(
+            is_read=True, created_at__lt=cutoff
+        ).order_by('id').values_list('id', flat=True)[:limit])
+        if ids:
+            # Read notifications are not in the unread counter, so it stays correct
+            Notification.objects.filter(pk__in=ids).delete()
+        return len(ids)
+
+    return _batches(step, batch_size, max_batches, pause)
+
+
+def _serialize(activity):
+    row = {field: getattr(activity, field) for field in ARCHIVE_FIELDS}
+    row['created_at'] = activity.created_at.isoformat()
+    return json.dumps(row)
+
+
+def _add_rollups(counts):
+    """Add `counts` ({(organization_id, day, action, entity_type): n}) to the rollups"""
+    for (organization_id, day, action, entity_type), count in counts.items():
+        key = {'organization_id': organization_id, 'day': day, 'action': action, 'entity_type': entity_type}
+        if not ActivityRollup.objects.filter(**key).update(count=F('count') + count):
+            ActivityRollup.objects.create(count=count, **key)
+
+
+def _archive(activities):
+    """Write `activities` into ActivityArchive and ActivityRollup"""
+    by_organization, counts = {}, {}
+    for activity in activities:
+        by_organization.setdefault(activity.organization_id, []).append(activity)
+        key = (activity.organization_id, timezone.localdate(activity.created_at),
+               activity.action, activity.entity_type)
+        counts[key] = counts.get(key, 0) + 1
+
+    ActivityArchive.objects.bulk_create([
+        ActivityArchive(
+            organization_id=organization_id,
+            row_count=len(rows),
+            first_created_at=min(row.created_at for row in rows),
+            last_created_at=max(row.created_at for row in rows),
+            data=gzip.compress('\n'.join(_serialize(row) for row in rows).encode())
+        )
+        for organization_id, rows in by_organization.items()
+    ])
+    _add_rollups(counts)
+
+
+def _archive_shadow_tables(cutoff, batch_size, max_batches, pause):
+    """Archive from the SQLite monthly shadow tables, dropping the ones emptied"""
+    archived = 0
+    for month, table in reversed(partitioning.partitions()):
+        if month >= cutoff:
+            break
+
+        def step(limit, table=table):
+            with transaction.atomic():
+                activities = partitioning.shadow_rows(table, cutoff, limit)
+                if activities:
+                    _archive(activities)
+                    partitioning.delete_shadow_rows(table, [activity.pk for activity in activities])
+            return len(activities)
+
+        archived += _batches(step, batch_size, max_batches, pause)
+        partitioning.drop_if_empty(table)
+    return archived
+
+
+def archive_activity(older_than_days, batch_size=1000, max_batches=None, pause=0):
+    """
+    Move ActivityLog rows older than `older_than_days` into ActivityArchive and
+    ActivityRollup; returns the number archived. With partitioning on SQLite,
+    max_batches applies to each monthly table separately.
+    """
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+
+    def step(limit):
+        with transaction.atomic():
+            activities = list(ActivityLog.objects.filter(created_at__lt=cutoff).order_by('id')[:limit])
+            if activities:
+                _archive(activities)
+                ActivityLog.objects.filter(pk__in=[activity.pk for activity in activities]).delete()
+        return len(activities)
+
+    archived = 0
+    if partitioning.enabled() and not partitioning.is_native():
+        archived += _archive_shadow_tables(cutoff, batch_size, max_batches, pause)
+    return archived + _batches(step, batch_size, max_batches, pause)
+
+
+def run(notification_days=None, activity_days=None, batch_size=None, max_batches=None, pause=0):
+    """
+    Run both retention jobs, with settings for any option not given.
+    Returns {'notifications': n, 'activities': n}, or None if another run holds the lock.
+    A job whose days option is 0 is skipped. With ACTIVITY_PARTITIONING on, the
+    run also does partition maintenance and reports it under 'partitions'.
+    """
+    if notification_days is None:
+        notification_days = getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90)
+    if activity_days is None:
+        activity_days = getattr(settings, 'ACTIVITY_ARCHIVE_DAYS', 365)
+    batch_size = batch_size or getattr(settings, 'RETENTION_BATCH_SIZE', 1000)
+
+    token = uuid.uuid4().hex
+    if not cache.add(LOCK_KEY, token, LOCK_TIMEOUT):
+        return None
+    try:
+        result = {'notifications': 0, 'activities': 0}
+        if notification_days:
+            result['notifications'] = purge_read_notifications(notification_days, batch_size, max_batches, pause)
+        if activity_days:
+            result['activities'] = archive_activity(activity_days, batch_size, max_batches, pause)
+        if partitioning.enabled():
+            result['partitions'] = partitioning.maintain(batch_size)
+        return result
+    finally:
+        if cache.get(LOCK_KEY) == token:
+            cache.delete(LOCK_KEY)
+
+
+def run_scheduled():
+    """Entry point for schedulers: one run with the configured settings"""
+    return run()
@@ -0,0 +1,553 @@
+import asyncio
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, Client, AsyncClient, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from accounts.models import UserProfile
+from projects.models import Organization, Project
+from tasks.models import Task, TaskComment
+from .models import Notification, NotificationCounter, ActivityLog, OutboxEvent
+from . import events, outbox, partitioning, retention
+from .utils import NotificationDispatcher, notify_task_comment, notify_task_created, notify_task_assigned
+
+
+class NotificationCounterTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='employee', password='password123')
+        UserProfile.objects.create(user=self.user, role='EMPLOYEE')
+
+    def notify(self, title='Hello'):
+        return Notification.create_notification(
+            recipient=self.user,
+            notification_type='TASK_UPDATED',
+            title=title,
+            message='Something happened'
+        )
+
+    def test_create_increments_counter(self):
+        """Test that creating notifications bumps the unread counter"""
+        self.notify()
+        self.notify()
+        self.assertEqual(NotificationCounter.get_unread_count(self.user), 2)
+
+    def test_mark_read_decrements_once(self):
+        """Test that marking the same notification read twice only decrements once"""
+        notification = self.notify()
+        self.notify()
+
+        notification.mark_read()
+        notification.mark_read()
+        self.assertEqual(NotificationCounter.get_unread_count(self.user), 1)
+
+    def test_mark_all_read_view_resets_counter(self):
+        """Test that the mark-all-read view clears the counter"""
+        self.notify()
+        self.notify()
+        self.client.force_login(self.user)
+
+        self.client.post(reverse('notifications:mark_all_read'))
+        self.assertEqual(NotificationCounter.get_unread_count(self.user), 0)
+
+        response = self.client.get(reverse('notifications:unread_count'))
+        self.assertEqual(response.json()['count'], 0)
+
+    def test_reconcile_command_repairs_drift(self):
+        """Test that the reconcile command recomputes drifted counters"""
+        self.notify()
+        self.notify()
+        NotificationCounter.objects.filter(user=self.user).update(unread_count=7)
+
+        out = StringIO()
+        call_command('reconcile_notification_counts', stdout=out)
+
+        self.assertIn('Reconciled 1', out.getvalue())
+        self.assertEqual(NotificationCounter.get_unread_count(self.user), 2)
+
+
+class NotificationDropdownTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='employee', password='password123')
+        UserProfile.objects.create(user=self.user, role='EMPLOYEE')
+        self.client.force_login(self.user)
+        self.url = reverse('notifications:recent')
+
+    def notify(self, title='Hello'):
+        return Notification.create_notification(
+            recipient=self.user,
+            notification_type='TASK_UPDATED',
+            title=title,
+            message='Something happened'
+        )
+
+    def test_unchanged_dropdown_is_not_modified(self):
+        """Test that a matching ETag is answered with 304 from one validator query"""
+        self.notify()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['unread_count'], 1)
+        self.assertTrue(response.has_header('Last-Modified'))
+        etag = response['ETag']
+
+        # session, user, profile, validators
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_new_and_read_notifications_change_the_etag(self):
+        """Test that both new notifications and reads invalidate the client's copy"""
+        notification = self.notify()
+        etag = self.client.get(self.url)['ETag']
+
+        self.notify('Second')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['notifications']), 2)
+        etag = response['ETag']
+
+        notification.mark_read()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['unread_count'], 1)
+
+
+class NotificationDispatcherTests(TestCase):
+    def setUp(self):
+        self.enterprise_user = User.objects.create_user(username='enterprise', password='password123')
+        self.organization = Organization.objects.create(name='Acme', created_by=self.enterprise_user)
+        self.manager = User.objects.create_user(username='manager', password='password123')
+        self.employee = User.objects.create_user(username='employee', password='password123')
+        self.project = Project.objects.create(
+            name='Website',
+            organization=self.organization,
+            manager=self.manager,
+            created_by=self.enterprise_user
+        )
+        self.task = Task.objects.create(
+            title='Build homepage',
+            project=self.project,
+            created_by=self.manager,
+            assigned_to=self.employee
+        )
+
+    def test_comment_fan_out_is_constant(self):
+        """Test that comment notifications cost the same queries regardless of thread size"""
+        commenters = [User.objects.create_user(username=f'commenter{i}') for i in range(10)]
+        for commenter in commenters:
+            TaskComment.objects.create(task=self.task, user=commenter, comment='+1')
+        comment = TaskComment.objects.create(task=self.task, user=self.employee, comment='Done')
+        task = Task.objects.select_related('project').get(pk=self.task.pk)
+        comment.task = task
+
+        # previous commenters, savepoint, bulk INSERT, counter rows, counter UPDATE, release
+        with self.assertNumQueries(6):
+            notify_task_comment(comment, self.employee)
+
+        recipients = set(Notification.objects.values_list('recipient_id', flat=True))
+        self.assertEqual(recipients, {self.manager.pk} | {c.pk for c in commenters})
+        self.assertEqual(NotificationCounter.get_unread_count(commenters[0]), 1)
+
+    def test_shared_dispatcher_writes_one_batch(self):
+        """Test that helpers sharing a dispatcher are written together"""
+        dispatcher = NotificationDispatcher()
+        notify_task_created(self.task, self.manager, dispatcher=dispatcher)
+        notify_task_assigned(self.task, self.manager, dispatcher=dispatcher)
+        self.assertEqual(Notification.objects.count(), 0)
+
+        created = dispatcher.dispatch()
+        self.assertEqual(len(created), 2)
+        self.assertEqual(NotificationCounter.get_unread_count(self.enterprise_user), 1)
+        self.assertEqual(NotificationCounter.get_unread_count(self.employee), 1)
+
+
+@override_settings(OUTBOX_ENABLED=True)
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.enterprise_user = User.objects.create_user(username='enterprise', password='password123')
+        self.organization = Organization.objects.create(name='Acme', created_by=self.enterprise_user)
+        UserProfile.objects.create(user=self.enterprise_user, role='ENTERPRISE', organization=self.organization)
+        self.manager = User.objects.create_user(username='manager', password='password123')
+        UserProfile.objects.create(user=self.manager, role='MANAGER', organization=self.organization)
+        self.employee = User.objects.create_user(username='employee', password='password123')
+        UserProfile.objects.create(user=self.employee, role='EMPLOYEE', organization=self.organization)
+        self.project = Project.objects.create(
+            name='Website',
+            organization=self.organization,
+            manager=self.manager,
+            created_by=self.enterprise_user
+        )
+        self.task = Task.objects.create(
+            title='Build homepage',
+            project=self.project,
+            created_by=self.manager,
+            assigned_to=self.employee
+        )
+
+    def test_outbox_requires_shared_cache(self):
+        """Test that the system check rejects the outbox with the per-process locmem cache"""
+        import tempfile
+        from .checks import outbox_needs_shared_cache
+
+        self.assertEqual([error.id for error in outbox_needs_shared_cache(None)], ['notifications.E001'])
+        with tempfile.TemporaryDirectory() as directory, self.settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+        }}):
+            self.assertEqual(outbox_needs_shared_cache(None), [])
+
+    def test_bulk_activities_are_one_event(self):
+        """Test that a bulk change queues its activity rows as a single event"""
+        self.client.force_login(self.manager)
+        self.client.post(reverse('tasks:bulk_update'), json.dumps({
+            'task_ids': [self.task.pk], 'changes': {'status': 'DONE', 'priority': 'HIGH'}
+        }), content_type='application/json')
+
+        self.assertEqual(OutboxEvent.objects.filter(kind='ACTIVITY').count(), 1)
+        call_command('process_outbox', once=True, stdout=StringIO())
+        self.assertEqual(ActivityLog.objects.filter(entity_id=self.task.pk).count(), 2)
+
+    def test_comment_is_queued_then_drained(self):
+        """Test that a comment writes outbox events which the worker turns into rows"""
+        self.client.force_login(self.employee)
+        self.client.post(reverse('tasks:add_comment', kwargs={'pk': self.task.pk}), {
+            'comment': 'Started work',
+            'status_changed_to': 'IN_PROGRESS'
+        })
+
+        self.assertEqual(ActivityLog.objects.count(), 0)
+        self.assertEqual(Notification.objects.count(), 0)
+        self.assertEqual(OutboxEvent.objects.count(), 3)
+
+        out = StringIO()
+        call_command('process_outbox', once=True, stdout=out)
+
+        self.assertIn('Processed 3', out.getvalue())
+        self.assertEqual(ActivityLog.objects.count(), 2)
+        self.assertEqual(Notification.objects.filter(recipient=self.manager).count(), 1)
+        self.assertEqual(NotificationCounter.get_unread_count(self.manager), 1)
+        self.assertEqual(outbox.pending_count(), 0)
+
+    def test_claimed_events_are_not_claimed_twice(self):
+        """Test that a second worker cannot claim events locked by the first"""
+        outbox.enqueue_activity(
+            user_id=self.manager.pk, action='UPDATE', entity_type='TASK',
+            entity_id=self.task.pk, entity_name=self.task.title, description='updated'
+        )
+        self.assertEqual(len(outbox.claim_batch('worker-a')), 1)
+        self.assertEqual(outbox.claim_batch('worker-b'), [])
+
+    def test_bad_event_does_not_block_queue(self):
+        """Test that a failing event is recorded and the rest of the batch is applied"""
+        OutboxEvent.objects.create(kind='ACTIVITY', payload={'created_at': 'bogus', 'nope': 1})
+        outbox.enqueue_activity(
+            user_id=self.manager.pk, action='UPDATE', entity_type='TASK',
+            entity_id=self.task.pk, entity_name=self.task.title, description='updated'
+        )
+
+        outbox.process_batch('worker-a')
+
+        self.assertEqual(ActivityLog.objects.count(), 1)
+        failed = OutboxEvent.objects.get(processed_at__isnull=True)
+        self.assertEqual(failed.attempts, 1)
+        self.assertTrue(failed.last_error)
+
+
+class RecordingBroker:
+    """Broker stand-in that keeps every published event"""
+    published = []
+
+    def publish(self, channel, event):
+        self.published.append((channel, event))
+
+
+@override_settings(EVENT_BROKER='notifications.tests.RecordingBroker')
+class EventPublishingTests(TestCase):
+    def setUp(self):
+        RecordingBroker.published.clear()
+        self.enterprise_user = User.objects.create_user(username='enterprise', password='password123')
+        self.organization = Organization.objects.create(name='Acme', created_by=self.enterprise_user)
+        UserProfile.objects.create(user=self.enterprise_user, role='ENTERPRISE', organization=self.organization)
+        self.manager = User.objects.create_user(username='manager', password='password123')
+        UserProfile.objects.create(user=self.manager, role='MANAGER', organization=self.organization)
+        self.employee = User.objects.create_user(username='employee', password='password123')
+        UserProfile.objects.create(user=self.employee, role='EMPLOYEE', organization=self.organization)
+        self.project = Project.objects.create(name='Website', organization=self.organization,
+                                              manager=self.manager, created_by=self.enterprise_user)
+
+    def test_notifications_are_published_after_commit(self):
+        """Test that new notifications reach the recipient channel only once committed"""
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Notification.create_notifications([
+                Notification(recipient=self.employee, notification_type='TASK_UPDATED',
+                             title='Hello', message='Something happened')
+            ])
+        self.assertEqual(RecordingBroker.published, [])
+
+        for callback in callbacks:
+            callback()
+        channel, event = RecordingBroker.published[0]
+        self.assertEqual(channel, f'user:{self.employee.pk}')
+        self.assertEqual((event['type'], event['title']), ('notification', 'Hello'))
+
+    def test_status_changes_reach_every_scope(self):
+        """Test that a transition is published to the organization, manager and assignee"""
+        task = Task.objects.create(title='Ship', project=self.project, created_by=self.manager,
+                                   assigned_to=self.employee)
+        with self.captureOnCommitCallbacks(execute=True):
+            task.transition('IN_PROGRESS', self.employee)
+
+        task_events = [(channel, event) for channel, event in RecordingBroker.published if event['type'] == 'task']
+        self.assertEqual({channel for channel, _ in task_events}, {
+            f'org:{self.organization.pk}', f'manager:{self.manager.pk}', f'user:{self.employee.pk}'
+        })
+        self.assertTrue(all(event['status'] == 'IN_PROGRESS' for _, event in task_events))
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='employee', password='password123')
+        UserProfile.objects.create(user=self.user, role='EMPLOYEE')
+
+    async def test_local_broker_delivers_to_subscribed_channels(self):
+        """Test that LocalBroker fans out per channel and forgets closed subscriptions"""
+        broker = events.LocalBroker()
+        async with broker.subscribe(['user:1']) as subscription:
+            broker.publish('user:2', {'type': 'other'})
+            broker.publish('user:1', {'type': 'mine'})
+            event = await asyncio.wait_for(subscription.get(), 1)
+        self.assertEqual(event, {'type': 'mine'})
+        self.assertEqual(broker._subscribers, {})
+
+    async def test_stream_requires_login(self):
+        """Test that anonymous clients cannot open a stream"""
+        response = await AsyncClient().get(reverse('notifications:stream'))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_sends_count_then_pushed_events(self):
+        """Test that the stream starts with the unread count and forwards published events"""
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get(reverse('notifications:stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        chunks = aiter(response.streaming_content)
+        self.assertTrue((await anext(chunks)).startswith(b'retry:'))
+        self.assertIn(b'"count": 0', await anext(chunks))
+
+        pending = asyncio.ensure_future(anext(chunks))
+        await asyncio.sleep(0)
+        events.get_broker().publish(f'user:{self.user.pk}', {'type': 'notification', 'title': 'Hi'})
+        chunk = await asyncio.wait_for(pending, 1)
+        self.assertTrue(chunk.startswith(b'event: notification'))
+        await chunks.aclose()
+
+    def test_stream_is_disabled_under_wsgi(self):
+        """Test that a WSGI server answers 204 so the browser stops reconnecting"""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('notifications:stream'))
+        self.assertEqual(response.status_code, 204)
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.delete(retention.LOCK_KEY)
+        self.user = User.objects.create_user(username='manager', password='password123')
+        self.organization = Organization.objects.create(name='Acme', created_by=self.user)
+        UserProfile.objects.create(user=self.user, role='MANAGER', organization=self.organization)
+
+    def days_ago(self, days):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        return timezone.now() - timedelta(days=days)
+
+    def notify(self, is_read, age):
+        notification = Notification.objects.create(recipient=self.user, notification_type='TASK_UPDATED',
+                                                   title='Hello', message='Something', is_read=is_read)
+        Notification.objects.filter(pk=notification.pk).update(created_at=self.days_ago(age))
+
+    def log(self, age, action='UPDATE', organization_id=None):
+        return ActivityLog.objects.create(
+            user=self.user, action=action, entity_type='TASK', entity_id=1, entity_name='Task',
+            description='updated', organization_id=organization_id or self.organization.pk,
+            created_at=self.days_ago(age)
+        )
+
+    def test_only_old_read_notifications_are_deleted(self):
+        """Test that unread and recent notifications survive the purge"""
+        self.notify(is_read=True, age=100)
+        self.notify(is_read=True, age=100)
+        self.notify(is_read=False, age=100)
+        self.notify(is_read=True, age=5)
+
+        self.assertEqual(retention.purge_read_notifications(90, batch_size=1), 2)
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertFalse(Notification.objects.filter(is_read=True, created_at__lt=self.days_ago(90)).exists())
+
+    def test_activity_is_archived_with_rollups(self):
+        """Test that old activity moves into per-organization archives and daily counts"""
+        from .models import ActivityArchive, ActivityRollup
+
+        old = [self.log(400), self.log(400, action='COMMENT'), self.log(400, organization_id=999)]
+        recent = self.log(10)
+
+        self.assertEqual(retention.archive_activity(365, batch_size=2), 3)
+        self.assertEqual(list(ActivityLog.objects.values_list('pk', flat=True)), [recent.pk])
+
+        archived = [row for archive in ActivityArchive.objects.all() for row in archive.rows()]
+        self.assertEqual(sorted(row['id'] for row in archived), [activity.pk for activity in old])
+        self.assertEqual(ActivityArchive.objects.filter(organization_id=999).count(), 1)
+        self.assertEqual(
+            sum(ActivityRollup.objects.filter(organization_id=self.organization.pk).values_list('count', flat=True)),
+            2
+        )
+
+    def test_runs_are_resumable_and_exclusive(self):
+        """Test that bounded runs pick up where they stopped and overlapping runs back off"""
+        from django.core.cache import cache
+        from .models import ActivityRollup
+
+        for _ in range(5):
+            self.log(400)
+        first = retention.run(notification_days=0, activity_days=365, batch_size=2, max_batches=1)
+        self.assertEqual(first, {'notifications': 0, 'activities': 2})
+        retention.run(notification_days=0, activity_days=365, batch_size=2)
+        self.assertFalse(ActivityLog.objects.exists())
+        self.assertEqual(ActivityRollup.objects.get().count, 5)
+
+        cache.add(retention.LOCK_KEY, 'other-run')
+        out = StringIO()
+        call_command('apply_retention', stdout=out)
+        self.assertIn('in progress', out.getvalue())
+
+
+@override_settings(ACTIVITY_PARTITIONING=True)
+class PartitioningTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password123')
+        self.organization = Organization.objects.create(name='Acme', created_by=self.user)
+        UserProfile.objects.create(user=self.user, role='ENTERPRISE', organization=self.organization)
+
+    def at(self, months_back, day=0):
+        """A time `day` days into the month `months_back` months ago (the current month: now)"""
+        from datetime import timedelta
+        from django.utils import timezone
+
+        if not months_back:
+            return timezone.now()
+        month = partitioning.add_months(partitioning.month_start(timezone.now()), -months_back)
+        return month + timedelta(days=day, hours=1)
+
+    def log(self, created_at, organization_id=None):
+        return ActivityLog.objects.create(
+            user=self.user, action='UPDATE', entity_type='TASK', entity_id=1, entity_name='Task',
+            description='updated', organization_id=organization_id or self.organization.pk,
+            created_at=created_at
+        )
+
+    def test_rotate_moves_closed_months_to_shadow_tables(self):
+        """Test that maintenance leaves only the current month in the main table"""
+        current = self.log(self.at(0))
+        self.log(self.at(1))
+        self.log(self.at(1, day=3))
+        self.log(self.at(3))
+
+        self.assertEqual(partitioning.maintain(batch_size=1), '3 row(s) moved to monthly tables')
+        self.assertEqual(list(ActivityLog.objects.values_list('pk', flat=True)), [current.pk])
+        self.assertEqual([table for month, table in partitioning.partitions()], [
+            partitioning.partition_name(partitioning.month_start(self.at(1))),
+            partitioning.partition_name(partitioning.month_start(self.at(3))),
+        ])
+
+    def test_feed_pages_match_unpartitioned_order(self):
+        """Test that cursor pages across shadow tables match the plain ordered query"""
+        for months_back, day in [(0, 0), (0, 0), (1, 0), (1, 10), (1, 10), (2, 5), (4, 1), (4, 20), (6, 2)]:
+            self.log(self.at(months_back, day))
+            self.log(self.at(months_back, day), organization_id=999)
+        expected = list(ActivityLog.objects.filter(organization_id=self.organization.pk)
+                        .order_by('-created_at', '-id').values_list('pk', flat=True))
+        partitioning.maintain()
+
+        seen, before = [], None
+        while True:
+            page = partitioning.recent_activity(self.organization.pk, 2, before=before)
+            if not page:
+                break
+            seen.extend(activity.pk for activity in page)
+            before = partitioning.decode_cursor(partitioning.encode_cursor(page[-1]))
+        self.assertEqual(seen, expected)
+
+        with self.assertNumQueries(4):
+            # Partition list, the current month and one closed month fill the page, then the users
+            first = partitioning.recent_activity(self.organization.pk, 3)
+        self.assertEqual([activity.pk for activity in first], expected[:3])
+
+    def test_unconverted_postgresql_table_is_read_directly(self):
+        """Test that the feed reads the plain table before partition_activity_log --convert has run"""
+        from unittest import mock
+
+        activities = [self.log(self.at(months_back)) for months_back in (2, 1, 0)]
+
+        # PostgreSQL with ACTIVITY_PARTITIONING on and no partitions yet
+        with mock.patch.object(partitioning, 'is_native', return_value=True), \
+                mock.patch.object(partitioning, 'partitions', return_value=[]):
+            page = partitioning.recent_activity(self.organization.pk, 2)
+            rest = partitioning.recent_activity(
+                self.organization.pk, 2, before=partitioning.decode_cursor(partitioning.encode_cursor(page[-1]))
+            )
+        self.assertEqual([activity.pk for activity in page + rest], [activity.pk for activity in reversed(activities)])
+
+    def test_retention_archives_shadow_tables(self):
+        """Test that old rows are archived out of shadow tables and emptied tables dropped"""
+        from .models import ActivityArchive
+
+        old = self.log(self.at(14))
+        recent = self.log(self.at(1))
+        partitioning.maintain()
+
+        self.assertEqual(retention.archive_activity(365), 1)
+        self.assertEqual([row['id'] for row in ActivityArchive.objects.get().rows()], [old.pk])
+        self.assertEqual([table for month, table in partitioning.partitions()],
+                         [partitioning.partition_name(partitioning.month_start(recent.created_at))])
+
+    def test_deleting_a_user_removes_shadow_rows(self):
+        """Test that rotated activity does not block deleting its user"""
+        self.log(self.at(2))
+        partitioning.maintain()
+        self.user.delete()
+        self.assertEqual(partitioning.recent_activity(self.organization.pk), [])
+
+    def test_activity_log_view_pages_with_cursor(self):
+        """Test that the activity log follows the cursor across partitions"""
+        for day in range(25):
+            self.log(self.at(1, day))
+            self.log(self.at(2, day))
+        self.log(self.at(0))
+        partitioning.maintain()
+
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('notifications:activity_log'))
+        self.assertEqual(len(response.context['activities']), 50)
+        self.assertIsNotNone(response.context['next_cursor'])
+
+        response = client.get(reverse('notifications:activity_log'), {'before': response.context['next_cursor']})
+        self.assertEqual(len(response.context['activities']), 1)
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_benchmark_command_reports_json(self):
+        """Test that the benchmark loads both tables, times them and cleans up"""
+        out = StringIO()
+        call_command('benchmark_activity_feed', rows=300, organizations=3, months=3, queries=4,
+                     stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['rows'], 300)
+        self.assertEqual(set(report['partitioned']), {'first_page', 'deep_page'})
+        self.assertEqual(partitioning.partitions('bench_activitylog'), [])
@@ -9,5 +9,6 @@ urlpatterns = [
     path('mark-all-read/', views.mark_all_read, name='mark_all_read'),
     path('unread-count/', views.get_unread_count, name='unread_count'),
     path('recent/', views.get_recent_notifications, name='recent'),
+    path('stream/', views.stream, name='stream'),
     path('activity/', views.ActivityLogView.as_view(), name='activity_log'),
 ]
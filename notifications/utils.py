@@ -1,223 +1,327 @@
 """
 Utility functions for creating notifications and logging activities
 """
+from functools import wraps
+
 from django.urls import reverse
+
+from dashboard import telemetry
 from .models import Notification, ActivityLog
+from . import outbox
+
+
+class NotificationDispatcher:
+    """
+    Collects notifications and writes them with a single bulk INSERT.
+    
+    Pass one dispatcher to several notify_* helpers to batch a whole
+    action's notifications, then call dispatch():
+    
+        dispatcher = NotificationDispatcher()
+        notify_task_created(task, user, dispatcher=dispatcher)
+        notify_task_assigned(task, user, dispatcher=dispatcher)
+        dispatcher.dispatch()
+    """
+    
+    def __init__(self):
+        self.pending = []
+    
+    def add(self, recipient_ids, notification_type, title, message, link=None):
+        """Queue one notification per recipient id"""
+        for recipient_id in recipient_ids:
+            self.pending.append(Notification(
+                recipient_id=recipient_id,
+                notification_type=notification_type,
+                title=title,
+                message=message,
+                link=link
+            ))
+    
+    def dispatch(self):
+        """
+        Write all queued notifications and return them. With the outbox
+        enabled they are queued as one event and nothing is returned.
+        """
+        pending, self.pending = self.pending, []
+        if not pending:
+            return []
+        telemetry.NOTIFICATION_FANOUT.observe(len(pending))
+        if outbox.outbox_enabled():
+            outbox.enqueue_notifications(pending)
+            return []
+        return Notification.create_notifications(pending)
 
 
-def notify_task_assigned(task, assigned_by):
+def batched(func):
+    """
+    Let a notify_* helper queue onto a caller's dispatcher, or write its
+    notifications immediately in one INSERT when no dispatcher is given
+    """
+    @wraps(func)
+    def wrapper(*args, dispatcher=None, **kwargs):
+        if dispatcher is not None:
+            func(*args, dispatcher=dispatcher, **kwargs)
+            return []
+        dispatcher = NotificationDispatcher()
+        func(*args, dispatcher=dispatcher, **kwargs)
+        return dispatcher.dispatch()
+    return wrapper
+
+
+def _recipient_ids(*user_ids, exclude=()):
+    """Collect distinct, non-null user ids, skipping the excluded ones"""
+    excluded = set(exclude)
+    return {user_id for user_id in user_ids if user_id and user_id not in excluded}
+
+
+def _display_name(user):
+    return user.get_full_name() or user.username
+
+
+@batched
+def notify_task_assigned(task, assigned_by, dispatcher):
     """Create notification when a task is assigned to someone"""
-    recipients = set()
-    
-    # Notify assignee
-    if task.assigned_to and task.assigned_to != assigned_by:
-        recipients.add(task.assigned_to)
-    
-    # Notify project manager
-    if task.project.manager and task.project.manager != assigned_by:
-        recipients.add(task.project.manager)
-    
-    for recipient in recipients:
-        Notification.create_notification(
-            recipient=recipient,
-            notification_type='TASK_ASSIGNED',
-            title='Task Assignment',
-            message=f'"{task.title}" has been assigned to {task.assigned_to.get_full_name() or task.assigned_to.username}',
-            link=reverse('tasks:detail', kwargs={'pk': task.pk})
-        )
+    # Notify assignee and project manager
+    recipients = _recipient_ids(
+        task.assigned_to_id, task.project.manager_id,
+        exclude=[assigned_by.pk]
+    )
+    if not recipients:
+        return
+    
+    dispatcher.add(
+        recipients,
+        notification_type='TASK_ASSIGNED',
+        title='Task Assignment',
+        message=f'"{task.title}" has been assigned to {_display_name(task.assigned_to)}',
+        link=reverse('tasks:detail', kwargs={'pk': task.pk})
+    )
 
 
-def notify_task_created(task, created_by):
+@batched
+def notify_task_created(task, created_by, dispatcher):
     """Create notification when a new task is created"""
-    recipients = set()
-    
-    # Notify project manager (if not the creator)
-    if task.project.manager and task.project.manager != created_by:
-        recipients.add(task.project.manager)
-    
-    # Notify project creator/owner (enterprise user)
-    if task.project.created_by and task.project.created_by != created_by:
-        recipients.add(task.project.created_by)
+    # Notify project manager and project creator/owner (enterprise user)
+    recipients = _recipient_ids(
+        task.project.manager_id, task.project.created_by_id,
+        exclude=[created_by.pk]
+    )
+    if not recipients:
+        return
     
-    for recipient in recipients:
-        Notification.create_notification(
-            recipient=recipient,
-            notification_type='TASK_UPDATED',
-            title='New Task Created',
-            message=f'New task "{task.title}" was created in project "{task.project.name}"',
-            link=reverse('tasks:detail', kwargs={'pk': task.pk})
-        )
+    dispatcher.add(
+        recipients,
+        notification_type='TASK_UPDATED',
+        title='New Task Created',
+        message=f'New task "{task.title}" was created in project "{task.project.name}"',
+        link=reverse('tasks:detail', kwargs={'pk': task.pk})
+    )
 
 
-def notify_task_updated(task, updated_by):
+@batched
+def notify_task_updated(task, updated_by, dispatcher):
     """Create notification when a task is updated"""
-    recipients = set()
+    # Notify assignee, task creator and project manager
+    recipients = _recipient_ids(
+        task.assigned_to_id, task.created_by_id, task.project.manager_id,
+        exclude=[updated_by.pk]
+    )
+    if not recipients:
+        return
     
-    # Notify assignee
-    if task.assigned_to and task.assigned_to != updated_by:
-        recipients.add(task.assigned_to)
+    dispatcher.add(
+        recipients,
+        notification_type='TASK_UPDATED',
+        title='Task Updated',
+        message=f'Task "{task.title}" has been updated',
+        link=reverse('tasks:detail', kwargs={'pk': task.pk})
+    )
+
+
+@batched
+def notify_task_comment(comment, commenter, dispatcher):
+    """Create notification when someone comments on a task"""
+    task = comment.task
     
-    # Notify task creator
-    if task.created_by and task.created_by != updated_by:
-        recipients.add(task.created_by)
+    # Other commenters, as one distinct-user query
+    previous_commenters = task.comments.exclude(user=commenter).order_by().values_list(
+        'user_id', flat=True
+    ).distinct()
     
-    # Notify project manager
-    if task.project.manager and task.project.manager != updated_by:
-        recipients.add(task.project.manager)
+    # Notify assignee, task creator, project manager and other commenters
+    recipients = _recipient_ids(
+        task.assigned_to_id, task.created_by_id, task.project.manager_id,
+        *previous_commenters,
+        exclude=[commenter.pk]
+    )
+    if not recipients:
+        return
     
-    for recipient in recipients:
-        Notification.create_notification(
-            recipient=recipient,
-            notification_type='TASK_UPDATED',
-            title='Task Updated',
-            message=f'Task "{task.title}" has been updated',
-            link=reverse('tasks:detail', kwargs={'pk': task.pk})
-        )
+    dispatcher.add(
+        recipients,
+        notification_type='TASK_COMMENTED',
+        title='New Comment on Task',
+        message=f'{_display_name(commenter)} commented on "{task.title}"',
+        link=reverse('tasks:detail', kwargs={'pk': task.pk})
+    )
 
 
-def notify_task_comment(comment, commenter):
-    """Create notification when someone comments on a task"""
-    task = comment.task
-    recipients = set()
-    
-    # Notify assignee
-    if task.assigned_to and task.assigned_to != commenter:
-        recipients.add(task.assigned_to)
-    
-    # Notify task creator
-    if task.created_by and task.created_by != commenter:
-        recipients.add(task.created_by)
-    
-    # Notify project manager
-    if task.project.manager and task.project.manager != commenter:
-        recipients.add(task.project.manager)
-    
-    # Notify other commenters
-    for prev_comment in task.comments.exclude(user=commenter).select_related('user'):
-        recipients.add(prev_comment.user)
-    
-    for recipient in recipients:
-        Notification.create_notification(
-            recipient=recipient,
-            notification_type='TASK_COMMENTED',
-            title='New Comment on Task',
-            message=f'{commenter.get_full_name() or commenter.username} commented on "{task.title}"',
-            link=reverse('tasks:detail', kwargs={'pk': task.pk})
+@batched
+def notify_tasks_bulk_updated(tasks, updated_by, summary, dispatcher):
+    """
+    Create one notification per recipient for a bulk change.
+    `tasks` are dicts with assigned_to_id, created_by_id and project__manager_id.
+    """
+    task_counts = {}
+    for task in tasks:
+        for recipient_id in _recipient_ids(
+            task['assigned_to_id'], task['created_by_id'], task['project__manager_id'],
+            exclude=[updated_by.pk]
+        ):
+            task_counts[recipient_id] = task_counts.get(recipient_id, 0) + 1
+    
+    for recipient_id, count in task_counts.items():
+        dispatcher.add(
+            [recipient_id],
+            notification_type='TASK_UPDATED',
+            title='Tasks Updated',
+            message=f'{_display_name(updated_by)} updated {count} task{"s" if count != 1 else ""}: {summary}',
+            link=reverse('tasks:list')
         )
 
 
-def notify_project_member_added(project, member_user, added_by):
+@batched
+def notify_project_member_added(project, member_user, added_by, dispatcher):
     """Create notification when someone is added to a project"""
-    recipients = set()
+    link = reverse('projects:detail', kwargs={'pk': project.pk})
     
     # Notify the new member
-    if member_user != added_by:
-        recipients.add(member_user)
-    
-    # Notify project manager
-    if project.manager and project.manager != added_by and project.manager != member_user:
-        recipients.add(project.manager)
-    
-    # Notify project creator/owner (enterprise)
-    if project.created_by and project.created_by != added_by and project.created_by != member_user:
-        recipients.add(project.created_by)
-    
-    for recipient in recipients:
-        if recipient == member_user:
-            Notification.create_notification(
-                recipient=recipient,
-                notification_type='PROJECT_ASSIGNED',
-                title='Added to Project',
-                message=f'You have been added to project "{project.name}"',
-                link=reverse('projects:detail', kwargs={'pk': project.pk})
-            )
-        else:
-            Notification.create_notification(
-                recipient=recipient,
-                notification_type='PROJECT_UPDATED',
-                title='New Team Member',
-                message=f'{member_user.get_full_name() or member_user.username} was added to project "{project.name}"',
-                link=reverse('projects:detail', kwargs={'pk': project.pk})
-            )
-
-
-def notify_project_created(project, created_by):
+    if member_user.pk != added_by.pk:
+        dispatcher.add(
+            [member_user.pk],
+            notification_type='PROJECT_ASSIGNED',
+            title='Added to Project',
+            message=f'You have been added to project "{project.name}"',
+            link=link
+        )
+    
+    # Notify project manager and project creator/owner (enterprise)
+    recipients = _recipient_ids(
+        project.manager_id, project.created_by_id,
+        exclude=[added_by.pk, member_user.pk]
+    )
+    if recipients:
+        dispatcher.add(
+            recipients,
+            notification_type='PROJECT_UPDATED',
+            title='New Team Member',
+            message=f'{_display_name(member_user)} was added to project "{project.name}"',
+            link=link
+        )
+
+
+@batched
+def notify_project_created(project, created_by, dispatcher):
     """Create notification when a project is created (for enterprise admins)"""
     # Notify organization's enterprise users (admins)
     from accounts.models import UserProfile
     
-    if project.organization:
-        enterprise_users = UserProfile.objects.filter(
-            organization=project.organization,
-            role='ENTERPRISE'
-        ).exclude(user=created_by).select_related('user')
-        
-        for profile in enterprise_users:
-            Notification.create_notification(
-                recipient=profile.user,
-                notification_type='PROJECT_UPDATED',
-                title='New Project Created',
-                message=f'New project "{project.name}" was created by {created_by.get_full_name() or created_by.username}',
-                link=reverse('projects:detail', kwargs={'pk': project.pk})
-            )
-
-
-def notify_project_updated(project, updated_by):
-    """Create notification when a project is updated"""
-    recipients = set()
+    if not project.organization_id:
+        return
     
-    # Notify project manager
-    if project.manager and project.manager != updated_by:
-        recipients.add(project.manager)
+    enterprise_user_ids = UserProfile.objects.filter(
+        organization_id=project.organization_id,
+        role='ENTERPRISE'
+    ).exclude(user=created_by).values_list('user_id', flat=True)
     
-    # Notify project creator/owner
-    if project.created_by and project.created_by != updated_by:
-        recipients.add(project.created_by)
+    recipients = _recipient_ids(*enterprise_user_ids)
+    if not recipients:
+        return
     
-    for recipient in recipients:
-        Notification.create_notification(
-            recipient=recipient,
-            notification_type='PROJECT_UPDATED',
-            title='Project Updated',
-            message=f'Project "{project.name}" has been updated',
-            link=reverse('projects:detail', kwargs={'pk': project.pk})
-        )
+    dispatcher.add(
+        recipients,
+        notification_type='PROJECT_UPDATED',
+        title='New Project Created',
+        message=f'New project "{project.name}" was created by {_display_name(created_by)}',
+        link=reverse('projects:detail', kwargs={'pk': project.pk})
+    )
 
 
-def notify_project_comment(comment, commenter):
+@batched
+def notify_project_updated(project, updated_by, dispatcher):
+    """Create notification when a project is updated"""
+    # Notify project manager and project creator/owner
+    recipients = _recipient_ids(
+        project.manager_id, project.created_by_id,
+        exclude=[updated_by.pk]
+    )
+    if not recipients:
+        return
+    
+    dispatcher.add(
+        recipients,
+        notification_type='PROJECT_UPDATED',
+        title='Project Updated',
+        message=f'Project "{project.name}" has been updated',
+        link=reverse('projects:detail', kwargs={'pk': project.pk})
+    )
+
+
+@batched
+def notify_project_comment(comment, commenter, dispatcher):
     """Create notification when someone comments on a project"""
     project = comment.project
-    recipients = set()
-    
-    # Notify project manager
-    if project.manager and project.manager != commenter:
-        recipients.add(project.manager)
-    
-    # Notify project creator
-    if project.created_by != commenter:
-        recipients.add(project.created_by)
-    
-    # Notify project members
-    for member in project.members.exclude(user=commenter).select_related('user'):
-        recipients.add(member.user)
-    
-    for recipient in recipients:
-        Notification.create_notification(
-            recipient=recipient,
-            notification_type='PROJECT_COMMENTED',
-            title='New Comment on Project',
-            message=f'{commenter.get_full_name() or commenter.username} commented on "{project.name}"',
-            link=reverse('projects:detail', kwargs={'pk': project.pk})
-        )
+    
+    member_ids = project.members.exclude(user=commenter).values_list('user_id', flat=True)
+    
+    # Notify project manager, project creator and project members
+    recipients = _recipient_ids(
+        project.manager_id, project.created_by_id, *member_ids,
+        exclude=[commenter.pk]
+    )
+    if not recipients:
+        return
+    
+    dispatcher.add(
+        recipients,
+        notification_type='PROJECT_COMMENTED',
+        title='New Comment on Project',
+        message=f'{_display_name(commenter)} commented on "{project.name}"',
+        link=reverse('projects:detail', kwargs={'pk': project.pk})
+    )
+
+
+def _log_activity(user, **fields):
+    """Write an ActivityLog row, or queue it when the outbox is enabled"""
+    if outbox.outbox_enabled():
+        outbox.enqueue_activity(user_id=user.pk, **fields)
+    else:
+        ActivityLog.log_activity(user=user, **fields)
+
+
+def log_activities(activities):
+    """
+    Write unsaved ActivityLog instances with one bulk INSERT, or queue them
+    as one outbox event. bulk_create skips post_save, so the dashboard
+    fragments of the affected organizations are invalidated here.
+    """
+    if not activities:
+        return
+    if outbox.outbox_enabled():
+        outbox.enqueue_activities(activities)
+        return
+    from dashboard import fragments
+    ActivityLog.objects.bulk_create(activities)
+    fragments.bump(*{activity.organization_id for activity in activities})
 
 
 def log_task_activity(task, user, action, description, old_value=None, new_value=None):
     """Log task-related activity"""
     org_id = None
-    if hasattr(user, 'profile') and user.profile.organization:
-        org_id = user.profile.organization.id
+    if hasattr(user, 'profile') and user.profile.organization_id:
+        org_id = user.profile.organization_id
     
-    ActivityLog.log_activity(
+    _log_activity(
         user=user,
         action=action,
         entity_type='TASK',
@@ -234,7 +338,7 @@ def log_project_activity(project, user, action, description, old_value=None, new
     """Log project-related activity"""
     org_id = project.organization.id if project.organization else None
     
-    ActivityLog.log_activity(
+    _log_activity(
         user=user,
         action=action,
         entity_type='PROJECT',
@@ -2,10 +2,15 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+from asgiref.sync import sync_to_async
 
-from .models import Notification, ActivityLog
+from accounts.models import UserProfile
+from .models import Notification, NotificationCounter, ActivityLog
+from . import events, partitioning
 
 
 class NotificationListView(LoginRequiredMixin, ListView):
@@ -24,8 +29,7 @@ class NotificationListView(LoginRequiredMixin, ListView):
 def mark_as_read(request, pk):
     """Mark a single notification as read"""
     notification = get_object_or_404(Notification, pk=pk, recipient=request.user)
-    notification.is_read = True
-    notification.save()
+    notification.mark_read()
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({'status': 'success'})
@@ -40,7 +44,7 @@ def mark_as_read(request, pk):
 @require_POST
 def mark_all_read(request):
     """Mark all notifications as read for the current user"""
-    Notification.objects.filter(recipient=request.user, is_read=False).update(is_read=True)
+    Notification.mark_all_read(request.user)
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({'status': 'success'})
@@ -48,16 +52,42 @@ def mark_all_read(request):
     return redirect('notifications:list')
 
 
+def _dropdown_state(request):
+    """Validators for the dropdown endpoints, read once per request"""
+    if not hasattr(request, '_notification_state'):
+        request._notification_state = Notification.dropdown_state(request.user)
+    return request._notification_state
+
+
+def _dropdown_etag(request):
+    state = _dropdown_state(request)
+    return f'{request.user.pk}-{state["latest_id"] or 0}-{state["unread_count"]}'
+
+
+def _dropdown_last_modified(request):
+    return _dropdown_state(request)['latest_created_at']
+
+
+# Pollers revalidate every time; unchanged state costs one query and a 304
+dropdown_conditional = condition(etag_func=_dropdown_etag, last_modified_func=_dropdown_last_modified)
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@dropdown_conditional
 def get_unread_count(request):
     """Get the count of unread notifications (for AJAX)"""
-    count = Notification.objects.filter(recipient=request.user, is_read=False).count()
-    return JsonResponse({'count': count})
+    return JsonResponse({'count': _dropdown_state(request)['unread_count']})
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@dropdown_conditional
 def get_recent_notifications(request):
-    """Get recent notifications for dropdown (AJAX)"""
+    """
+    Recent notifications and the unread count for the dropdown (AJAX).
+    Answers 304 Not Modified when the client's ETag is still current.
+    """
     notifications = Notification.objects.filter(
         recipient=request.user
     ).order_by('-created_at')[:5]
@@ -72,9 +102,38 @@ def get_recent_notifications(request):
         'created_at': n.created_at.strftime('%b %d, %H:%M')
     } for n in notifications]
     
-    unread_count = Notification.objects.filter(recipient=request.user, is_read=False).count()
+    return JsonResponse({'notifications': data, 'unread_count': _dropdown_state(request)['unread_count']})
+
+
+async def stream(request):
+    """
+    Server-Sent Events stream of new notifications and task status changes.
+    Async so an open connection does not hold a worker thread; serve the
+    project through cloudtask.asgi for this endpoint.
+    """
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the stream would pin a worker thread for its whole life;
+        # 204 tells EventSource not to reconnect
+        return HttpResponse(status=204)
+    
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
     
-    return JsonResponse({'notifications': data, 'unread_count': unread_count})
+    profile = await UserProfile.objects.filter(user=user).values('role', 'organization_id').afirst()
+    if profile is None:
+        return HttpResponse(status=403)
+    channels = events.channels_for(user.pk, profile['role'], profile['organization_id'])
+    
+    # Start from the current count so a reconnecting client is back in sync
+    unread_count = await sync_to_async(NotificationCounter.get_unread_count)(user)
+    response = StreamingHttpResponse(
+        events.event_stream(channels, [{'type': 'unread_count', 'count': unread_count}]),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 class ActivityLogView(LoginRequiredMixin, ListView):
@@ -83,9 +142,28 @@ class ActivityLogView(LoginRequiredMixin, ListView):
     template_name = 'notifications/activity_log.html'
     context_object_name = 'activities'
     paginate_by = 50
+    next_cursor = None
+    
+    def get_paginate_by(self, queryset):
+        # Partitioned storage is paged with a cursor instead of page numbers
+        return None if partitioning.enabled() else self.paginate_by
     
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'profile') and user.profile.organization:
-            return ActivityLog.objects.filter(organization_id=user.profile.organization.id)
-        return ActivityLog.objects.none()
+        if not (hasattr(user, 'profile') and user.profile.organization):
+            return ActivityLog.objects.none()
+        if partitioning.enabled():
+            activities = partitioning.recent_activity(
+                user.profile.organization_id,
+                self.paginate_by + 1,
+                before=partitioning.decode_cursor(self.request.GET.get('before'))
+            )
+            if len(activities) > self.paginate_by:
+                self.next_cursor = partitioning.encode_cursor(activities[self.paginate_by - 1])
+            return activities[:self.paginate_by]
+        return ActivityLog.objects.filter(organization_id=user.profile.organization_id).select_related('user')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['next_cursor'] = self.next_cursor
+        return context
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Coalesce, NullIf
 from django.contrib.auth.models import User
 
 
@@ -24,6 +26,56 @@ class Organization(models.Model):
         ordering = ['-created_at']
 
 
+class ProjectQuerySet(models.QuerySet):
+    """Custom queryset for Project with the counters shown on project cards"""
+    
+    def with_counts(self):
+        """
+        Annotate member_count, task_count, open_task_count and percent_done.
+        The members and tasks joins multiply each other, so every count is distinct.
+        """
+        return self.annotate(
+            member_count=Count('members', distinct=True),
+            task_count=Count('tasks', distinct=True),
+            open_task_count=Count('tasks', distinct=True, filter=~Q(tasks__status='DONE')),
+        ).annotate(
+            percent_done=Coalesce(
+                (F('task_count') - F('open_task_count')) * 100 / NullIf(F('task_count'), 0),
+                Value(0)
+            )
+        )
+    
+    def for_member(self, user):
+        """Projects `user` is a member of, one row per project"""
+        return self.filter(pk__in=ProjectMember.objects.filter(user=user).values('project_id'))
+    
+    def visible_to(self, user):
+        """
+        Projects `user` may see: the whole organization for enterprise admins,
+        managed projects for managers, member projects for employees
+        """
+        role = user.profile.role
+        if role == 'ENTERPRISE':
+            projects = self.filter(organization_id=user.profile.organization_id)
+        elif role == 'MANAGER':
+            projects = self.filter(manager=user)
+        else:
+            projects = self.for_member(user)
+        return projects.select_related('manager')
+
+
+def visible_project_ids(user):
+    """
+    Ids of Project.objects.visible_to(user), memoized on the user instance;
+    request.actor lives for one request, so this is one query per request
+    """
+    if not hasattr(user, '_visible_project_ids'):
+        user._visible_project_ids = frozenset(
+            Project.objects.visible_to(user).order_by().values_list('pk', flat=True)
+        )
+    return user._visible_project_ids
+
+
 class Project(models.Model):
     """
     Project model - represents a software project within an organization
@@ -62,11 +114,17 @@ class Project(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProjectQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.name} ({self.organization.name})"
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Project list per organization, newest first
+            models.Index(fields=['organization', '-created_at'], name='project_org_recent_idx'),
+        ]
 
 
 class ProjectMember(models.Model):
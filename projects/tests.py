@@ -1,3 +1,143 @@
-from django.test import TestCase
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth.models import User
 
-# Create your tests here.
+from accounts.models import UserProfile
+from tasks.models import Task
+from .models import Organization, Project, ProjectMember
+
+
+class ProjectListTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.enterprise_user = User.objects.create_user(username='enterprise', password='password123')
+        self.organization = Organization.objects.create(name='Acme', created_by=self.enterprise_user)
+        UserProfile.objects.create(user=self.enterprise_user, role='ENTERPRISE', organization=self.organization)
+
+        self.manager = User.objects.create_user(username='manager', password='password123')
+        UserProfile.objects.create(user=self.manager, role='MANAGER', organization=self.organization)
+
+        self.employees = []
+        for i in range(3):
+            employee = User.objects.create_user(username=f'employee{i}', password='password123')
+            UserProfile.objects.create(user=employee, role='EMPLOYEE', organization=self.organization)
+            self.employees.append(employee)
+
+    def create_project(self, name, statuses=(), members=()):
+        project = Project.objects.create(
+            name=name,
+            organization=self.organization,
+            manager=self.manager,
+            created_by=self.enterprise_user
+        )
+        for status in statuses:
+            Task.objects.create(title=f'{status} task', project=project, created_by=self.manager, status=status)
+        for member in members:
+            ProjectMember.objects.create(project=project, user=member)
+        return project
+
+    def test_with_counts_annotations(self):
+        """Test that member and task counters are not inflated by the joins"""
+        self.create_project('Website', statuses=['TODO', 'DONE', 'DONE', 'IN_REVIEW'], members=self.employees)
+        self.create_project('Empty')
+
+        projects = {p.name: p for p in Project.objects.with_counts()}
+        website = projects['Website']
+        self.assertEqual(website.member_count, 3)
+        self.assertEqual(website.task_count, 4)
+        self.assertEqual(website.open_task_count, 2)
+        self.assertEqual(website.percent_done, 50)
+        self.assertEqual(projects['Empty'].percent_done, 0)
+
+    def test_employee_list_has_no_duplicates(self):
+        """Test that employees see each of their projects once with full member counts"""
+        self.create_project('Website', members=self.employees)
+        self.client.force_login(self.employees[0])
+
+        response = self.client.get(reverse('projects:list'))
+        projects = list(response.context['projects'])
+        self.assertEqual(len(projects), 1)
+        self.assertEqual(projects[0].member_count, 3)
+
+    def test_query_count_does_not_grow_with_projects(self):
+        """Test that the card grid is rendered from one annotated query"""
+        from django.core.cache import cache
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.force_login(self.enterprise_user)
+        self.create_project('First', statuses=['TODO'], members=self.employees[:1])
+        cache.clear()
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('projects:list'))
+
+        for i in range(10):
+            self.create_project(f'Project {i}', statuses=['TODO', 'DONE'], members=self.employees)
+        cache.clear()
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(reverse('projects:list'))
+
+        self.assertEqual(len(small), len(large))
+
+    def test_visible_to_scopes_by_role(self):
+        """Test that each role sees its own projects and the id set is memoized"""
+        from .models import visible_project_ids
+
+        website = self.create_project('Website', members=self.employees[:1])
+        other_manager = User.objects.create_user(username='other', password='password123')
+        UserProfile.objects.create(user=other_manager, role='MANAGER', organization=self.organization)
+        intranet = self.create_project('Intranet')
+        intranet.manager = other_manager
+        intranet.save()
+
+        self.assertEqual(set(Project.objects.visible_to(self.enterprise_user)), {website, intranet})
+        self.assertEqual(set(Project.objects.visible_to(self.manager)), {website})
+        self.assertEqual(set(Project.objects.visible_to(self.employees[0])), {website})
+        self.assertFalse(Project.objects.visible_to(self.employees[1]).exists())
+
+        self.assertEqual(visible_project_ids(other_manager), {intranet.pk})
+        with self.assertNumQueries(0):
+            visible_project_ids(other_manager)
+
+
+class ProjectDetailTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username='manager', password='password123')
+        self.organization = Organization.objects.create(name='Acme', created_by=self.manager)
+        UserProfile.objects.create(user=self.manager, role='MANAGER', organization=self.organization)
+        self.project = Project.objects.create(
+            name='Release', organization=self.organization, manager=self.manager, created_by=self.manager
+        )
+        self.client.force_login(self.manager)
+
+    def create_task(self, title):
+        return Task.objects.create(title=title, project=self.project, created_by=self.manager)
+
+    def test_tasks_are_listed_as_a_release_plan(self):
+        """Test that tasks come in dependency order with the critical path marked"""
+        ship = self.create_task('Ship')
+        build = self.create_task('Build')
+        design = self.create_task('Design')
+        notes = self.create_task('Release notes')
+        ship.depends_on.add(build, notes)
+        build.depends_on.add(design)
+
+        response = self.client.get(reverse('projects:detail', args=[self.project.pk]))
+        titles = [task.title for task in response.context['tasks']]
+        self.assertLess(titles.index('Design'), titles.index('Build'))
+        self.assertLess(titles.index('Build'), titles.index('Ship'))
+        self.assertLess(titles.index('Release notes'), titles.index('Ship'))
+        self.assertEqual(response.context['critical_path'], {design.pk, build.pk, ship.pk})
+        self.assertEqual(response.context['critical_hours'], 3)
+        self.assertContains(response, 'Critical path', count=4)
+
+    def test_legacy_cycle_keeps_default_order(self):
+        """Test that a cycle stored before cycle checks does not break the page"""
+        first = self.create_task('First')
+        second = self.create_task('Second')
+        first.depends_on.add(second)
+        second.depends_on.add(first)
+
+        response = self.client.get(reverse('projects:detail', args=[self.project.pk]))
+        self.assertEqual([task.title for task in response.context['tasks']], ['Second', 'First'])
+        self.assertEqual(response.context['critical_path'], set())
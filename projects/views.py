@@ -7,6 +7,8 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 
+from dashboard.fragments import fragment_context
+from tasks.graph import CycleError, get_graph
 from .models import Organization, Project, ProjectMember, ProjectComment
 from .forms import ProjectForm, ProjectMemberForm
 from notifications.utils import (
@@ -18,7 +20,7 @@ from notifications.utils import (
 class EnterpriseRequiredMixin(UserPassesTestMixin):
     """Mixin to ensure only Enterprise users can access"""
     def test_func(self):
-        return self.request.user.profile.role == 'ENTERPRISE'
+        return self.request.actor.profile.role == 'ENTERPRISE'
 
 
 class ProjectListView(LoginRequiredMixin, ListView):
@@ -28,22 +30,14 @@ class ProjectListView(LoginRequiredMixin, ListView):
     context_object_name = 'projects'
     
     def get_queryset(self):
-        user = self.request.user
-        organization = user.profile.organization
-        
-        if user.profile.role == 'ENTERPRISE':
-            # Enterprise sees all projects in their organization
-            return Project.objects.filter(organization=organization)
-        elif user.profile.role == 'MANAGER':
-            # Manager sees projects they manage
-            return Project.objects.filter(manager=user)
-        else:
-            # Employee sees projects they're a member of
-            return Project.objects.filter(members__user=user)
+        # Card counters come from the same query
+        return Project.objects.visible_to(self.request.actor).with_counts()
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['is_enterprise'] = self.request.user.profile.role == 'ENTERPRISE'
+        # The card grid is cached per user until a project in the organization changes
+        context.update(fragment_context(self.request.user.profile.organization_id))
         return context
 
 
@@ -63,7 +57,7 @@ class ProjectDetailView(LoginRequiredMixin, DetailView):
         context['is_enterprise'] = self.request.user.profile.role == 'ENTERPRISE'
         context['is_manager'] = self.request.user.profile.role == 'MANAGER'
         context['team_members'] = self.object.members.select_related('user')
-        context['tasks'] = self.object.tasks.all()
+        context.update(self.release_plan())
         context['comments'] = self.object.comments.select_related('user').order_by('-created_at')
         
         # Form to add new team members (only for enterprise)
@@ -74,6 +68,22 @@ class ProjectDetailView(LoginRequiredMixin, DetailView):
             )
         return context
 
+    def release_plan(self):
+        """Tasks in dependency order with the critical path (by estimated hours) marked"""
+        tasks = list(self.object.tasks.select_related('assigned_to'))
+        graph = get_graph(self.object.pk)
+        try:
+            order = {pk: index for index, pk in enumerate(graph.topological_order())}
+            path, hours = graph.critical_path()
+        except CycleError:
+            # Cycles created before add_dependency rejected them: keep the default order
+            return {'tasks': tasks, 'critical_path': set(), 'critical_hours': 0}
+        # Tasks missing from a cached graph (created since) go last
+        tasks.sort(key=lambda task: order.get(task.pk, len(order)))
+        # A lone task is not a chain worth highlighting
+        critical = set(path) if len(path) > 1 else set()
+        return {'tasks': tasks, 'critical_path': critical, 'critical_hours': hours if critical else 0}
+
 
 class ProjectCreateView(LoginRequiredMixin, EnterpriseRequiredMixin, CreateView):
     """Create a new project"""
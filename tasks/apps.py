@@ -5,3 +5,7 @@ class TasksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tasks'
     verbose_name = 'Task Management'
+
+    def ready(self):
+        # Connects the dependency graph cache and closure table signals
+        from . import closure, graph  # noqa: F401
@@ -0,0 +1,331 @@
+"""
+Bulk task changes: apply one change set (status, assignee, priority) to many
+tasks at once, or a batch of Kanban moves (status and position per task).
+
+The editable tasks are resolved with one query, the change is written with a
+single QuerySet.update(), activity and comment rows use bulk_create, and each
+recipient gets one aggregated notification. QuerySet.update() bypasses model
+signals, so the dashboard counters and caches are adjusted here explicitly.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from notifications import events
+from notifications.models import ActivityLog
+from notifications.utils import log_activities, notify_tasks_bulk_updated
+from .models import Task, TaskComment
+
+# Largest selection accepted in one request
+MAX_BULK_TASKS = 500
+
+# Fields an employee may change on their own tasks
+EMPLOYEE_FIELDS = ('status',)
+
+# Most Kanban moves accepted in one sync
+MAX_KANBAN_MOVES = 200
+
+# Range of Task.position (a 32-bit integer column on PostgreSQL) and of task ids
+POSITION_MIN, POSITION_MAX = -2 ** 31, 2 ** 31 - 1
+TASK_ID_MAX = 2 ** 63 - 1
+
+# Task columns loaded by the permission query
+ROW_FIELDS = (
+    'pk', 'title', 'status', 'priority', 'position', 'assigned_to_id', 'created_by_id',
+    'project_id', 'project__organization_id', 'project__manager_id',
+)
+
+
+class BulkChangeError(ValueError):
+    """Raised for a malformed or disallowed change set"""
+
+
+def editable_tasks(user):
+    """Tasks `user` may change: same scope as the task list and Kanban board"""
+    return Task.objects.visible_to(user)
+
+
+def _clean_changes(user, changes):
+    """Validate the change set; returns (field updates, new assignee or None)"""
+    if not isinstance(changes, dict) or not changes:
+        raise BulkChangeError('No changes given')
+    unknown = set(changes) - {'status', 'priority', 'assigned_to'}
+    if unknown:
+        raise BulkChangeError(f'Unsupported field(s): {", ".join(sorted(unknown))}')
+    if user.profile.role == 'EMPLOYEE' and set(changes) - set(EMPLOYEE_FIELDS):
+        raise BulkChangeError('Employees can only change the status of their tasks')
+
+    updates = {}
+    if 'status' in changes:
+        if not isinstance(changes['status'], str) or changes['status'] not in dict(Task.STATUS_CHOICES):
+            raise BulkChangeError('Invalid status')
+        updates['status'] = changes['status']
+    if 'priority' in changes:
+        if not isinstance(changes['priority'], str) or changes['priority'] not in dict(Task.PRIORITY_CHOICES):
+            raise BulkChangeError('Invalid priority')
+        updates['priority'] = changes['priority']
+
+    assignee = None
+    if 'assigned_to' in changes:
+        assigned_to = changes['assigned_to']
+        if assigned_to in (None, ''):
+            updates['assigned_to_id'] = None
+        else:
+            # An int, or the digit string a <select> posts
+            if isinstance(assigned_to, str) and assigned_to.isdigit():
+                assigned_to = int(assigned_to)
+            if not isinstance(assigned_to, int) or isinstance(assigned_to, bool):
+                raise BulkChangeError('Invalid assignee')
+            assignee = User.objects.filter(
+                pk=assigned_to, profile__organization=user.profile.organization
+            ).first()
+            if assignee is None:
+                raise BulkChangeError('Invalid assignee')
+            updates['assigned_to_id'] = assignee.pk
+    return updates, assignee
+
+
+def _status_activity(user, row, new_status):
+    statuses = dict(Task.STATUS_CHOICES)
+    return ActivityLog(
+        user=user,
+        action='STATUS_CHANGE',
+        entity_type='TASK',
+        entity_id=row['pk'],
+        entity_name=row['title'],
+        organization_id=user.profile.organization_id,
+        description=f'moved "{row["title"]}" to {statuses[new_status]}',
+        old_value=statuses.get(row['status']),
+        new_value=statuses[new_status]
+    )
+
+
+def _activities(user, row, updates, assignee):
+    """Unsaved ActivityLog rows describing one task's change"""
+    priorities = dict(Task.PRIORITY_CHOICES)
+    common = {
+        'user': user,
+        'entity_type': 'TASK',
+        'entity_id': row['pk'],
+        'entity_name': row['title'],
+        'organization_id': user.profile.organization_id,
+    }
+    activities = []
+    if 'status' in updates and row['status'] != updates['status']:
+        activities.append(_status_activity(user, row, updates['status']))
+    if 'assigned_to_id' in updates and row['assigned_to_id'] != updates['assigned_to_id']:
+        name = (assignee.get_full_name() or assignee.username) if assignee else 'nobody'
+        activities.append(ActivityLog(
+            action='ASSIGN',
+            description=f'assigned "{row["title"]}" to {name}',
+            **common
+        ))
+    if 'priority' in updates and row['priority'] != updates['priority']:
+        activities.append(ActivityLog(
+            action='UPDATE',
+            description=f'changed priority of "{row["title"]}"',
+            old_value=priorities.get(row['priority']),
+            new_value=priorities[updates['priority']],
+            **common
+        ))
+    return activities
+
+
+def _summary(updates, assignee):
+    parts = []
+    if 'status' in updates:
+        parts.append(f'status → {dict(Task.STATUS_CHOICES)[updates["status"]]}')
+    if 'assigned_to_id' in updates:
+        parts.append(f'assignee → {(assignee.get_full_name() or assignee.username) if assignee else "nobody"}')
+    if 'priority' in updates:
+        parts.append(f'priority → {dict(Task.PRIORITY_CHOICES)[updates["priority"]]}')
+    return ', '.join(parts)
+
+
+def adjust_dashboard(rows):
+    """
+    Mirror what the post_save receivers would have done for each task.
+    Rows are values() dicts from editable_tasks() plus a 'new_status' key.
+    """
+    from dashboard import fragments
+    from dashboard.models import DashboardMetrics
+    from . import graph
+
+    deltas = {}
+    for row in rows:
+        if row['status'] == row['new_status']:
+            continue
+        scope = deltas.setdefault((row['project__organization_id'], row['project__manager_id']), {})
+        old_field = DashboardMetrics.status_field(row['status'])
+        new_field = DashboardMetrics.status_field(row['new_status'])
+        scope[old_field] = scope.get(old_field, 0) - 1
+        scope[new_field] = scope.get(new_field, 0) + 1
+    for (organization_id, manager_id), scope_deltas in deltas.items():
+        DashboardMetrics.apply_delta(organization_id, manager_id, **scope_deltas)
+
+    if deltas:
+        graph.invalidate(*{row['project_id'] for row in rows})
+    fragments.bump(*{row['project__organization_id'] for row in rows})
+
+
+def _publish_moves(rows, updated_at):
+    """Push new task statuses to open Kanban boards; rows hold the new values"""
+    for row in rows:
+        events.publish_task_change(
+            row['pk'], row['status'], row['position'], updated_at,
+            row['project__organization_id'], row['project__manager_id'], row['assigned_to_id']
+        )
+
+
+def apply_bulk_change(user, task_ids, changes, comment=''):
+    """
+    Apply `changes` to the tasks in `task_ids` that `user` may edit.
+    Returns {'updated': [...], 'unchanged': [...], 'denied': [...]} task ids.
+    """
+    if not isinstance(comment, str):
+        raise BulkChangeError('The comment must be text')
+    comment = comment.strip()
+    if not isinstance(task_ids, list):
+        raise BulkChangeError('Task ids must be a list')
+    try:
+        task_ids = {int(pk) for pk in task_ids}
+    except (TypeError, ValueError):
+        raise BulkChangeError('Task ids must be integers')
+    if not task_ids:
+        raise BulkChangeError('No tasks selected')
+    if len(task_ids) > MAX_BULK_TASKS:
+        raise BulkChangeError(f'At most {MAX_BULK_TASKS} tasks can be changed at once')
+    updates, assignee = _clean_changes(user, changes)
+
+    # Permission check and everything needed afterwards, in one query
+    rows = list(editable_tasks(user).filter(pk__in=task_ids).order_by().values(*ROW_FIELDS))
+    if 'status' in updates:
+        # Status changes the workflow does not allow are denied like out-of-scope tasks
+        rows = [row for row in rows if Task.can_transition(row['status'], updates['status'])]
+    changed = [row for row in rows if any(
+        row[field] != value for field, value in updates.items()
+    )]
+    result = {
+        'updated': sorted(row['pk'] for row in changed),
+        'unchanged': sorted(row['pk'] for row in rows if row not in changed),
+        'denied': sorted(task_ids - {row['pk'] for row in rows}),
+    }
+    if not changed:
+        return result
+
+    statuses = dict(Task.STATUS_CHOICES)
+    now = timezone.now()
+    with transaction.atomic():
+        Task.objects.filter(pk__in=result['updated']).update(updated_at=now, **updates)
+
+        activities, comments = [], []
+        for row in changed:
+            activities.extend(_activities(user, row, updates, assignee))
+            status_changed = 'status' in updates and row['status'] != updates['status']
+            if status_changed or comment:
+                comments.append(TaskComment(
+                    task_id=row['pk'],
+                    user=user,
+                    comment=comment or (
+                        f'Status changed from {statuses[row["status"]]} to {statuses[updates["status"]]}'
+                    ),
+                    status_changed_to=updates['status'] if status_changed else None
+                ))
+        log_activities(activities)
+        TaskComment.objects.bulk_create(comments)
+
+        adjust_dashboard([dict(row, new_status=updates.get('status', row['status'])) for row in changed])
+        notify_tasks_bulk_updated(
+            [dict(row, **updates) for row in changed], user, _summary(updates, assignee)
+        )
+        if 'status' in updates:
+            _publish_moves([dict(row, **updates) for row in changed], now)
+    return result
+
+
+def _clean_moves(moves):
+    """Validate Kanban moves; returns {task_id: (status, position, expected_updated_at)}"""
+    if not isinstance(moves, list) or not moves:
+        raise BulkChangeError('No moves given')
+    if len(moves) > MAX_KANBAN_MOVES:
+        raise BulkChangeError(f'At most {MAX_KANBAN_MOVES} moves can be synced at once')
+
+    cleaned = {}
+    for move in moves:
+        if not isinstance(move, dict):
+            raise BulkChangeError('Each move must be an object')
+        try:
+            task_id = int(move['task_id'])
+            position = move['position']
+            expected = parse_datetime(move['expected_updated_at'])
+        except (KeyError, TypeError, ValueError):
+            raise BulkChangeError('Each move needs task_id, status, position and expected_updated_at')
+        if not 0 < task_id <= TASK_ID_MAX:
+            raise BulkChangeError(f'Invalid task_id: {task_id}')
+        if (not isinstance(position, int) or isinstance(position, bool)
+                or not POSITION_MIN <= position <= POSITION_MAX):
+            raise BulkChangeError(f'position must be an integer between {POSITION_MIN} and {POSITION_MAX}')
+        if expected is None or timezone.is_naive(expected):
+            raise BulkChangeError('expected_updated_at must be an ISO timestamp with a UTC offset')
+        status = move.get('status')
+        if not isinstance(status, str) or status not in dict(Task.STATUS_CHOICES):
+            raise BulkChangeError('Invalid status')
+        # A later move of the same task supersedes an earlier one
+        cleaned[task_id] = (status, position, expected)
+    return cleaned
+
+
+def apply_kanban_moves(user, moves):
+    """
+    Apply a batch of Kanban moves ({task_id, status, position,
+    expected_updated_at}) in one transaction. Each move is a conditional
+    UPDATE ... WHERE updated_at = expected_updated_at, so a task changed since
+    the client loaded it is reported as a conflict with its current state
+    instead of being overwritten.
+    Returns {'applied': [...], 'conflicts': [...], 'denied': [task ids]}.
+    """
+    moves = _clean_moves(moves)
+    rows = {
+        row['pk']: row
+        for row in editable_tasks(user).filter(pk__in=moves).order_by().values(*ROW_FIELDS)
+        if Task.can_transition(row['status'], moves[row['pk']][0])
+    }
+    result = {
+        'applied': [],
+        'conflicts': [],
+        'denied': sorted(set(moves) - set(rows)),
+    }
+    if not rows:
+        return result
+
+    now = timezone.now()
+    applied, changed, conflicted = [], [], []
+    with transaction.atomic():
+        for task_id, (status, position, expected) in moves.items():
+            if task_id not in rows:
+                continue
+            updated = Task.objects.filter(pk=task_id, updated_at=expected).update(
+                status=status, position=position, updated_at=now
+            )
+            if not updated:
+                conflicted.append(task_id)
+                continue
+            result['applied'].append({'task_id': task_id, 'updated_at': now.isoformat()})
+            applied.append(dict(rows[task_id], status=status, position=position))
+            if rows[task_id]['status'] != status:
+                changed.append(dict(rows[task_id], new_status=status))
+
+        if changed:
+            log_activities([_status_activity(user, row, row['new_status']) for row in changed])
+            adjust_dashboard(changed)
+        _publish_moves(applied, now)
+
+    result['conflicts'] = [{
+        'task_id': pk,
+        'status': status,
+        'position': position,
+        'updated_at': updated_at.isoformat(),
+    } for pk, status, position, updated_at in Task.objects.filter(pk__in=conflicted)
+        .order_by('pk').values_list('pk', 'status', 'position', 'updated_at')]
+    return result
@@ -0,0 +1,187 @@
+"""
+Maintenance of TaskDependencyClosure, the transitive closure of Task.depends_on.
+
+Adding an edge links every ancestor of the dependency to every descendant of
+the task in one bulk insert. Removing an edge (or deleting a task) recomputes
+the closure rows of the affected descendants only. rebuild() recomputes a
+whole project from the raw M2M with a recursive CTE.
+"""
+from collections import deque
+
+from django.db import connection, transaction
+from django.db.models.signals import m2m_changed, pre_delete, post_delete
+from django.dispatch import receiver
+
+from projects.models import Project
+from .models import Task, TaskDependencyClosure
+
+Edge = Task.depends_on.through
+
+
+def would_create_cycle(task_id, dependency_id):
+    """
+    True if making `task_id` depend on `dependency_id` would close a loop,
+    read from the committed closure rows; call it in the transaction that adds the edge
+    """
+    if task_id == dependency_id:
+        return True
+    return TaskDependencyClosure.objects.filter(ancestor_id=task_id, descendant_id=dependency_id).exists()
+
+
+def add_edge(task_id, dependency_id):
+    """Record that `task_id` now depends on `dependency_id`"""
+    ancestors = {dependency_id: 0}
+    ancestors.update(
+        TaskDependencyClosure.objects.filter(descendant_id=dependency_id).values_list('ancestor_id', 'depth')
+    )
+    descendants = {task_id: 0}
+    descendants.update(
+        TaskDependencyClosure.objects.filter(ancestor_id=task_id).values_list('descendant_id', 'depth')
+    )
+
+    wanted = {
+        (ancestor, descendant): up + down + 1
+        for ancestor, up in ancestors.items()
+        for descendant, down in descendants.items()
+        if ancestor != descendant
+    }
+    existing = {
+        (row.ancestor_id, row.descendant_id): row
+        for row in TaskDependencyClosure.objects.filter(ancestor_id__in=ancestors, descendant_id__in=descendants)
+    }
+
+    shorter = []
+    for pair, row in existing.items():
+        if pair in wanted and wanted[pair] < row.depth:
+            row.depth = wanted[pair]
+            shorter.append(row)
+    TaskDependencyClosure.objects.bulk_update(shorter, ['depth'])
+    TaskDependencyClosure.objects.bulk_create([
+        TaskDependencyClosure(ancestor_id=ancestor, descendant_id=descendant, depth=depth)
+        for (ancestor, descendant), depth in wanted.items()
+        if (ancestor, descendant) not in existing
+    ])
+
+
+def recompute_descendants(task_ids):
+    """Rebuild the closure rows of `task_ids` from the current edges"""
+    task_ids = set(task_ids)
+    if not task_ids:
+        return
+    project_ids = set(Task.objects.filter(pk__in=task_ids).values_list('project_id', flat=True))
+    depends_on = {}
+    for from_id, to_id in Edge.objects.filter(from_task__project_id__in=project_ids).values_list(
+            'from_task_id', 'to_task_id'):
+        depends_on.setdefault(from_id, []).append(to_id)
+
+    rows = []
+    for task_id in task_ids:
+        # Breadth-first search gives the shortest depth for each ancestor
+        depths = {}
+        queue = deque((pk, 1) for pk in depends_on.get(task_id, ()))
+        while queue:
+            pk, depth = queue.popleft()
+            if pk in depths or pk == task_id:
+                continue
+            depths[pk] = depth
+            queue.extend((next_pk, depth + 1) for next_pk in depends_on.get(pk, ()))
+        rows.extend(
+            TaskDependencyClosure(ancestor_id=ancestor, descendant_id=task_id, depth=depth)
+            for ancestor, depth in depths.items()
+        )
+
+    TaskDependencyClosure.objects.filter(descendant_id__in=task_ids).delete()
+    TaskDependencyClosure.objects.bulk_create(rows)
+
+
+def with_dependents(task_ids):
+    """`task_ids` plus every task that transitively depends on them"""
+    task_ids = set(task_ids)
+    task_ids.update(
+        TaskDependencyClosure.objects.filter(ancestor_id__in=task_ids).values_list('descendant_id', flat=True)
+    )
+    return task_ids
+
+
+def remove_edge(task_id, dependency_id):
+    """Record that `task_id` no longer depends on `dependency_id`"""
+    recompute_descendants(with_dependents({task_id}))
+
+
+def rebuild(project_id):
+    """
+    Recompute the closure for every task of a project from the raw M2M.
+    The recursive CTE is bounded by the task count so stray cycles terminate.
+    """
+    edge_table = Edge._meta.db_table
+    task_table = Task._meta.db_table
+    task_count = Task.objects.filter(project_id=project_id).count()
+    sql = f"""
+        WITH RECURSIVE closure(ancestor_id, descendant_id, depth) AS (
+            SELECT e.to_task_id, e.from_task_id, 1
+            FROM {edge_table} e
+            JOIN {task_table} t ON t.id = e.from_task_id
+            WHERE t.project_id = %s
+            UNION
+            SELECT e.to_task_id, c.descendant_id, c.depth + 1
+            FROM closure c
+            JOIN {edge_table} e ON e.from_task_id = c.ancestor_id
+            WHERE c.depth < %s
+        )
+        SELECT ancestor_id, descendant_id, MIN(depth)
+        FROM closure
+        WHERE ancestor_id <> descendant_id
+        GROUP BY ancestor_id, descendant_id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [project_id, max(task_count, 1)])
+        rows = [
+            TaskDependencyClosure(ancestor_id=ancestor, descendant_id=descendant, depth=depth)
+            for ancestor, descendant, depth in cursor.fetchall()
+        ]
+
+    with transaction.atomic():
+        TaskDependencyClosure.objects.filter(descendant__project_id=project_id).delete()
+        TaskDependencyClosure.objects.bulk_create(rows)
+    return len(rows)
+
+
+@receiver(m2m_changed, sender=Edge)
+def dependencies_changed(sender, instance, action, reverse, pk_set=None, **kwargs):
+    # reverse=True means the change was made through Task.blocking
+    if action == 'post_add':
+        for pk in pk_set:
+            if reverse:
+                add_edge(pk, instance.pk)
+            else:
+                add_edge(instance.pk, pk)
+    elif action == 'post_remove':
+        if reverse:
+            recompute_descendants(with_dependents(pk_set))
+        else:
+            for pk in pk_set:
+                remove_edge(instance.pk, pk)
+    elif action == 'pre_clear':
+        # Cleared rows are not reported after the fact, so remember them now
+        if reverse:
+            changed = set(instance.blocking.values_list('pk', flat=True))
+        else:
+            changed = {instance.pk}
+        instance._closure_changed = with_dependents(changed)
+    elif action == 'post_clear':
+        recompute_descendants(instance._closure_changed)
+
+
+@receiver(pre_delete, sender=Task)
+def remember_dependents(sender, instance, origin=None, **kwargs):
+    # Deleting a whole project drops its closure rows by cascade
+    if not isinstance(origin, Project):
+        instance._closure_dependents = with_dependents({instance.pk}) - {instance.pk}
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+    # Paths that ran through the deleted task no longer exist
+    dependents = getattr(instance, '_closure_dependents', None)
+    if dependents:
+        recompute_descendants(Task.objects.filter(pk__in=dependents).values_list('pk', flat=True))
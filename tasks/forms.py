@@ -44,15 +44,9 @@ class TaskForm(forms.ModelForm):
         
         if user:
             from projects.models import Project
-            # Filter projects based on user role
-            if user.profile.role == 'MANAGER':
-                # Manager sees only their managed projects
-                self.fields['project'].queryset = Project.objects.filter(manager=user)
-            elif user.profile.role == 'ENTERPRISE':
-                # Enterprise sees all projects in their organization
-                self.fields['project'].queryset = Project.objects.filter(
-                    organization=user.profile.organization
-                )
+            # Managers pick from their projects, enterprise admins from the organization's
+            if user.profile.role in ('MANAGER', 'ENTERPRISE'):
+                self.fields['project'].queryset = Project.objects.visible_to(user)
             
             # Filter assignees to project team members + manager
             if project:
@@ -63,11 +57,10 @@ class TaskForm(forms.ModelForm):
             else:
                 # Show all employees in the organization
                 from accounts.models import UserProfile
-                employee_profiles = UserProfile.objects.filter(
-                    organization=user.profile.organization,
+                employee_ids = UserProfile.objects.filter(
+                    organization_id=user.profile.organization_id,
                     role='EMPLOYEE'
-                )
-                employee_ids = [p.user.id for p in employee_profiles]
+                ).values('user_id')
                 self.fields['assigned_to'].queryset = User.objects.filter(id__in=employee_ids)
         
         self.fields['assigned_to'].required = False
@@ -120,3 +113,66 @@ class TaskStatusUpdateForm(forms.Form):
             'placeholder': 'Optional: Add a note about this update...'
         })
     )
+
+
+class TaskFilterForm(forms.Form):
+    """Server-side filters for the task list"""
+    SELECT_CLASSES = 'px-3 py-2 border border-gray-300 rounded-lg text-sm focus:outline-none focus:ring-2 focus:ring-indigo-500'
+    
+    status = forms.ChoiceField(
+        required=False,
+        choices=[('', 'All statuses')] + list(Task.STATUS_CHOICES),
+        widget=forms.Select(attrs={'class': SELECT_CLASSES})
+    )
+    priority = forms.ChoiceField(
+        required=False,
+        choices=[('', 'All priorities')] + list(Task.PRIORITY_CHOICES),
+        widget=forms.Select(attrs={'class': SELECT_CLASSES})
+    )
+    assignee = forms.ModelChoiceField(
+        required=False,
+        queryset=User.objects.none(),
+        empty_label='All assignees',
+        widget=forms.Select(attrs={'class': SELECT_CLASSES})
+    )
+    project = forms.ModelChoiceField(
+        required=False,
+        queryset=None,
+        empty_label='All projects',
+        widget=forms.Select(attrs={'class': SELECT_CLASSES})
+    )
+    due_after = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': SELECT_CLASSES, 'type': 'date'})
+    )
+    due_before = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': SELECT_CLASSES, 'type': 'date'})
+    )
+
+    def __init__(self, *args, **kwargs):
+        projects = kwargs.pop('projects')
+        assignees = kwargs.pop('assignees')
+        super().__init__(*args, **kwargs)
+        self.fields['project'].queryset = projects
+        self.fields['assignee'].queryset = assignees
+        self.fields['assignee'].label_from_instance = lambda u: u.get_full_name() or u.username
+
+    def filter_queryset(self, tasks):
+        """Apply the cleaned filters to a Task queryset"""
+        if not self.is_valid():
+            return tasks
+        data = self.cleaned_data
+        if data.get('status'):
+            tasks = tasks.filter(status=data['status'])
+        if data.get('priority'):
+            tasks = tasks.filter(priority=data['priority'])
+        if data.get('assignee'):
+            tasks = tasks.filter(assigned_to=data['assignee'])
+        if data.get('project'):
+            tasks = tasks.filter(project=data['project'])
+        if data.get('due_after'):
+            tasks = tasks.filter(due_date__gte=data['due_after'])
+        if data.get('due_before'):
+            tasks = tasks.filter(due_date__lte=data['due_before'])
+        return tasks
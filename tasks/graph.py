@@ -0,0 +1,208 @@
+"""
+In-memory dependency graph for the tasks of one project.
+
+A project's whole edge list is loaded in a single query (plus one for the
+task nodes) and, with settings.DEPENDENCY_GRAPH_CACHE_TIMEOUT, kept in the
+cache until a dependency or task in the project changes. Edges point from a
+task to the tasks it depends on, matching Task.depends_on. The project page
+lists tasks in topological order and marks the critical path.
+
+The cached copy can lag behind edges added by other processes, so it is for
+read-only analysis; validate new edges with closure.would_create_cycle.
+
+Usage:
+    graph = get_graph(project_id)
+    graph.topological_order()
+    graph.transitive_blockers(task.pk)
+    graph.critical_path(weight='hours')
+"""
+import heapq
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from dashboard import telemetry
+from projects.models import Project
+from .models import Task
+
+# Hours assumed for a task that was not created from a template
+DEFAULT_TASK_HOURS = 1
+
+
+class CycleError(ValueError):
+    """Raised when the dependency graph is not a DAG"""
+
+
+class DependencyGraph:
+    def __init__(self, project_id, nodes, edges):
+        """
+        `nodes` maps task id -> (status, due_date, estimated_hours or None);
+        `edges` is an iterable of (task_id, depends_on_id) pairs.
+        """
+        self.project_id = project_id
+        self.nodes = dict(nodes)
+        self.depends_on = {pk: set() for pk in self.nodes}
+        self.blocking = {pk: set() for pk in self.nodes}
+        for task_id, dependency_id in edges:
+            for pk in (task_id, dependency_id):
+                if pk not in self.nodes:
+                    # Dependency outside the project: keep it as an opaque node
+                    self.nodes[pk] = (None, None, None)
+                    self.depends_on[pk] = set()
+                    self.blocking[pk] = set()
+            self.depends_on[task_id].add(dependency_id)
+            self.blocking[dependency_id].add(task_id)
+
+    @classmethod
+    def load(cls, project_id):
+        """Build the graph for a project from the database"""
+        nodes = {
+            pk: (status, due_date, hours)
+            for pk, status, due_date, hours in Task.objects.filter(project_id=project_id)
+            .order_by().values_list('pk', 'status', 'due_date', 'template__estimated_hours')
+        }
+        edges = Task.depends_on.through.objects.filter(
+            from_task__project_id=project_id
+        ).values_list('from_task_id', 'to_task_id')
+        return cls(project_id, nodes, edges)
+
+    # ---------- Traversal ----------
+
+    def _reachable(self, start, adjacency):
+        seen = set()
+        stack = list(adjacency.get(start, ()))
+        while stack:
+            pk = stack.pop()
+            if pk not in seen:
+                seen.add(pk)
+                stack.extend(adjacency[pk])
+        return seen
+
+    def transitive_blockers(self, task_id):
+        """Every task `task_id` depends on, directly or indirectly"""
+        return self._reachable(task_id, self.depends_on)
+
+    def transitive_dependents(self, task_id):
+        """Every task that directly or indirectly depends on `task_id`"""
+        return self._reachable(task_id, self.blocking)
+
+    def open_blockers(self, task_id):
+        """Transitive blockers that are not done yet"""
+        return {pk for pk in self.transitive_blockers(task_id) if self.nodes[pk][0] != 'DONE'}
+
+    def would_create_cycle(self, task_id, dependency_id):
+        """True if making `task_id` depend on `dependency_id` would close a loop"""
+        if task_id == dependency_id:
+            return True
+        return task_id in self.transitive_blockers(dependency_id)
+
+    def topological_order(self):
+        """
+        Task ids with every task after all of its dependencies.
+        Ties are broken by id so the order is stable.
+        """
+        remaining = {pk: len(deps) for pk, deps in self.depends_on.items()}
+        ready = [pk for pk, count in remaining.items() if count == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            pk = heapq.heappop(ready)
+            order.append(pk)
+            for dependent in self.blocking[pk]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    heapq.heappush(ready, dependent)
+        if len(order) != len(self.nodes):
+            raise CycleError(f'Dependencies of project {self.project_id} contain a cycle')
+        return order
+
+    # ---------- Critical path ----------
+
+    def _hours(self, pk):
+        status, _, hours = self.nodes[pk]
+        if status == 'DONE':
+            return 0
+        return hours or DEFAULT_TASK_HOURS
+
+    def _due_days(self, pk):
+        """
+        Days between this task's due date and the latest due date among its
+        dependencies (or today, for tasks without dependencies). Along a chain
+        these add up to the chain's scheduled span.
+        """
+        status, due_date, _ = self.nodes[pk]
+        if status == 'DONE' or due_date is None:
+            return 0
+        starts = [self.nodes[dep][1] for dep in self.depends_on[pk] if self.nodes[dep][1]]
+        start = max(starts) if starts else timezone.now().date()
+        return max((due_date - start).days, 0)
+
+    def critical_path(self, weight='hours'):
+        """
+        Longest chain of open work as (task ids in order, total weight).
+        `weight` is 'hours' (template estimates) or 'due_date' (days of schedule).
+        """
+        cost = self._hours if weight == 'hours' else self._due_days
+        best, previous = {}, {}
+        for pk in self.topological_order():
+            before = max(self.depends_on[pk], key=lambda dep: (best[dep], -dep), default=None)
+            best[pk] = cost(pk) + (best[before] if before is not None else 0)
+            previous[pk] = before
+
+        if not best:
+            return [], 0
+        end = max(best, key=lambda pk: (best[pk], -pk))
+        path = []
+        pk = end
+        while pk is not None:
+            path.append(pk)
+            pk = previous[pk]
+        return path[::-1], best[end]
+
+
+def _cache_key(project_id):
+    return f'tasks:graph:{project_id}'
+
+
+def get_graph(project_id):
+    """DependencyGraph for a project, cached for DEPENDENCY_GRAPH_CACHE_TIMEOUT"""
+    timeout = getattr(settings, 'DEPENDENCY_GRAPH_CACHE_TIMEOUT', 0)
+    if timeout <= 0:
+        return DependencyGraph.load(project_id)
+    graph = cache.get(_cache_key(project_id))
+    telemetry.cache_lookup('dependency_graph', graph is not None)
+    if graph is None:
+        graph = DependencyGraph.load(project_id)
+        cache.set(_cache_key(project_id), graph, timeout)
+    return graph
+
+
+def invalidate(*project_ids):
+    cache.delete_many([_cache_key(pk) for pk in set(project_ids) if pk])
+
+
+@receiver(m2m_changed, sender=Task.depends_on.through)
+def dependencies_changed(sender, instance, action, pk_set=None, **kwargs):
+    if not action.startswith('post_'):
+        return
+    project_ids = {instance.project_id}
+    if pk_set:
+        project_ids |= set(Task.objects.filter(pk__in=pk_set).values_list('project_id', flat=True))
+    invalidate(*project_ids)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def task_changed(sender, instance, **kwargs):
+    # Node weights (status, due date, template) live in the cached graph too
+    invalidate(instance.project_id)
+
+
+@receiver(post_save, sender=Project)
+def project_created(sender, instance, created, **kwargs):
+    # Project ids can be reused (e.g. SQLite after a rollback); never serve an old graph
+    if created:
+        invalidate(instance.pk)
@@ -0,0 +1,32 @@
+"""
+Recompute the task dependency closure table from the raw depends_on M2M
+using a recursive CTE. Use it after bulk imports or to repair drift.
+
+Usage:
+    python manage.py rebuild_task_closure
+    python manage.py rebuild_task_closure --project 7
+"""
+from django.core.management.base import BaseCommand
+
+from projects.models import Project
+from tasks import closure
+
+
+class Command(BaseCommand):
+    help = 'Rebuild TaskDependencyClosure rows from task dependencies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='Only rebuild this project id')
+
+    def handle(self, *args, **options):
+        project_ids = Project.objects.values_list('pk', flat=True)
+        if options['project']:
+            project_ids = project_ids.filter(pk=options['project'])
+
+        total = 0
+        for project_id in project_ids:
+            total += closure.rebuild(project_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {total} closure row(s) for {len(project_ids)} project(s).'
+        ))
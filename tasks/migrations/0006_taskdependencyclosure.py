@@ -0,0 +1,55 @@
+# Generated by Django 5.0.1 on 2026-10-16 22:51
+
+import django.db.models.deletion
+from collections import deque
+
+from django.db import migrations, models
+
+
+def populate_closure(apps, schema_editor):
+    """Seed the closure table from the existing dependencies"""
+    Task = apps.get_model('tasks', 'Task')
+    TaskDependencyClosure = apps.get_model('tasks', 'TaskDependencyClosure')
+    depends_on = {}
+    for from_id, to_id in Task.depends_on.through.objects.values_list('from_task_id', 'to_task_id'):
+        depends_on.setdefault(from_id, []).append(to_id)
+
+    rows = []
+    for task_id in depends_on:
+        depths = {}
+        queue = deque((pk, 1) for pk in depends_on[task_id])
+        while queue:
+            pk, depth = queue.popleft()
+            if pk in depths or pk == task_id:
+                continue
+            depths[pk] = depth
+            queue.extend((next_pk, depth + 1) for next_pk in depends_on.get(pk, ()))
+        rows.extend(
+            TaskDependencyClosure(ancestor_id=ancestor, descendant_id=task_id, depth=depth)
+            for ancestor, depth in depths.items()
+        )
+    TaskDependencyClosure.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_task_template'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskDependencyClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='tasks.task')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='tasks.task')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='closure_descendant_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(populate_closure, migrations.RunPython.noop),
+    ]
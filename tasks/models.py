@@ -1,8 +1,11 @@
 import os
-from django.db import models
+from datetime import timedelta
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, Exists, OuterRef, Q
 from django.contrib.auth.models import User
 from django.utils import timezone
-from projects.models import Project
+from projects.models import Project, visible_project_ids
 
 
 def task_attachment_path(instance, filename):
@@ -10,6 +13,59 @@ def task_attachment_path(instance, filename):
     return f'tasks/{instance.task.project.id}/{instance.task.id}/{filename}'
 
 
+class TaskQuerySet(models.QuerySet):
+    """Custom queryset for Task with reusable aggregate helpers"""
+    
+    ACTIVE_STATUSES = ('TODO', 'IN_PROGRESS', 'IN_REVIEW')
+    
+    def stats(self):
+        """
+        Return status counters for this queryset in a single aggregate query.
+        Keys match the context variable names used by the task list and dashboards.
+        """
+        now = timezone.now()
+        week_ago = now - timedelta(days=7)
+        active = Q(status__in=self.ACTIVE_STATUSES)
+        
+        return self.order_by().aggregate(
+            task_count=Count('pk'),
+            todo_count=Count('pk', filter=Q(status='TODO')),
+            in_progress_count=Count('pk', filter=Q(status='IN_PROGRESS')),
+            in_review_count=Count('pk', filter=Q(status='IN_REVIEW')),
+            done_count=Count('pk', filter=Q(status='DONE')),
+            active_task_count=Count('pk', filter=active),
+            overdue_count=Count('pk', filter=active & Q(due_date__lt=now.date())),
+            tasks_completed_this_week=Count('pk', filter=Q(status='DONE', updated_at__gte=week_ago)),
+            tasks_created_this_week=Count('pk', filter=Q(created_at__gte=week_ago)),
+        )
+    
+    def with_blocked(self):
+        """
+        Annotate each task with whether it has unfinished dependencies,
+        so Task.is_blocked does not need a query per row
+        """
+        open_dependencies = Task.depends_on.through.objects.filter(
+            from_task=OuterRef('pk')
+        ).exclude(to_task__status='DONE')
+        return self.annotate(has_open_dependencies=Exists(open_dependencies))
+    
+    def visible_to(self, user):
+        """
+        Tasks `user` may see: tasks of their visible projects for enterprise
+        admins and managers, tasks assigned to them for employees.
+        Filters on project_id (memoized for the request) instead of joining projects.
+        """
+        if user.profile.role in ('ENTERPRISE', 'MANAGER'):
+            tasks = self.filter(project_id__in=visible_project_ids(user))
+        else:
+            tasks = self.filter(assigned_to=user)
+        return tasks.select_related('project', 'assigned_to')
+
+
+class InvalidTransition(ValueError):
+    """Raised when the workflow does not allow a status change"""
+
+
 class Task(models.Model):
     """
     Task model - represents a task within a project
@@ -60,15 +116,32 @@ class Task(models.Model):
         related_name='blocking'
     )
     
+    # Template the task was created from; its estimate weights the critical path
+    template = models.ForeignKey(
+        'TaskTemplate',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='tasks'
+    )
+    
+    # Order within a Kanban column (ascending); gaps leave room for drops
+    position = models.IntegerField(default=0)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TaskQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.title} ({self.project.name})"
     
     @property
     def is_blocked(self):
         """Check if task is blocked by incomplete dependencies"""
+        # Use the with_blocked() annotation when the queryset provided it
+        if hasattr(self, 'has_open_dependencies'):
+            return self.has_open_dependencies
         return self.depends_on.exclude(status='DONE').exists()
     
     @property
@@ -76,8 +149,114 @@ class Task(models.Model):
         """Get tasks that are blocking this one"""
         return self.depends_on.exclude(status='DONE')
     
+    def all_blockers(self):
+        """Every task this one depends on, directly or transitively (one query)"""
+        return Task.objects.filter(descendant_links__descendant=self)
+    
+    def all_dependents(self):
+        """Every task this one unblocks, directly or transitively (one query)"""
+        return Task.objects.filter(ancestor_links__ancestor=self)
+    
+    @classmethod
+    def can_transition(cls, old_status, new_status):
+        """Whether settings.TASK_WORKFLOW allows moving from `old_status` to `new_status`"""
+        if new_status not in dict(cls.STATUS_CHOICES):
+            return False
+        workflow = getattr(settings, 'TASK_WORKFLOW', None)
+        if not workflow or old_status == new_status:
+            return True
+        return new_status in workflow.get(old_status, ())
+    
+    def transition(self, new_status, by_user, comment=None):
+        """
+        Move the task to `new_status`, writing only status and updated_at.
+        The STATUS_CHANGE activity and a status comment (`comment` may be text
+        or an unsaved TaskComment) are written in the same transaction.
+        Returns the saved comment, or None if the status did not change.
+        Raises InvalidTransition if the workflow does not allow the change.
+        """
+        from notifications import events
+        from notifications.utils import log_task_activity
+        
+        old_status = self.status
+        if old_status == new_status:
+            return None
+        if not self.can_transition(old_status, new_status):
+            raise InvalidTransition(
+                f'Cannot move a task from {self.get_status_display()} to '
+                f'{dict(self.STATUS_CHOICES).get(new_status, new_status)}'
+            )
+        
+        statuses = dict(self.STATUS_CHOICES)
+        if not isinstance(comment, TaskComment):
+            comment = TaskComment(
+                comment=comment or f'Status changed from {statuses[old_status]} to {statuses[new_status]}'
+            )
+        comment.task = self
+        comment.user = by_user
+        comment.status_changed_to = new_status
+        
+        with transaction.atomic():
+            self.status = new_status
+            self.save(update_fields=['status', 'updated_at'])
+            log_task_activity(
+                self, by_user, 'STATUS_CHANGE',
+                f'moved "{self.title}" to {statuses[new_status]}',
+                old_value=statuses[old_status],
+                new_value=statuses[new_status]
+            )
+            comment.save()
+            events.publish_task_change(
+                self.pk, self.status, self.position, self.updated_at,
+                self.project.organization_id, self.project.manager_id, self.assigned_to_id
+            )
+        return comment
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Task list / kanban filtered by project or assignee and status
+            models.Index(fields=['project', 'status'], name='task_project_status_idx'),
+            models.Index(fields=['assigned_to', 'status'], name='task_assignee_status_idx'),
+            # Kanban columns ordered by position
+            models.Index(fields=['status', 'position'], name='task_status_position_idx'),
+            # Overdue lookups only ever touch open tasks
+            models.Index(
+                fields=['project', 'due_date'],
+                name='task_open_due_idx',
+                condition=~models.Q(status='DONE')
+            ),
+        ]
+
+
+class TaskDependencyClosure(models.Model):
+    """
+    TaskDependencyClosure model - transitive closure of Task.depends_on
+    One row per (ancestor, descendant) pair where `descendant` depends on
+    `ancestor` through `depth` edges (shortest path). Maintained by
+    tasks/closure.py whenever dependencies change.
+    """
+    ancestor = models.ForeignKey(
+        Task,
+        on_delete=models.CASCADE,
+        related_name='descendant_links'
+    )
+    descendant = models.ForeignKey(
+        Task,
+        on_delete=models.CASCADE,
+        related_name='ancestor_links'
+    )
+    depth = models.PositiveIntegerField()
+    
+    def __str__(self):
+        return f"{self.descendant_id} depends on {self.ancestor_id} ({self.depth})"
+    
+    class Meta:
+        unique_together = ['ancestor', 'descendant']
+        indexes = [
+            # "All transitive blockers" looks rows up by descendant
+            models.Index(fields=['descendant', 'depth'], name='closure_descendant_idx'),
+        ]
 
 
 class TaskComment(models.Model):
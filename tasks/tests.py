@@ -1,11 +1,764 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
 
-# Create your tests here.
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.utils import timezone
 
-# TODO: Add test cases for:
-# - Task creation
-# - Task updates
-# - Task deletion
-# - Task filtering/searching
-# - Task status changes
-# - Task assignment
+from accounts.models import UserProfile
+from projects.models import Organization, Project
+from .models import Task, TaskComment, InvalidTransition
+from . import views
+
+
+class TaskTestMixin:
+    """Shared fixtures: one organization with an enterprise admin, a manager and an employee"""
+
+    def setUp(self):
+        self.client = Client()
+
+        self.enterprise_user = User.objects.create_user(username='enterprise', password='password123')
+        self.organization = Organization.objects.create(name='Acme', created_by=self.enterprise_user)
+        UserProfile.objects.create(user=self.enterprise_user, role='ENTERPRISE', organization=self.organization)
+
+        self.manager = User.objects.create_user(username='manager', password='password123')
+        UserProfile.objects.create(user=self.manager, role='MANAGER', organization=self.organization)
+
+        self.employee = User.objects.create_user(username='employee', password='password123')
+        UserProfile.objects.create(user=self.employee, role='EMPLOYEE', organization=self.organization)
+
+        self.project = Project.objects.create(
+            name='Website',
+            organization=self.organization,
+            manager=self.manager,
+            created_by=self.enterprise_user
+        )
+
+    def create_task(self, **kwargs):
+        kwargs.setdefault('title', 'Task')
+        kwargs.setdefault('project', self.project)
+        kwargs.setdefault('created_by', self.manager)
+        return Task.objects.create(**kwargs)
+
+
+class VisibleTasksTests(TaskTestMixin, TestCase):
+    def test_visible_to_scopes_by_role(self):
+        """Test that enterprise admins, managers and employees each get their task scope"""
+        other_project = Project.objects.create(
+            name='Intranet', organization=self.organization, created_by=self.enterprise_user
+        )
+        mine = self.create_task(assigned_to=self.employee)
+        managed = self.create_task()
+        unmanaged = self.create_task(project=other_project)
+
+        self.assertEqual(set(Task.objects.visible_to(self.enterprise_user)), {mine, managed, unmanaged})
+        self.assertEqual(set(Task.objects.visible_to(self.manager)), {mine, managed})
+        self.assertEqual(set(Task.objects.visible_to(self.employee)), {mine})
+
+    def test_template_task_needs_a_visible_project(self):
+        """Test that a task cannot be created from a template in someone else's project"""
+        from .models import TaskTemplate
+
+        template = TaskTemplate.objects.create(
+            name='Bug', organization=self.organization, default_title='Bug', created_by=self.enterprise_user
+        )
+        other_project = Project.objects.create(
+            name='Intranet', organization=self.organization, created_by=self.enterprise_user
+        )
+        self.client.force_login(self.manager)
+        url = reverse('tasks:create_from_template', args=[template.pk])
+
+        self.assertEqual(self.client.post(url, {'project': other_project.pk}).status_code, 404)
+        self.assertEqual(self.client.post(url, {'project': self.project.pk}).status_code, 302)
+
+
+class TaskStatsTests(TaskTestMixin, TestCase):
+    def test_stats_counts_every_status(self):
+        """Test that stats() returns all counters from one query"""
+        yesterday = timezone.now().date() - timedelta(days=1)
+        self.create_task(status='TODO', due_date=yesterday)
+        self.create_task(status='TODO')
+        self.create_task(status='IN_PROGRESS', assigned_to=self.employee)
+        self.create_task(status='IN_REVIEW')
+        self.create_task(status='DONE', due_date=yesterday)
+
+        with self.assertNumQueries(1):
+            stats = Task.objects.filter(project=self.project).stats()
+
+        self.assertEqual(stats['task_count'], 5)
+        self.assertEqual(stats['todo_count'], 2)
+        self.assertEqual(stats['in_progress_count'], 1)
+        self.assertEqual(stats['in_review_count'], 1)
+        self.assertEqual(stats['done_count'], 1)
+        self.assertEqual(stats['active_task_count'], 4)
+        self.assertEqual(stats['overdue_count'], 1)
+        self.assertEqual(stats['tasks_completed_this_week'], 1)
+        self.assertEqual(stats['tasks_created_this_week'], 5)
+
+    def test_stats_respects_queryset_filters(self):
+        """Test that stats() only counts rows in the filtered queryset"""
+        self.create_task(status='TODO', assigned_to=self.employee)
+        self.create_task(status='DONE')
+
+        stats = Task.objects.filter(assigned_to=self.employee).stats()
+        self.assertEqual(stats['task_count'], 1)
+        self.assertEqual(stats['done_count'], 0)
+
+    def test_task_list_uses_stats(self):
+        """Test that the task list shows the aggregated counters"""
+        self.create_task(status='TODO')
+        self.create_task(status='DONE')
+        self.client.force_login(self.manager)
+
+        response = self.client.get(reverse('tasks:list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['todo_count'], 1)
+        self.assertEqual(response.context['done_count'], 1)
+
+
+class KanbanBoardTests(TaskTestMixin, TestCase):
+    def create_cards(self, count):
+        """Create `count` cards spread over every column, each blocked by an open task"""
+        blocker = self.create_task(title='Blocker', status='IN_PROGRESS')
+        statuses = [status for status, _ in Task.STATUS_CHOICES]
+        for i in range(count):
+            task = self.create_task(title=f'Card {i}', status=statuses[i % len(statuses)],
+                                    assigned_to=self.employee)
+            task.depends_on.add(blocker)
+
+    def get_board_query_count(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('tasks:kanban'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_board_groups_cards_and_flags_blocked(self):
+        """Test that cards land in their status column with the blocked flag annotated"""
+        self.create_cards(4)
+        self.client.force_login(self.manager)
+
+        _, response = self.get_board_query_count()
+        columns = {column['status']: column['tasks'] for column in response.context['board']}
+        self.assertEqual(len(columns['TODO']), 1)
+        self.assertEqual(len(columns['IN_PROGRESS']), 2)
+        self.assertTrue(all(task.is_blocked for task in columns['TODO']))
+        blocker = next(task for task in columns['IN_PROGRESS'] if task.title == 'Blocker')
+        self.assertFalse(blocker.is_blocked)
+
+    def test_query_count_is_constant(self):
+        """Test that the board runs the same number of queries for 4 or 40 cards"""
+        self.client.force_login(self.manager)
+        self.create_cards(4)
+        # The first request caches the actor's profile and organization
+        self.get_board_query_count()
+        small, _ = self.get_board_query_count()
+
+        self.create_cards(40)
+        large, _ = self.get_board_query_count()
+
+        self.assertEqual(small, large)
+        # session, user, profile, visible project ids, cards, column totals, projects, unread counter
+        self.assertEqual(large, 8)
+
+    def test_is_blocked_falls_back_to_query(self):
+        """Test that is_blocked still works on tasks loaded without the annotation"""
+        blocker = self.create_task(title='Blocker')
+        task = self.create_task(title='Blocked')
+        task.depends_on.add(blocker)
+
+        self.assertTrue(Task.objects.get(pk=task.pk).is_blocked)
+        blocker.status = 'DONE'
+        blocker.save()
+        self.assertFalse(Task.objects.get(pk=task.pk).is_blocked)
+
+
+class KanbanPaginationTests(TaskTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.manager)
+        self.page_size = views.KANBAN_PAGE_SIZE
+
+    def test_first_paint_is_bounded_and_done_is_lazy(self):
+        """Test that columns render one page and DONE is deferred"""
+        for i in range(self.page_size + 5):
+            self.create_task(title=f'Todo {i}', status='TODO')
+        self.create_task(title='Finished', status='DONE')
+
+        response = self.client.get(reverse('tasks:kanban'))
+        board = {column['status']: column for column in response.context['board']}
+
+        self.assertEqual(len(board['TODO']['tasks']), self.page_size)
+        self.assertEqual(board['TODO']['count'], self.page_size + 5)
+        self.assertTrue(board['TODO']['has_more'])
+        self.assertEqual(board['DONE']['tasks'], [])
+        self.assertEqual(board['DONE']['count'], 1)
+        self.assertTrue(board['DONE']['has_more'])
+
+    def test_column_endpoint_walks_pages_without_gaps(self):
+        """Test that following cursors returns every card exactly once, newest first"""
+        created = [self.create_task(title=f'Done {i}', status='DONE') for i in range(self.page_size + 3)]
+        url = reverse('tasks:kanban_column')
+
+        first = self.client.get(url, {'status': 'DONE'}).json()
+        self.assertEqual(len(first['cards']), self.page_size)
+        self.assertTrue(first['has_more'])
+
+        second = self.client.get(url, {'status': 'DONE', 'cursor': first['next_cursor']}).json()
+        self.assertEqual(len(second['cards']), 3)
+        self.assertFalse(second['has_more'])
+        self.assertIsNone(second['next_cursor'])
+
+        ids = [card['id'] for card in first['cards'] + second['cards']]
+        self.assertEqual(ids, [task.pk for task in reversed(created)])
+        self.assertIn('Done 0', second['cards'][-1]['html'])
+
+    def test_column_endpoint_query_count_is_constant(self):
+        """Test that a column page runs the same number of queries for 2 or 20 cards"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        url = reverse('tasks:kanban_column')
+        for i in range(2):
+            self.create_task(title=f'Done {i}', status='DONE', assigned_to=self.employee)
+        # The first request caches the actor's profile and organization
+        self.client.get(url, {'status': 'DONE'})
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url, {'status': 'DONE'})
+
+        for i in range(18):
+            self.create_task(title=f'More {i}', status='DONE', assigned_to=self.employee)
+        with CaptureQueriesContext(connection) as large:
+            data = self.client.get(url, {'status': 'DONE'}).json()
+
+        self.assertEqual(len(data['cards']), 20)
+        self.assertEqual(len(small), len(large))
+        # session, user, profile, visible project ids, cards
+        self.assertEqual(len(large), 5)
+
+    def test_column_endpoint_rejects_bad_input(self):
+        """Test that unknown statuses and malformed cursors return 400"""
+        url = reverse('tasks:kanban_column')
+        self.assertEqual(self.client.get(url, {'status': 'NOPE'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'status': 'DONE', 'cursor': 'x'}).status_code, 400)
+
+    def test_column_endpoint_respects_role_scope(self):
+        """Test that employees only page through their own cards"""
+        self.create_task(title='Mine', status='DONE', assigned_to=self.employee)
+        self.create_task(title='Not mine', status='DONE')
+        self.client.force_login(self.employee)
+
+        data = self.client.get(reverse('tasks:kanban_column'), {'status': 'DONE'}).json()
+        self.assertEqual(len(data['cards']), 1)
+
+
+class KanbanSyncTests(TaskTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.manager)
+
+    def move(self, task, status, position, expected=None):
+        return {
+            'task_id': task.pk,
+            'status': status,
+            'position': position,
+            'expected_updated_at': (expected or task.updated_at).isoformat(),
+        }
+
+    def sync(self, *moves):
+        return self.client.post(reverse('tasks:kanban_sync'), json.dumps({'moves': list(moves)}),
+                                content_type='application/json')
+
+    def test_moves_are_applied_and_order_the_column(self):
+        """Test that a batch of moves persists status and position in one request"""
+        from notifications.models import ActivityLog
+
+        first = self.create_task(title='First', status='TODO')
+        second = self.create_task(title='Second', status='TODO')
+        third = self.create_task(title='Third', status='IN_PROGRESS')
+
+        response = self.sync(
+            self.move(first, 'IN_PROGRESS', -1024),
+            self.move(second, 'TODO', 2048),
+            self.move(third, 'IN_PROGRESS', 1024),
+        )
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(len(data['applied']), 3)
+        self.assertEqual(data['conflicts'], [])
+
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.position), ('IN_PROGRESS', -1024))
+        self.assertEqual(first.updated_at.isoformat(), next(
+            move['updated_at'] for move in data['applied'] if move['task_id'] == first.pk
+        ))
+        self.assertEqual(ActivityLog.objects.filter(action='STATUS_CHANGE').count(), 1)
+
+        response = self.client.get(reverse('tasks:kanban'))
+        columns = {column['status']: column['tasks'] for column in response.context['board']}
+        self.assertEqual([task.title for task in columns['IN_PROGRESS']], ['First', 'Third'])
+
+    def test_stale_moves_are_reported_as_conflicts(self):
+        """Test that a task changed since it was loaded is not overwritten"""
+        stale = self.create_task(title='Stale', status='TODO')
+        fresh = self.create_task(title='Fresh', status='TODO')
+        loaded_at = stale.updated_at
+        stale.status = 'IN_REVIEW'
+        stale.save()
+
+        data = self.sync(
+            self.move(stale, 'DONE', 0, expected=loaded_at),
+            self.move(fresh, 'DONE', 0),
+        ).json()
+
+        self.assertFalse(data['success'])
+        self.assertEqual([move['task_id'] for move in data['applied']], [fresh.pk])
+        self.assertEqual(len(data['conflicts']), 1)
+        conflict = data['conflicts'][0]
+        self.assertEqual((conflict['task_id'], conflict['status']), (stale.pk, 'IN_REVIEW'))
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'IN_REVIEW')
+
+    def test_moves_respect_role_scope(self):
+        """Test that employees can only move their own cards"""
+        mine = self.create_task(title='Mine', assigned_to=self.employee)
+        other = self.create_task(title='Other')
+        self.client.force_login(self.employee)
+
+        data = self.sync(self.move(mine, 'IN_PROGRESS', 0), self.move(other, 'DONE', 0)).json()
+        self.assertEqual(data['denied'], [other.pk])
+        other.refresh_from_db()
+        self.assertEqual(other.status, 'TODO')
+
+    def test_rejects_malformed_moves(self):
+        """Test that bad statuses and timestamps return 400 without changing anything"""
+        task = self.create_task()
+        bad_status = dict(self.move(task, 'NOPE', 0))
+        naive = dict(self.move(task, 'DONE', 0), expected_updated_at='2024-01-01T00:00:00')
+
+        self.assertEqual(self.sync(bad_status).status_code, 400)
+        self.assertEqual(self.sync(naive).status_code, 400)
+        self.assertEqual(self.sync().status_code, 400)
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'TODO')
+
+    def test_rejects_wrongly_typed_moves(self):
+        """Test that unhashable statuses and non-integer or out-of-range positions return 400"""
+        task = self.create_task()
+        for status in (['DONE'], {'status': 'DONE'}):
+            self.assertEqual(self.sync(self.move(task, status, 0)).status_code, 400)
+        for position in (10 ** 30, 2 ** 40, -2 ** 31 - 1, 1.9, True, '5'):
+            self.assertEqual(self.sync(self.move(task, 'DONE', position)).status_code, 400)
+        self.assertEqual(self.sync(dict(self.move(task, 'DONE', 0), task_id=10 ** 30)).status_code, 400)
+
+        self.assertTrue(self.sync(self.move(task, 'IN_PROGRESS', 2 ** 31 - 1)).json()['success'])
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.position), ('IN_PROGRESS', 2 ** 31 - 1))
+
+
+class TaskTransitionTests(TaskTestMixin, TestCase):
+    def test_transition_writes_only_status_columns(self):
+        """Test that a transition updates status and updated_at, logs activity and comments"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from notifications.models import ActivityLog
+
+        task = self.create_task(title='Write docs', description='Long text')
+        with CaptureQueriesContext(connection) as queries:
+            comment = task.transition('IN_PROGRESS', self.employee)
+
+        update = next(query['sql'] for query in queries.captured_queries
+                      if query['sql'].startswith('UPDATE "tasks_task"'))
+        self.assertIn('"status"', update)
+        self.assertNotIn('"title"', update)
+        self.assertNotIn('"description"', update)
+
+        self.assertEqual(comment.comment, 'Status changed from To Do to In Progress')
+        self.assertEqual(comment.status_changed_to, 'IN_PROGRESS')
+        self.assertEqual(ActivityLog.objects.filter(action='STATUS_CHANGE', entity_id=task.pk).count(), 1)
+        self.assertIsNone(task.transition('IN_PROGRESS', self.employee))
+
+    @override_settings(TASK_WORKFLOW={'TODO': ['IN_PROGRESS'], 'IN_PROGRESS': ['DONE']})
+    def test_workflow_is_enforced(self):
+        """Test that disallowed changes raise and every status path refuses them"""
+        task = self.create_task(assigned_to=self.employee)
+        with self.assertRaises(InvalidTransition):
+            task.transition('DONE', self.manager)
+
+        self.client.force_login(self.manager)
+        response = self.client.post(reverse('tasks:update_status_ajax'),
+                                    json.dumps({'task_id': task.pk, 'status': 'DONE'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.client.post(reverse('tasks:update_status', args=[task.pk]), {'status': 'DONE'})
+        self.client.post(reverse('tasks:add_comment', args=[task.pk]),
+                         {'comment': 'Finished', 'status_changed_to': 'DONE'})
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'TODO')
+        self.assertFalse(TaskComment.objects.filter(task=task).exists())
+
+        self.client.post(reverse('tasks:update_status', args=[task.pk]), {'status': 'IN_PROGRESS'})
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'IN_PROGRESS')
+
+    def test_comment_with_status_change_is_saved_once(self):
+        """Test that add_comment records the given text as the status comment"""
+        task = self.create_task(assigned_to=self.employee)
+        self.client.force_login(self.employee)
+
+        self.client.post(reverse('tasks:add_comment', args=[task.pk]),
+                         {'comment': 'Picked this up', 'status_changed_to': 'IN_PROGRESS'})
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'IN_PROGRESS')
+        comments = list(TaskComment.objects.filter(task=task).values_list('comment', 'status_changed_to'))
+        self.assertEqual(comments, [('Picked this up', 'IN_PROGRESS')])
+
+
+class TaskListViewTests(TaskTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.manager)
+        self.page_size = views.TASK_LIST_PAGE_SIZE
+
+    def test_keyset_pagination_covers_every_task(self):
+        """Test that following next-page cursors lists every task exactly once"""
+        created = [self.create_task(title=f'Task {i}') for i in range(self.page_size + 7)]
+
+        response = self.client.get(reverse('tasks:list'))
+        first_page = [task.pk for task in response.context['tasks']]
+        self.assertEqual(len(first_page), self.page_size)
+
+        response = self.client.get(reverse('tasks:list') + '?' + response.context['next_page_query'])
+        second_page = [task.pk for task in response.context['tasks']]
+        self.assertNotIn('next_page_query', response.context)
+
+        self.assertEqual(first_page + second_page, [task.pk for task in reversed(created)])
+
+    def test_malformed_cursor_shows_first_page(self):
+        """Test that unparsable or out-of-range cursors are ignored instead of failing"""
+        task = self.create_task(title='Only')
+        for cursor in ('x', '12', '999999999999999999999999999999-1', '1-99999999999999999999', '1--5'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('tasks:list'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([t.pk for t in response.context['tasks']], [task.pk])
+
+        url = reverse('tasks:kanban_column')
+        response = self.client.get(url, {'status': 'TODO', 'cursor': '1-99999999999999999999'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rows_do_not_query_per_task(self):
+        """Test that rendering more rows does not add queries"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.create_task(assigned_to=self.employee)
+        # The first request caches the actor's profile and organization
+        self.client.get(reverse('tasks:list'))
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('tasks:list'))
+
+        for i in range(20):
+            self.create_task(title=f'Task {i}', assigned_to=self.employee)
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(reverse('tasks:list'))
+
+        self.assertEqual(len(small), len(large))
+
+    def test_filters(self):
+        """Test the status, assignee and due-date filters"""
+        today = timezone.now().date()
+        match = self.create_task(title='Match', status='IN_PROGRESS', assigned_to=self.employee,
+                                 due_date=today)
+        self.create_task(title='Wrong status', status='TODO', assigned_to=self.employee, due_date=today)
+        self.create_task(title='Too late', status='IN_PROGRESS', assigned_to=self.employee,
+                         due_date=today + timedelta(days=30))
+
+        response = self.client.get(reverse('tasks:list'), {
+            'status': 'IN_PROGRESS',
+            'assignee': self.employee.pk,
+            'due_before': (today + timedelta(days=1)).isoformat(),
+        })
+        self.assertEqual([task.pk for task in response.context['tasks']], [match.pk])
+
+    def test_csv_export_streams_filtered_rows(self):
+        """Test that the CSV export is streamed and honours filters"""
+        self.create_task(title='Ship it', status='DONE')
+        self.create_task(title='Not yet', status='TODO')
+
+        response = self.client.get(reverse('tasks:list'), {'export': 'csv', 'status': 'DONE'})
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+
+        lines = content.strip().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['ID', 'Title', 'Project'])
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Ship it', lines[1])
+
+
+class DependencyGraphTests(TaskTestMixin, TestCase):
+    def chain(self, *titles, **kwargs):
+        """Create tasks where each one depends on the previous one"""
+        tasks = []
+        for title in titles:
+            task = self.create_task(title=title, **kwargs)
+            if tasks:
+                task.depends_on.add(tasks[-1])
+            tasks.append(task)
+        return tasks
+
+    def test_loads_in_two_queries_and_orders_topologically(self):
+        """Test that the graph is built from one node and one edge query"""
+        from .graph import DependencyGraph
+
+        design, build, ship = self.chain('Design', 'Build', 'Ship')
+        docs = self.create_task(title='Docs')
+        ship.depends_on.add(docs)
+
+        with self.assertNumQueries(2):
+            graph = DependencyGraph.load(self.project.pk)
+
+        order = graph.topological_order()
+        self.assertLess(order.index(design.pk), order.index(build.pk))
+        self.assertLess(order.index(build.pk), order.index(ship.pk))
+        self.assertLess(order.index(docs.pk), order.index(ship.pk))
+        self.assertEqual(graph.transitive_blockers(ship.pk), {design.pk, build.pk, docs.pk})
+        self.assertEqual(graph.transitive_dependents(design.pk), {build.pk, ship.pk})
+
+    def test_cycle_detection(self):
+        """Test that closing a loop is detected and the view refuses it"""
+        from .graph import CycleError, DependencyGraph, get_graph
+
+        first, second, third = self.chain('First', 'Second', 'Third')
+        self.assertTrue(get_graph(self.project.pk).would_create_cycle(first.pk, third.pk))
+        self.assertFalse(get_graph(self.project.pk).would_create_cycle(third.pk, first.pk))
+
+        self.client.force_login(self.manager)
+        self.client.post(reverse('tasks:add_dependency', args=[first.pk]), {'dependency_id': third.pk})
+        self.assertFalse(first.depends_on.exists())
+
+        first.depends_on.add(third)
+        with self.assertRaises(CycleError):
+            DependencyGraph.load(self.project.pk).topological_order()
+
+    @override_settings(DEPENDENCY_GRAPH_CACHE_TIMEOUT=3600)
+    def test_add_dependency_checks_cycles_against_database(self):
+        """Test that a stale cached graph (another worker's edge) cannot let a cycle through"""
+        from django.core.cache import cache
+        from .graph import _cache_key, get_graph
+
+        stale = get_graph(self.project.pk)
+        first, second, third = self.chain('First', 'Second', 'Third')
+        # As if the chain had been added by a worker whose invalidation never reached this one
+        cache.set(_cache_key(self.project.pk), stale)
+        self.assertFalse(get_graph(self.project.pk).would_create_cycle(first.pk, third.pk))
+
+        self.client.force_login(self.manager)
+        self.client.post(reverse('tasks:add_dependency', args=[first.pk]), {'dependency_id': third.pk})
+        self.assertFalse(first.depends_on.exists())
+
+    @override_settings(DEPENDENCY_GRAPH_CACHE_TIMEOUT=3600)
+    def test_cache_is_invalidated_by_dependency_changes(self):
+        """Test that the cached graph is reused and dropped when edges change"""
+        from .graph import get_graph
+
+        first, second = self.chain('First', 'Second')
+        get_graph(self.project.pk)
+        with self.assertNumQueries(0):
+            graph = get_graph(self.project.pk)
+        self.assertEqual(graph.transitive_blockers(second.pk), {first.pk})
+
+        second.depends_on.remove(first)
+        self.assertEqual(get_graph(self.project.pk).transitive_blockers(second.pk), set())
+
+    def test_zero_timeout_always_loads_the_graph(self):
+        """Test that without a cache timeout (the locmem default) every call reads the database"""
+        from .graph import get_graph
+
+        first, second = self.chain('First', 'Second')
+        with self.settings(DEPENDENCY_GRAPH_CACHE_TIMEOUT=0), self.assertNumQueries(4):
+            get_graph(self.project.pk)
+            graph = get_graph(self.project.pk)
+        self.assertEqual(graph.transitive_blockers(second.pk), {first.pk})
+
+    def test_critical_path_by_hours_and_due_date(self):
+        """Test that the heaviest chain of open work is returned"""
+        from .graph import get_graph
+        from .models import TaskTemplate
+
+        template = TaskTemplate.objects.create(
+            name='Migration', default_title='Migrate', estimated_hours=8,
+            organization=self.organization, created_by=self.manager
+        )
+        today = timezone.now().date()
+        short = self.create_task(title='Short', due_date=today + timedelta(days=2))
+        long_a = self.create_task(title='Long A', template=template, due_date=today + timedelta(days=1))
+        long_b = self.create_task(title='Long B', template=template, due_date=today + timedelta(days=3))
+        release = self.create_task(title='Release', due_date=today + timedelta(days=10))
+        long_b.depends_on.add(long_a)
+        release.depends_on.add(short, long_b)
+
+        path, hours = get_graph(self.project.pk).critical_path()
+        self.assertEqual(path, [long_a.pk, long_b.pk, release.pk])
+        self.assertEqual(hours, 17)
+
+        path, days = get_graph(self.project.pk).critical_path(weight='due_date')
+        self.assertEqual(path, [long_a.pk, long_b.pk, release.pk])
+        self.assertEqual(days, 10)
+
+
+class DependencyClosureTests(TaskTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # design <- build <- ship, and docs <- ship
+        self.design = self.create_task(title='Design')
+        self.build = self.create_task(title='Build')
+        self.ship = self.create_task(title='Ship')
+        self.docs = self.create_task(title='Docs')
+        self.build.depends_on.add(self.design)
+        self.ship.depends_on.add(self.build, self.docs)
+
+    def closure_rows(self):
+        from .models import TaskDependencyClosure
+        return set(TaskDependencyClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def test_add_maintains_transitive_rows(self):
+        """Test that adding edges records every ancestor with its shortest depth"""
+        self.assertEqual(self.closure_rows(), {
+            (self.design.pk, self.build.pk, 1),
+            (self.build.pk, self.ship.pk, 1),
+            (self.docs.pk, self.ship.pk, 1),
+            (self.design.pk, self.ship.pk, 2),
+        })
+        with self.assertNumQueries(1):
+            blockers = set(self.ship.all_blockers().values_list('pk', flat=True))
+        self.assertEqual(blockers, {self.design.pk, self.build.pk, self.docs.pk})
+        with self.assertNumQueries(1):
+            dependents = set(self.design.all_dependents().values_list('pk', flat=True))
+        self.assertEqual(dependents, {self.build.pk, self.ship.pk})
+
+        # A direct shortcut shortens the recorded depth
+        self.ship.depends_on.add(self.design)
+        self.assertIn((self.design.pk, self.ship.pk, 1), self.closure_rows())
+
+    def test_remove_and_delete_drop_stale_paths(self):
+        """Test that removing an edge or deleting a task recomputes downstream rows"""
+        self.build.depends_on.remove(self.design)
+        self.assertEqual(set(self.ship.all_blockers().values_list('pk', flat=True)), {self.build.pk, self.docs.pk})
+
+        self.build.depends_on.add(self.design)
+        self.build.delete()
+        self.assertEqual(set(self.ship.all_blockers().values_list('pk', flat=True)), {self.docs.pk})
+
+    def test_rebuild_command_matches_incremental_rows(self):
+        """Test that the recursive CTE rebuild reproduces the maintained closure"""
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import TaskDependencyClosure
+
+        expected = self.closure_rows()
+        TaskDependencyClosure.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_task_closure', project=self.project.pk, stdout=out)
+        self.assertEqual(self.closure_rows(), expected)
+        self.assertIn('4 closure row(s)', out.getvalue())
+
+
+class BulkUpdateTests(TaskTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('tasks:bulk_update')
+        self.tasks = [self.create_task(title=f'Task {i}', assigned_to=self.employee) for i in range(5)]
+        self.task_ids = [task.pk for task in self.tasks]
+
+    def post(self, payload):
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    def test_status_change_writes_logs_comments_and_one_notification(self):
+        """Test that one request updates every task and notifies each recipient once"""
+        from notifications.models import ActivityLog, Notification
+        from .models import TaskComment
+
+        self.client.force_login(self.manager)
+        response = self.post({'task_ids': self.task_ids, 'changes': {'status': 'DONE'}})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['updated'], sorted(self.task_ids))
+        self.assertEqual(Task.objects.filter(status='DONE').count(), 5)
+        self.assertEqual(ActivityLog.objects.filter(action='STATUS_CHANGE').count(), 5)
+        self.assertEqual(TaskComment.objects.filter(status_changed_to='DONE').count(), 5)
+
+        notifications = Notification.objects.filter(recipient=self.employee)
+        self.assertEqual(notifications.count(), 1)
+        self.assertIn('5 tasks', notifications.get().message)
+
+    def test_query_count_does_not_grow_with_selection(self):
+        """Test that the write path is bulk regardless of how many tasks are selected"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.force_login(self.manager)
+        # The first request caches the actor's profile and organization
+        self.client.get(reverse('tasks:list'))
+        with CaptureQueriesContext(connection) as small:
+            self.post({'task_ids': self.task_ids[:1], 'changes': {'priority': 'HIGH'}})
+        with CaptureQueriesContext(connection) as large:
+            self.post({'task_ids': self.task_ids[1:], 'changes': {'priority': 'HIGH'}})
+        self.assertEqual(len(small), len(large))
+
+    def test_permissions_are_scoped(self):
+        """Test that tasks outside the user's scope are reported as denied"""
+        other = self.create_task(title='Not mine')
+        self.client.force_login(self.employee)
+
+        response = self.post({'task_ids': [self.tasks[0].pk, other.pk], 'changes': {'status': 'IN_PROGRESS'}})
+        data = response.json()
+        self.assertEqual(data['updated'], [self.tasks[0].pk])
+        self.assertEqual(data['denied'], [other.pk])
+        other.refresh_from_db()
+        self.assertEqual(other.status, 'TODO')
+
+        response = self.post({'task_ids': self.task_ids, 'changes': {'priority': 'LOW'}})
+        self.assertEqual(response.status_code, 400)
+
+    def test_malformed_payloads_return_400(self):
+        """Test that wrongly typed changes and comments are rejected instead of raising"""
+        self.client.force_login(self.manager)
+        for payload in (
+            {'changes': {'status': ['DONE']}},
+            {'changes': {'priority': {'HIGH': 1}}},
+            {'changes': {'assigned_to': 'abc'}},
+            {'changes': {'assigned_to': 1.5}},
+            {'changes': {'assigned_to': True}},
+            {'changes': {'status': 'DONE'}, 'comment': 5},
+            {'changes': {'status': 'DONE'}, 'task_ids': '12'},
+        ):
+            with self.subTest(payload=payload):
+                response = self.post({'task_ids': self.task_ids, **payload})
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Task.objects.filter(status='DONE').exists())
+
+        # The assignee <select> posts ids as strings
+        response = self.post({'task_ids': self.task_ids, 'changes': {'assigned_to': str(self.employee.pk)}})
+        self.assertEqual(response.status_code, 200)
+
+    def test_reassign_and_dashboard_counters(self):
+        """Test that assignment is validated and status counters stay in sync"""
+        from dashboard.models import DashboardMetrics
+
+        metrics = DashboardMetrics.for_organization(self.organization)
+        self.assertEqual(metrics.todo_count, 5)
+        self.client.force_login(self.manager)
+
+        self.assertEqual(self.post({'task_ids': self.task_ids, 'changes': {'assigned_to': 99999}}).status_code, 400)
+        self.post({'task_ids': self.task_ids[:2], 'changes': {'assigned_to': self.manager.pk, 'status': 'IN_REVIEW'}})
+
+        self.assertEqual(Task.objects.filter(assigned_to=self.manager).count(), 2)
+        metrics.refresh_from_db()
+        self.assertEqual((metrics.todo_count, metrics.in_review_count), (3, 2))
@@ -13,6 +13,9 @@ urlpatterns = [
     path('<int:pk>/comment/', views.add_comment, name='add_comment'),
     path('<int:pk>/update-status/', views.update_status, name='update_status'),
     path('update-status-ajax/', views.update_task_status_ajax, name='update_status_ajax'),
+    path('kanban/column/', views.kanban_column, name='kanban_column'),
+    path('kanban/sync/', views.kanban_sync, name='kanban_sync'),
+    path('bulk-update/', views.bulk_update_tasks, name='bulk_update'),
     
     # File attachments
     path('<int:pk>/upload/', views.upload_attachment, name='upload_attachment'),
@@ -4,60 +4,172 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy, reverse
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponseForbidden
+from django.http import JsonResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.contrib.auth.models import User
 from django.views.decorators.http import require_POST
 from django.utils import timezone
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.template.loader import get_template
+from datetime import datetime, timedelta, timezone as dt_timezone
+import csv
 import json
 
-from .models import Task, TaskComment, TaskAttachment, TimeEntry, TaskTemplate
-from .forms import TaskForm, TaskCommentForm, TaskStatusUpdateForm
+from .models import Task, TaskAttachment, TimeEntry, TaskTemplate, InvalidTransition
+from .forms import TaskForm, TaskCommentForm, TaskStatusUpdateForm, TaskFilterForm
+from .bulk import BulkChangeError, apply_bulk_change, apply_kanban_moves
+from . import closure
 from projects.models import Project
 from notifications.utils import (
     notify_task_assigned, notify_task_updated, notify_task_comment,
-    notify_task_created, log_task_activity
+    notify_task_created, log_task_activity, NotificationDispatcher
 )
 
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
+TASK_LIST_PAGE_SIZE = 50
+TASK_EXPORT_CHUNK_SIZE = 2000
+
+CURSOR_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Largest value a 64-bit integer column holds; cursor numbers beyond it are malformed
+CURSOR_INT_MAX = 2 ** 63 - 1
+
+
+def encode_cursor(moment, pk):
+    """Encode a keyset position (timestamp, id) as an opaque cursor"""
+    micros = (moment - CURSOR_EPOCH) // timedelta(microseconds=1)
+    return f'{micros}-{pk}'
+
+
+def _cursor_int(value, minimum=-CURSOR_INT_MAX):
+    number = int(value)
+    if not minimum <= number <= CURSOR_INT_MAX:
+        raise ValueError(f'Cursor value out of range: {value}')
+    return number
+
+
+def decode_cursor(cursor):
+    """Decode a cursor back to (timestamp, id); raises ValueError if malformed"""
+    micros, pk = cursor.rsplit('-', 1)
+    try:
+        return CURSOR_EPOCH + timedelta(microseconds=int(micros)), _cursor_int(pk, minimum=1)
+    except OverflowError:
+        raise ValueError(f'Cursor timestamp out of range: {micros}')
+
+
+class Echo:
+    """File-like object that returns what is written, for streaming CSV rows"""
+    def write(self, value):
+        return value
+
 
 class ManagerRequiredMixin(UserPassesTestMixin):
     """Mixin to ensure only Managers or Enterprise users can access"""
     def test_func(self):
-        return self.request.user.profile.role in ['MANAGER', 'ENTERPRISE']
+        return self.request.actor.profile.role in ['MANAGER', 'ENTERPRISE']
 
 
 class TaskListView(LoginRequiredMixin, ListView):
-    """List all tasks for the user"""
+    """List all tasks for the user, keyset-paginated, with filters and CSV export"""
     model = Task
     template_name = 'tasks/task_list.html'
     context_object_name = 'tasks'
+    ordering = ('-created_at', '-id')
+    
+    # Columns the list and export actually render
+    list_fields = (
+        'title', 'status', 'priority', 'due_date', 'created_at',
+        'project', 'project__name',
+        'assigned_to', 'assigned_to__username', 'assigned_to__first_name', 'assigned_to__last_name',
+    )
+    
+    def get(self, request, *args, **kwargs):
+        if request.GET.get('export') == 'csv':
+            return self.export_csv()
+        return super().get(request, *args, **kwargs)
+    
+    def get_visible_tasks(self):
+        """Tasks the user is allowed to see, before any filters"""
+        return Task.objects.visible_to(self.request.actor)
+    
+    def get_filter_form(self):
+        if not hasattr(self, 'filter_form'):
+            user = self.request.actor
+            projects = Project.objects.visible_to(user)
+            assignees = User.objects.filter(
+                profile__organization=user.profile.organization
+            ).order_by('username')
+            self.filter_form = TaskFilterForm(
+                self.request.GET or None,
+                projects=projects,
+                assignees=assignees
+            )
+        return self.filter_form
     
     def get_queryset(self):
-        user = self.request.user
-        organization = user.profile.organization
-        
-        if user.profile.role == 'ENTERPRISE':
-            # Enterprise sees all tasks in their organization
-            return Task.objects.filter(project__organization=organization)
-        elif user.profile.role == 'MANAGER':
-            # Manager sees tasks in their managed projects
-            return Task.objects.filter(project__manager=user)
-        else:
-            # Employee sees only tasks assigned to them
-            return Task.objects.filter(assigned_to=user)
+        tasks = self.get_filter_form().filter_queryset(self.get_visible_tasks())
+        return tasks.only(*self.list_fields).order_by(*self.ordering)
+    
+    def paginate_keyset(self, tasks):
+        """Return one page of tasks after the `cursor` param and the cursor for the next page"""
+        cursor = self.request.GET.get('cursor')
+        if cursor:
+            try:
+                created_at, pk = decode_cursor(cursor)
+                tasks = tasks.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+            except ValueError:
+                pass
+        
+        page = list(tasks[:TASK_LIST_PAGE_SIZE + 1])
+        if len(page) > TASK_LIST_PAGE_SIZE:
+            page = page[:TASK_LIST_PAGE_SIZE]
+            return page, encode_cursor(page[-1].created_at, page[-1].pk)
+        return page, None
     
     def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+        page, next_cursor = self.paginate_keyset(self.object_list)
+        context = super().get_context_data(object_list=page, **kwargs)
         context['is_manager'] = self.request.user.profile.role in ['MANAGER', 'ENTERPRISE']
-        
-        # Task statistics
-        tasks = self.get_queryset()
-        context['todo_count'] = tasks.filter(status='TODO').count()
-        context['in_progress_count'] = tasks.filter(status='IN_PROGRESS').count()
-        context['in_review_count'] = tasks.filter(status='IN_REVIEW').count()
-        context['done_count'] = tasks.filter(status='DONE').count()
+        context['status_choices'] = Task.STATUS_CHOICES
+        context['priority_choices'] = Task.PRIORITY_CHOICES
+        context['filter_form'] = self.get_filter_form()
+        
+        # Query strings for pagination and export that keep the current filters
+        params = self.request.GET.copy()
+        params.pop('cursor', None)
+        context['filter_query'] = params.urlencode()
+        if next_cursor:
+            params['cursor'] = next_cursor
+            context['next_page_query'] = params.urlencode()
+        context['is_paginated'] = bool(next_cursor or self.request.GET.get('cursor'))
+        
+        # Task statistics (single aggregate query)
+        context.update(self.get_visible_tasks().stats())
         
         return context
+    
+    def export_csv(self):
+        """Stream the filtered tasks as CSV without loading them all into memory"""
+        rows = self.get_filter_form().filter_queryset(self.get_visible_tasks()).order_by(
+            *self.ordering
+        ).values_list(
+            'id', 'title', 'project__name', 'status', 'priority',
+            'assigned_to__username', 'due_date', 'created_at'
+        ).iterator(chunk_size=TASK_EXPORT_CHUNK_SIZE)
+        
+        writer = csv.writer(Echo())
+        header = ['ID', 'Title', 'Project', 'Status', 'Priority', 'Assignee', 'Due Date', 'Created']
+        
+        def stream():
+            yield writer.writerow(header)
+            for row in rows:
+                yield writer.writerow(row)
+        
+        response = StreamingHttpResponse(stream(), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="tasks.csv"'
+        return response
 
 
 class TaskDetailView(LoginRequiredMixin, DetailView):
@@ -67,30 +179,32 @@ class TaskDetailView(LoginRequiredMixin, DetailView):
     context_object_name = 'task'
     
     def get_queryset(self):
-        user = self.request.user
-        organization = user.profile.organization
-        
-        if user.profile.role == 'ENTERPRISE':
-            return Task.objects.filter(project__organization=organization)
-        elif user.profile.role == 'MANAGER':
-            return Task.objects.filter(project__manager=user)
-        else:
-            return Task.objects.filter(assigned_to=user)
+        return Task.objects.visible_to(self.request.actor)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['is_manager'] = self.request.user.profile.role in ['MANAGER', 'ENTERPRISE']
         context['is_assignee'] = self.object.assigned_to == self.request.user
         context['comments'] = self.object.comments.select_related('user').order_by('created_at')
-        context['attachments'] = self.object.attachments.select_related('uploaded_by').order_by('-uploaded_at')
+        # Evaluated once here; the template reads them several times
+        context['attachments'] = list(self.object.attachments.select_related('uploaded_by').order_by('-uploaded_at'))
         context['comment_form'] = TaskCommentForm()
         context['status_form'] = TaskStatusUpdateForm(initial={'status': self.object.status})
-        # Get available tasks for dependencies (same project, excluding self)
+        dependencies = list(self.object.depends_on.all())
+        context['dependencies'] = dependencies
+        # Get available tasks for dependencies (same project, excluding self, current
+        # dependencies and anything that already depends on this task, which would form a cycle)
+        downstream = self.object.all_dependents()
         context['available_dependencies'] = Task.objects.filter(
             project=self.object.project
-        ).exclude(pk=self.object.pk)
+        ).exclude(pk=self.object.pk).exclude(pk__in=downstream.values('pk')).exclude(
+            pk__in=[dependency.pk for dependency in dependencies]
+        )
+        # Transitive dependency chains, each from one closure-table query
+        context['all_blockers'] = self.object.all_blockers().exclude(status='DONE').order_by('title')
+        context['all_dependents'] = downstream.order_by('title')
         # Check if task is blocked by incomplete dependencies
-        context['is_blocked'] = self.object.depends_on.exclude(status='DONE').exists()
+        context['is_blocked'] = any(dependency.status != 'DONE' for dependency in dependencies)
         
         # Time tracking
         context['time_entries'] = self.object.time_entries.select_related('user').order_by('-start_time')[:5]
@@ -117,7 +231,7 @@ class TaskCreateView(LoginRequiredMixin, ManagerRequiredMixin, CreateView):
     
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs['user'] = self.request.user
+        kwargs['user'] = self.request.actor
         
         # Check if project is specified in query params
         project_id = self.request.GET.get('project')
@@ -129,6 +243,7 @@ class TaskCreateView(LoginRequiredMixin, ManagerRequiredMixin, CreateView):
         
         return kwargs
     
+    @transaction.atomic
     def form_valid(self, form):
         form.instance.created_by = self.request.user
         response = super().form_valid(form)
@@ -153,12 +268,13 @@ class TaskCreateView(LoginRequiredMixin, ManagerRequiredMixin, CreateView):
             f'created task "{self.object.title}"'
         )
         
-        # Notify project manager and enterprise about new task
-        notify_task_created(self.object, self.request.user)
-        
-        # Notify assignee if assigned
+        # Notify project manager and enterprise about new task,
+        # and the assignee if assigned, in a single batch
+        dispatcher = NotificationDispatcher()
+        notify_task_created(self.object, self.request.user, dispatcher=dispatcher)
         if self.object.assigned_to:
-            notify_task_assigned(self.object, self.request.user)
+            notify_task_assigned(self.object, self.request.user, dispatcher=dispatcher)
+        dispatcher.dispatch()
         
         messages.success(self.request, f'Task "{form.instance.title}" created successfully!')
         return response
@@ -180,21 +296,19 @@ class TaskUpdateView(LoginRequiredMixin, ManagerRequiredMixin, UpdateView):
     template_name = 'tasks/task_form.html'
     
     def get_queryset(self):
-        user = self.request.user
-        if user.profile.role == 'ENTERPRISE':
-            return Task.objects.filter(project__organization=user.profile.organization)
-        else:
-            return Task.objects.filter(project__manager=user)
+        # ManagerRequiredMixin already keeps employees out
+        return Task.objects.visible_to(self.request.actor)
     
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs['user'] = self.request.user
+        kwargs['user'] = self.request.actor
         kwargs['project'] = self.object.project
         return kwargs
     
     def get_success_url(self):
         return reverse('tasks:detail', kwargs={'pk': self.object.pk})
     
+    @transaction.atomic
     def form_valid(self, form):
         old_assignee = self.object.assigned_to
         response = super().form_valid(form)
@@ -219,12 +333,12 @@ class TaskUpdateView(LoginRequiredMixin, ManagerRequiredMixin, UpdateView):
             f'updated task "{self.object.title}"'
         )
         
-        # Notify if assignee changed
+        # Notify if assignee changed, and about the update, in a single batch
+        dispatcher = NotificationDispatcher()
         if self.object.assigned_to and self.object.assigned_to != old_assignee:
-            notify_task_assigned(self.object, self.request.user)
-        
-        # Notify about update (except assignee who just got notified)
-        notify_task_updated(self.object, self.request.user)
+            notify_task_assigned(self.object, self.request.user, dispatcher=dispatcher)
+        notify_task_updated(self.object, self.request.user, dispatcher=dispatcher)
+        dispatcher.dispatch()
         
         messages.success(self.request, f'Task "{form.instance.title}" updated successfully!')
         return response
@@ -243,11 +357,8 @@ class TaskDeleteView(LoginRequiredMixin, ManagerRequiredMixin, DeleteView):
     success_url = reverse_lazy('tasks:list')
     
     def get_queryset(self):
-        user = self.request.user
-        if user.profile.role == 'ENTERPRISE':
-            return Task.objects.filter(project__organization=user.profile.organization)
-        else:
-            return Task.objects.filter(project__manager=user)
+        # ManagerRequiredMixin already keeps employees out
+        return Task.objects.visible_to(self.request.actor)
     
     def delete(self, request, *args, **kwargs):
         task = self.get_object()
@@ -263,6 +374,7 @@ class TaskDeleteView(LoginRequiredMixin, ManagerRequiredMixin, DeleteView):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, pk):
     """Add a comment to a task"""
     task = get_object_or_404(Task, pk=pk)
@@ -280,21 +392,15 @@ def add_comment(request, pk):
             comment.task = task
             comment.user = user
             
-            # Update task status if specified
-            if comment.status_changed_to:
-                old_status = task.status
-                task.status = comment.status_changed_to
-                task.save()
-                
-                # Log status change
-                log_task_activity(
-                    task, user, 'STATUS_CHANGE',
-                    f'changed status of "{task.title}"',
-                    old_value=dict(Task.STATUS_CHOICES).get(old_status),
-                    new_value=dict(Task.STATUS_CHOICES).get(comment.status_changed_to)
-                )
-            
-            comment.save()
+            # Update task status if specified; the comment is saved with it
+            try:
+                if comment.status_changed_to and comment.status_changed_to != task.status:
+                    task.transition(comment.status_changed_to, user, comment=comment)
+                else:
+                    comment.save()
+            except InvalidTransition as e:
+                messages.error(request, str(e))
+                return redirect('tasks:detail', pk=pk)
             
             # Log comment activity
             log_task_activity(
@@ -329,33 +435,15 @@ def update_status(request, pk):
     if request.method == 'POST':
         form = TaskStatusUpdateForm(request.POST)
         if form.is_valid():
-            old_status = task.status
             new_status = form.cleaned_data['status']
             
-            if old_status != new_status:
-                task.status = new_status
-                task.save()
-                
-                # Log activity
-                log_task_activity(
-                    task, user, 'STATUS_CHANGE',
-                    f'changed status of "{task.title}"',
-                    old_value=dict(Task.STATUS_CHOICES).get(old_status),
-                    new_value=dict(Task.STATUS_CHOICES).get(new_status)
-                )
-                
-                # Create a comment for the status change
-                comment_text = form.cleaned_data.get('comment', '')
-                if not comment_text:
-                    comment_text = f'Status changed from {dict(Task.STATUS_CHOICES)[old_status]} to {dict(Task.STATUS_CHOICES)[new_status]}'
-                
-                TaskComment.objects.create(
-                    task=task,
-                    user=user,
-                    comment=comment_text,
-                    status_changed_to=new_status
-                )
-                
+            try:
+                changed = task.transition(new_status, user, comment=form.cleaned_data.get('comment'))
+            except InvalidTransition as e:
+                messages.error(request, str(e))
+                return redirect('tasks:detail', pk=pk)
+            
+            if changed:
                 messages.success(request, f'Task status updated to {dict(Task.STATUS_CHOICES)[new_status]}!')
             else:
                 messages.info(request, 'No status change was made.')
@@ -445,16 +533,24 @@ def add_dependency(request, pk):
     if dependency_id:
         try:
             dependency = Task.objects.get(pk=dependency_id, project=task.project)
-            if dependency != task and dependency not in task.depends_on.all():
-                task.depends_on.add(dependency)
-                messages.success(request, f'Dependency on "{dependency.title}" added.')
-                
-                log_task_activity(
-                    task, user, 'UPDATE',
-                    f'added dependency on "{dependency.title}" to "{task.title}"'
-                )
-            else:
-                messages.warning(request, 'This dependency already exists or is invalid.')
+            with transaction.atomic():
+                # Serialize dependency edits per project, so two concurrent adds
+                # cannot each pass the cycle check against the other's edge
+                Project.objects.select_for_update().filter(pk=task.project_id).first()
+                if dependency != task and closure.would_create_cycle(task.pk, dependency.pk):
+                    messages.error(
+                        request, f'"{dependency.title}" already depends on this task; adding it would create a cycle.'
+                    )
+                elif dependency != task and dependency not in task.depends_on.all():
+                    task.depends_on.add(dependency)
+                    messages.success(request, f'Dependency on "{dependency.title}" added.')
+                    
+                    log_task_activity(
+                        task, user, 'UPDATE',
+                        f'added dependency on "{dependency.title}" to "{task.title}"'
+                    )
+                else:
+                    messages.warning(request, 'This dependency already exists or is invalid.')
         except Task.DoesNotExist:
             messages.error(request, 'Invalid task selected.')
     
@@ -491,51 +587,122 @@ def remove_dependency(request, pk, dependency_id):
 
 # ============ KANBAN BOARD ============
 
-@login_required
-def kanban_board(request):
-    """Kanban board view for tasks"""
-    user = request.user
-    organization = user.profile.organization
-    
-    # Get tasks based on role
-    if user.profile.role == 'ENTERPRISE':
-        tasks = Task.objects.filter(project__organization=organization)
-    elif user.profile.role == 'MANAGER':
-        tasks = Task.objects.filter(project__manager=user)
-    else:
-        tasks = Task.objects.filter(assigned_to=user)
+KANBAN_PAGE_SIZE = 50
+
+# Columns that are only fetched once they scroll into view
+KANBAN_LAZY_COLUMNS = ('DONE',)
+
+# Cards are ordered by their persisted position, newest first among equals
+KANBAN_ORDERING = ('position', '-id')
+
+
+def encode_position_cursor(task):
+    """Encode a Kanban keyset position (position, id) as an opaque cursor"""
+    return f'{task.position}-{task.pk}'
+
+
+def decode_position_cursor(cursor):
+    """Decode a Kanban cursor back to (position, id); raises ValueError if malformed"""
+    position, pk = cursor.rsplit('-', 1)
+    return _cursor_int(position), _cursor_int(pk, minimum=1)
+
+
+def get_kanban_tasks(request):
+    """Return the tasks visible on the board and the selected project id"""
+    tasks = Task.objects.visible_to(request.actor)
     
     # Filter by project if specified
     project_id = request.GET.get('project')
     if project_id:
         tasks = tasks.filter(project_id=project_id)
     
-    # Organize tasks by status
-    columns = {
-        'TODO': tasks.filter(status='TODO').select_related('assigned_to', 'project'),
-        'IN_PROGRESS': tasks.filter(status='IN_PROGRESS').select_related('assigned_to', 'project'),
-        'IN_REVIEW': tasks.filter(status='IN_REVIEW').select_related('assigned_to', 'project'),
-        'DONE': tasks.filter(status='DONE').select_related('assigned_to', 'project'),
-    }
-    
-    # Get projects for filter dropdown
-    if user.profile.role == 'ENTERPRISE':
-        projects = Project.objects.filter(organization=organization)
-    elif user.profile.role == 'MANAGER':
-        projects = Project.objects.filter(manager=user)
-    else:
-        projects = Project.objects.filter(members__user=user)
+    return tasks, project_id
+
+
+@login_required
+def kanban_board(request):
+    """Kanban board view for tasks"""
+    user = request.actor
+    tasks, project_id = get_kanban_tasks(request)
+    
+    # First page of every eager column in one query, ranked per status
+    eager_statuses = [status for status, _ in Task.STATUS_CHOICES if status not in KANBAN_LAZY_COLUMNS]
+    first_pages = tasks.filter(status__in=eager_statuses).with_blocked().annotate(
+        column_row=Window(
+            RowNumber(),
+            partition_by=F('status'),
+            order_by=[F('position').asc(), F('id').desc()]
+        )
+    ).filter(column_row__lte=KANBAN_PAGE_SIZE + 1).order_by(*KANBAN_ORDERING)
+    
+    pages = {status: [] for status, _ in Task.STATUS_CHOICES}
+    for task in first_pages:
+        pages[task.status].append(task)
+    
+    # Column totals (single aggregate query)
+    stats = tasks.stats()
+    
+    board = []
+    for status, label in Task.STATUS_CHOICES:
+        page = pages[status]
+        lazy = status in KANBAN_LAZY_COLUMNS
+        has_more = lazy or len(page) > KANBAN_PAGE_SIZE
+        page = page[:KANBAN_PAGE_SIZE]
+        board.append({
+            'status': status,
+            'label': label,
+            'tasks': page,
+            'count': stats[f'{status.lower()}_count'],
+            'has_more': has_more,
+            'next_cursor': encode_position_cursor(page[-1]) if has_more and page else '',
+        })
     
     context = {
-        'columns': columns,
-        'projects': projects,
+        'board': board,
+        'projects': Project.objects.visible_to(user),
         'selected_project': project_id,
         'is_manager': user.profile.role in ['MANAGER', 'ENTERPRISE'],
+        'today': timezone.localdate(),
     }
     
     return render(request, 'tasks/kanban_board.html', context)
 
 
+@login_required
+def kanban_column(request):
+    """AJAX endpoint returning the next page of cards for one Kanban column"""
+    status = request.GET.get('status')
+    if status not in dict(Task.STATUS_CHOICES):
+        return JsonResponse({'error': 'Invalid status'}, status=400)
+    
+    tasks, _ = get_kanban_tasks(request)
+    page = tasks.filter(status=status).with_blocked().order_by(*KANBAN_ORDERING)
+    
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            position, pk = decode_position_cursor(cursor)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        page = page.filter(Q(position__gt=position) | Q(position=position, pk__lt=pk))
+    
+    page = list(page[:KANBAN_PAGE_SIZE + 1])
+    has_more = len(page) > KANBAN_PAGE_SIZE
+    page = page[:KANBAN_PAGE_SIZE]
+    
+    # Rendered without the request: context processors (the unread counter
+    # among them) would otherwise run once per card
+    template = get_template('tasks/kanban_card.html')
+    today = timezone.localdate()
+    cards = [{'id': task.pk, 'html': template.render({'task': task, 'today': today})} for task in page]
+    
+    return JsonResponse({
+        'cards': cards,
+        'has_more': has_more,
+        'next_cursor': encode_position_cursor(page[-1]) if has_more else None,
+    })
+
+
 @login_required
 @require_POST
 def update_task_status_ajax(request):
@@ -558,24 +725,64 @@ def update_task_status_ajax(request):
         if not (is_assignee or is_manager):
             return JsonResponse({'error': 'Permission denied'}, status=403)
         
-        old_status = task.status
-        if old_status != new_status:
-            task.status = new_status
-            task.save()
-            
-            # Log activity
-            log_task_activity(
-                task, user, 'STATUS_CHANGE',
-                f'moved "{task.title}" to {dict(Task.STATUS_CHOICES)[new_status]}',
-                old_value=dict(Task.STATUS_CHOICES).get(old_status),
-                new_value=dict(Task.STATUS_CHOICES).get(new_status)
-            )
+        task.transition(new_status, user)
         
         return JsonResponse({'success': True, 'new_status': new_status})
+    except InvalidTransition as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@login_required
+@require_POST
+def kanban_sync(request):
+    """
+    Apply a batch of Kanban drag-and-drop moves with optimistic concurrency.
+    Body: {"moves": [{"task_id", "status", "position", "expected_updated_at"}, ...]}
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    try:
+        result = apply_kanban_moves(request.user, data.get('moves'))
+    except BulkChangeError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({'success': not result['conflicts'] and not result['denied'], **result})
+
+
+@login_required
+@require_POST
+def bulk_update_tasks(request):
+    """
+    Apply one change set to many tasks.
+    Body: {"task_ids": [...], "changes": {"status"|"priority"|"assigned_to": ...}, "comment": "..."}
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    try:
+        result = apply_bulk_change(
+            request.user,
+            data.get('task_ids') or [],
+            data.get('changes'),
+            comment=data.get('comment') or ''
+        )
+    except BulkChangeError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({'success': True, **result})
+
+
 # ============ TIME TRACKING ============
 
 @login_required
@@ -741,9 +948,16 @@ def create_task_from_template(request, template_id):
         organization=request.user.profile.organization
     )
     
+    # Tasks are created in projects the user runs; employees run none
+    user = request.actor
+    if user.profile.role == 'EMPLOYEE':
+        projects = Project.objects.none()
+    else:
+        projects = Project.objects.visible_to(user)
+    
     if request.method == 'POST':
         project_id = request.POST.get('project')
-        project = get_object_or_404(Project, pk=project_id)
+        project = get_object_or_404(projects, pk=project_id)
         
         task = Task.objects.create(
             title=template.default_title,
@@ -751,7 +965,8 @@ def create_task_from_template(request, template_id):
             priority=template.default_priority,
             project=project,
             created_by=request.user,
-            status='TODO'
+            status='TODO',
+            template=template
         )
         
         log_task_activity(
@@ -762,13 +977,6 @@ def create_task_from_template(request, template_id):
         messages.success(request, f'Task created from template "{template.name}"!')
         return redirect('tasks:detail', pk=task.pk)
     
-    # Get projects for selection
-    user = request.user
-    if user.profile.role == 'ENTERPRISE':
-        projects = Project.objects.filter(organization=user.profile.organization)
-    else:
-        projects = Project.objects.filter(manager=user)
-    
     return render(request, 'tasks/create_from_template.html', {
         'template': template,
         'projects': projects,